@@ -5,25 +5,55 @@
 ## Shrisan kapali - 005032249
 ## *************************************************************** ##
 
+import asyncio
+import csv
+import gzip
+import heapq
+import json
+import mmap
+import multiprocessing
+import os
 import random
+import struct
+import sys
+import threading
 import time
+import weakref
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial, wraps
+from itertools import chain, islice
 
 ## Dyanamic Inventory Management System
 ## This program will allow end users to perform CRUD operations on products and categories
 from datetime import datetime
-from functools import lru_cache
+from math import frexp, inf, isfinite, ldexp
 
-import matplotlib.pyplot as plt
+# NumPy is optional, only the vectorized query engine needs it
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 # Defining the class Category
 # A category has unique id assigned to it
 # A category has a name and the status can be active or inactive i.e, true or false
+# The casefolded name is stored as search_name so searches never normalize it again
+# __slots__ removes the per instance dictionary
 class Category:
+    __slots__ = ("category_id", "name", "search_name", "status")
+
     # Constructor to initialize a category class object
     def __init__(self, cagetory_id: int, name: str, status: bool = True):
         self.category_id = cagetory_id
         self.name = name
+        self.search_name = name.casefold()
         self.status = status
 
     # Perform update on a category
@@ -31,18 +61,154 @@ class Category:
     def update(self, name: str = None, status: bool = None):
         if name:
             self.name = name
+            self.search_name = name.casefold()
         if status is not None:
             self.status = status
 
+    # A copy of the category
+    def copy(self) -> "Category":
+        return Category(self.category_id, self.name, self.status)
+
     # Printing the category when print command is used
     # Print layout Example "Category 1, Name Grocery, Current Status Active"
     def __repr__(self):
         return f"Category ({self.category_id}), Name {self.name}, Current Status {'Active' if self.status else 'Inactive'}"
 
 
+# Defining a packed price history
+# Changes are stored in one array of doubles as interleaved (timestamp, price)
+# pairs, in time order, instead of a list of datetime and price tuples
+# It still reads like that list, each entry is a (datetime, price) tuple
+# Lookups by time are binary searches over the timestamps
+class PriceHistory:
+    __slots__ = ("values",)
+
+    # Constructor to pack (datetime, price) entries
+    def __init__(self, entries=()):
+        if isinstance(entries, PriceHistory):
+            self.values = array("d", entries.values)
+            return
+        self.values = array("d")
+        for changed_at, price in entries:
+            self.values.append(changed_at.timestamp())
+            self.values.append(price)
+
+    # Create a history from packed (timestamp, price) doubles
+    @classmethod
+    def frombytes(cls, data) -> "PriceHistory":
+        history = cls()
+        history.values.frombytes(data)
+        return history
+
+    # Record a (datetime, price) change
+    def append(self, entry):
+        changed_at, price = entry
+        self.values.append(changed_at.timestamp())
+        self.values.append(price)
+
+    # The price in effect at the passed in time, None before the first price
+    def price_at(self, when: datetime):
+        position = self._position(when.timestamp())
+        return self.values[2 * position - 1] if position else None
+
+    # The changes made between start and end (inclusive)
+    def between(self, start: datetime = None, end: datetime = None) -> "PriceHistory":
+        low = 0 if start is None else self._position(start.timestamp(), False)
+        high = len(self) if end is None else self._position(end.timestamp())
+        history = PriceHistory()
+        history.values = self.values[2 * low : 2 * high]
+        return history
+
+    # Keep the last change of every interval of the passed in seconds
+    def downsample(self, interval: float) -> "PriceHistory":
+        values = self.values
+        history = PriceHistory()
+        kept = history.values
+        for position in range(0, len(values), 2):
+            bucket = values[position] // interval
+            if kept and kept[-2] // interval == bucket:
+                kept[-2] = values[position]
+                kept[-1] = values[position + 1]
+            else:
+                kept.append(values[position])
+                kept.append(values[position + 1])
+        return history
+
+    # Drop the changes made before the passed in time and all but the last
+    # max_entries changes. The price in effect at the cutoff is always kept,
+    # so price_at still answers for every time after it
+    def trim(self, before: datetime = None, max_entries: int = None):
+        start = 0
+        if before is not None:
+            start = max(self._position(before.timestamp()) - 1, 0)
+        if max_entries is not None:
+            start = max(start, len(self) - max_entries)
+        if start:
+            del self.values[: 2 * start]
+
+    def copy(self) -> "PriceHistory":
+        return PriceHistory(self)
+
+    def __len__(self):
+        return len(self.values) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("price history index out of range")
+        return (
+            datetime.fromtimestamp(self.values[2 * index]),
+            self.values[2 * index + 1],
+        )
+
+    def __iter__(self):
+        values = self.values
+        for position in range(0, len(values), 2):
+            yield datetime.fromtimestamp(values[position]), values[position + 1]
+
+    def __eq__(self, other):
+        if isinstance(other, PriceHistory):
+            return self.values == other.values
+        return list(self) == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+    # Number of changes made at or before the timestamp, or before it when
+    # inclusive is False
+    def _position(self, timestamp: float, inclusive: bool = True) -> int:
+        values = self.values
+        low, high = 0, len(values) // 2
+        while low < high:
+            middle = (low + high) // 2
+            if values[2 * middle] < timestamp or (
+                inclusive and values[2 * middle] == timestamp
+            ):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
 # Defining class Product
 # A product has id, name, description, quantity and belongs to the category
+# The casefolded name is stored as search_name so searches never normalize it again
+# __slots__ removes the per instance dictionary
 class Product:
+    __slots__ = (
+        "product_id",
+        "name",
+        "search_name",
+        "price",
+        "description",
+        "category",
+        "quantity",
+        "price_history",
+    )
+
     # Constructor to initialize the product class
     def __init__(
         self,
@@ -52,14 +218,17 @@ class Product:
         description: str,
         category: Category,
         quantity: int,
+        created_at: datetime = None,
     ):
         self.product_id = product_id
         self.name = name
+        self.search_name = name.casefold()
         self.price = price
         self.description = description
         self.category = category
         self.quantity = quantity
-        self.price_history = [(datetime.now(), price)]  # a list of price history
+        # a packed list of price history
+        self.price_history = PriceHistory([(created_at or datetime.now(), price)])
 
     # A function to update product information
     def update(
@@ -69,14 +238,16 @@ class Product:
         description: str = None,
         category: Category = None,
         quantity: int = None,
+        changed_at: datetime = None,
     ):
         if name:
             self.name = name
+            self.search_name = name.casefold()
         # Only if the passed in price is not equal to old price
         if price is not None and price != self.price:
             self.price = price
             # Append the new price in the price history list
-            self.price_history.append((datetime.now(), price))
+            self.price_history.append((changed_at or datetime.now(), price))
         if description:
             self.description = description
         if category:
@@ -92,765 +263,5445 @@ class Product:
     def decreaseQuantity(self, increaseBy: int):
         self.quantity -= increaseBy
 
+    # A copy of the product with its own price history, sharing the category
+    def copy(self) -> "Product":
+        product = Product(
+            self.product_id,
+            self.name,
+            self.price,
+            self.description,
+            self.category,
+            self.quantity,
+        )
+        product.price_history = self.price_history.copy()
+        return product
+
     # A function to print the product class
     def __repr__(self):
         return f"Product Id: {self.product_id}, Product Price: {self.price}, Product Name: {self.name}, Description: {self.description}, Quantity: {self.quantity}, Category:{self.category.name}"
 
 
-# Finally as we now have product and category class, create Inventory class
-class Inventory:
-
-    # Intialize inventory class with empty categories and product dictionary
+# Defining a columnar product store
+# Keeps ids, prices, quantities and category ids in typed arrays and the text
+# columns in lists, one row per product, instead of one object per product
+# It behaves like the products dictionary of the inventory and hands out
+# lightweight ProductView rows, so Inventory(product_store=ProductStore()) keeps
+# the same API. Product ids and quantities must be integers
+class ProductStore(MutableMapping):
+    # Constructor to initialize empty columns
     def __init__(self):
-        self.categories = {}
-        self.products = {}
-        # Implementing manual caching
-        self.memoized_search = {}
+        # Row number of every product id
+        self.rows = {}
+        self.product_ids = array("q")
+        self.prices = array("d")
+        self.quantities = array("q")
+        self.category_ids = array("q")
+        self.names = []
+        self.search_names = []
+        self.descriptions = []
+        # Time of the first price, the history is only stored once the price changes
+        self.created = array("d")
+        self.price_histories = {}
+        # The category object of every category id used by a product
+        self.category_objects = {}
+        # Repeated descriptions share a single string
+        self.interned = {}
 
-    ## ******************************************** ##
-    # Inventory Category Management
-    ## ******************************************** ##
-    # Functions to add and update category and products
-    # Each id needs to be unique so
-    def is_category_id_unique(self, category_id: int) -> bool:
-        return category_id not in self.categories
+    # Return a row view of the product
+    def __getitem__(self, product_id: int):
+        if product_id not in self.rows:
+            raise KeyError(product_id)
+        return ProductView(self, product_id)
 
-    # Also check if product id is unique
-    def is_product_id_unique(self, product_id: int) -> bool:
-        return product_id not in self.products
+    # Store a product, copying its fields into the columns
+    def __setitem__(self, product_id: int, product):
+        row = self.rows.get(product_id)
+        if row is None:
+            row = len(self.product_ids)
+            self.rows[product_id] = row
+            self.product_ids.append(product_id)
+            self.prices.append(product.price)
+            self.quantities.append(product.quantity)
+            self.category_ids.append(product.category.category_id)
+            self.names.append(product.name)
+            self.search_names.append(self._search_name(product))
+            self.descriptions.append(self._intern(product.description))
+            self.created.append(product.price_history[0][0].timestamp())
+        else:
+            self.prices[row] = product.price
+            self.quantities[row] = product.quantity
+            self.category_ids[row] = product.category.category_id
+            self.names[row] = product.name
+            self.search_names[row] = self._search_name(product)
+            self.descriptions[row] = self._intern(product.description)
+            self.created[row] = product.price_history[0][0].timestamp()
+        self.category_objects[product.category.category_id] = product.category
+        if len(product.price_history) > 1:
+            self.price_histories[product_id] = PriceHistory(product.price_history)
+        else:
+            self.price_histories.pop(product_id, None)
 
-    # Add new category
-    def add_new_category(self, category_id: int, name: str, status: bool = True):
-        # First check if the category id is unique
-        if not self.is_category_id_unique(category_id):
-            raise ValueError("Category Id must be unique. This id already exists")
+    # Remove a product by moving the last row into its place
+    def __delitem__(self, product_id: int):
+        row = self.rows.pop(product_id)
+        self.price_histories.pop(product_id, None)
+        last = len(self.product_ids) - 1
+        if row != last:
+            moved_id = self.product_ids[last]
+            self.rows[moved_id] = row
+            for column in (
+                self.product_ids,
+                self.prices,
+                self.quantities,
+                self.category_ids,
+                self.names,
+                self.search_names,
+                self.descriptions,
+                self.created,
+            ):
+                column[row] = column[last]
+        for column in (
+            self.product_ids,
+            self.prices,
+            self.quantities,
+            self.category_ids,
+            self.names,
+            self.search_names,
+            self.descriptions,
+            self.created,
+        ):
+            del column[last]
 
-        # Add the category using category_id as key
-        self.categories[category_id] = Category(category_id, name, status)
-        # Clear manual cache on each new addition
-        self.clear_cache()
+    # A removed row view would no longer resolve, so pop returns a Product copy
+    def pop(self, product_id: int, *default):
+        if product_id not in self.rows:
+            if default:
+                return default[0]
+            raise KeyError(product_id)
+        product = ProductView(self, product_id).detach()
+        del self[product_id]
+        return product
 
-    # Update Category name or status
-    def update_category(self, cagetory_id: int, name: str = None, status: bool = None):
-        # If passed in category id is not present, return error
-        if cagetory_id not in self.categories:
-            raise ValueError(
-                "Unable to find the category for this passed in cateogry id"
-            )
+    def __contains__(self, product_id):
+        return product_id in self.rows
 
-        # Use category update method to update the category details
-        self.categories[cagetory_id].update(name, status)
-        # Clear manual cache on each update
-        self.clear_cache()
+    def __iter__(self):
+        return iter(self.rows)
 
-    # Delete existing category
-    def delete_category(self, cagetory_id: int):
-        # If passed in category id is not present, return error
-        if cagetory_id not in self.categories:
-            raise ValueError(
-                "Unable to find the category for this passed in cateogry id"
-            )
+    def __len__(self):
+        return len(self.rows)
 
-        del self.categories[cagetory_id]
-        # Clear manual cache on each update
-        self.clear_cache()
+    # The price history of a product, created on its first price change
+    def history(self, product_id: int):
+        history = self.price_histories.get(product_id)
+        if history is None:
+            row = self.rows[product_id]
+            history = PriceHistory()
+            history.values.append(self.created[row])
+            history.values.append(self.prices[row])
+        return history
 
-    # Adding lru automatic caching as well
-    # A function to search category by name
-    @lru_cache(maxsize=20000)
-    def search_category_by_name(self, name: str):
-        return [
-            category
-            for category in self.categories.values()
-            if name.lower() in category.name.lower()
-        ]
+    # Share the search name with the name when casefolding does not change it
+    def _search_name(self, product) -> str:
+        return product.name if product.search_name == product.name else product.search_name
 
-    # Without cache
-    def search_category_by_name_no_cache(self, name: str):
-        return [
-            category
-            for category in self.categories.values()
-            if name.lower() in category.name.lower()
-        ]
+    # Return the shared copy of a repeated string
+    def _intern(self, text: str) -> str:
+        return self.interned.setdefault(text, text)
 
-    # Manual caching
-    def search_category_by_name_memo(self, name: str):
-        # if the name is already in cache, return from cache
-        if name in self.memoized_search:
-            return self.memoized_search[name]
-        result = [
-            category
-            for category in self.categories.values()
-            if name.lower() in category.name.lower()
-        ]
-        # Add this result to cache for faster retrieval
-        self.memoized_search[name] = result
-        return result
 
-    ## ******************************************** ##
-    # Inventory Product Management
-    ## ******************************************** ##
+# Defining a row view of the product store
+# It exposes the same attributes and methods as Product and reads or writes
+# the columns of its row, so it holds nothing but the store and the product id
+class ProductView:
+    __slots__ = ("store", "product_id")
 
-    # Add in a new product
-    def add_product(
-        self,
-        product_id: int,
-        name: str,
-        price: float,
-        description: str,
-        category_id: int,
-        quantity: int,
-    ):
-        # First check if the product id is unique
-        if not self.is_product_id_unique(product_id):
-            raise ValueError("Product with the same id already exists.")
+    def __init__(self, store: ProductStore, product_id: int):
+        self.store = store
+        self.product_id = product_id
 
-        # Now check if the category id exists
-        if category_id not in self.categories:
-            raise ValueError("Passed in category id is invalid")
+    @property
+    def name(self) -> str:
+        return self.store.names[self.store.rows[self.product_id]]
 
-        # Extract the category
-        category = self.categories[category_id]
+    @name.setter
+    def name(self, name: str):
+        row = self.store.rows[self.product_id]
+        self.store.names[row] = name
+        search_name = name.casefold()
+        self.store.search_names[row] = name if search_name == name else search_name
 
-        # Finally add in the product
-        self.products[product_id] = Product(
-            product_id, name, price, description, category, quantity
+    @property
+    def search_name(self) -> str:
+        return self.store.search_names[self.store.rows[self.product_id]]
+
+    @property
+    def price(self) -> float:
+        return self.store.prices[self.store.rows[self.product_id]]
+
+    @price.setter
+    def price(self, price: float):
+        self.store.prices[self.store.rows[self.product_id]] = price
+
+    @property
+    def description(self) -> str:
+        return self.store.descriptions[self.store.rows[self.product_id]]
+
+    @description.setter
+    def description(self, description: str):
+        self.store.descriptions[self.store.rows[self.product_id]] = (
+            self.store._intern(description)
         )
-        # Clear manual cache on each new addition
-        self.clear_cache()
 
-    # Update the existing product details
-    def update_product(
+    @property
+    def category(self) -> Category:
+        return self.store.category_objects[
+            self.store.category_ids[self.store.rows[self.product_id]]
+        ]
+
+    @category.setter
+    def category(self, category: Category):
+        self.store.category_objects[category.category_id] = category
+        self.store.category_ids[self.store.rows[self.product_id]] = (
+            category.category_id
+        )
+
+    @property
+    def quantity(self) -> int:
+        return self.store.quantities[self.store.rows[self.product_id]]
+
+    @quantity.setter
+    def quantity(self, quantity: int):
+        self.store.quantities[self.store.rows[self.product_id]] = quantity
+
+    @property
+    def price_history(self):
+        return self.store.history(self.product_id)
+
+    # Same semantics as Product.update
+    def update(
         self,
-        product_id: int,
         name: str = None,
         price: float = None,
         description: str = None,
-        category_id: int = None,
+        category: Category = None,
         quantity: int = None,
+        changed_at: datetime = None,
     ):
-        if product_id not in self.products:
-            raise ValueError("Unable to find product using the passed in id")
+        if name:
+            self.name = name
+        if price is not None and price != self.price:
+            # Keep the history in the store before the price changes
+            history = self.store.history(self.product_id)
+            self.store.price_histories[self.product_id] = history
+            self.price = price
+            history.append((changed_at or datetime.now(), price))
+        if description:
+            self.description = description
+        if category:
+            self.category = category
+        if quantity is not None:
+            self.quantity = quantity
 
-        # Get existing product
-        product = self.products[product_id]
+    # A function to increase quantity
+    def increaseQuantity(self, increaseBy: int):
+        self.store.quantities[self.store.rows[self.product_id]] += increaseBy
 
-        # Check if category changed, if changed get the new category
-        # If new category id exists, get the category by id or use existing
-        category = (
-            self.categories.get(category_id, product.category)
-            if category_id
-            else product.category
+    # A function to decrease quantity
+    def decreaseQuantity(self, increaseBy: int):
+        self.store.quantities[self.store.rows[self.product_id]] -= increaseBy
+
+    # A Product copy of the row that no longer depends on the store
+    def detach(self) -> Product:
+        product = Product(
+            self.product_id,
+            self.name,
+            self.price,
+            self.description,
+            self.category,
+            self.quantity,
         )
+        product.price_history = self.price_history.copy()
+        return product
 
-        # Finally call in product update function to update the values
-        product.update(name, price, description, category, quantity)
-        # Clear manual cache on each new update
-        self.clear_cache()
+    # Same as detach, so products and views are copied alike
+    def copy(self) -> Product:
+        return self.detach()
 
-    # Increase product quantity by quantity
-    def increase_product_quantity(self, product_id: int, quantity: int):
-        if product_id not in self.products:
-            raise ValueError("Unable to find the product using passed in id")
+    # Views of the same row are equal
+    def __eq__(self, other):
+        return (
+            isinstance(other, ProductView)
+            and other.store is self.store
+            and other.product_id == self.product_id
+        )
 
-        self.products[product_id].increaseQuantity(quantity)
-        # Clear manual cache on each new update
-        self.clear_cache()
+    def __hash__(self):
+        return hash(self.product_id)
 
-    # Decrease product quantity by quantity
-    def decrease_product_quantity(self, product_id: int, quantity: int):
-        if product_id not in self.products:
-            raise ValueError("Unable to find the product using passed in id")
+    # Same layout as Product
+    def __repr__(self):
+        return f"Product Id: {self.product_id}, Product Price: {self.price}, Product Name: {self.name}, Description: {self.description}, Quantity: {self.quantity}, Category:{self.category.name}"
 
-        self.products[product_id].decreaseQuantity(quantity)
-        # Clear manual cache on each new update
-        self.clear_cache()
 
-    # View product price history
-    @lru_cache(maxsize=20000)  # Adding the cache
-    def get_product_price_history(self, product_id: int):
-        if product_id not in self.products:
-            raise ValueError("Unable to find the product using passed in id")
+# Defining a sorted price index
+# Stores prices and product ids in two parallel typed arrays sorted by (price, product_id)
+# A price range is located with two binary searches, so a range query costs O(log n + k)
+class PriceIndex:
+    # Constructor to initialize an empty index
+    def __init__(self):
+        self.prices = array("d")
+        self.product_ids = array("q")
 
-        return self.products[product_id].price_history
+    # Add a product price while keeping the arrays sorted
+    def add(self, price: float, product_id: int):
+        position = self._position(price, product_id)
+        self.prices.insert(position, price)
+        self.product_ids.insert(position, product_id)
 
-    # Search product by name
-    def search_product_by_name_no_cache(self, name: str):
-        return [
-            product
-            for product in self.products.values()
-            if name.lower() in product.name.lower()
-        ]
+    # Add many product prices at once by merging them into the sorted arrays
+    # A few pairs are inserted at their binary searched positions and the runs
+    # between them are copied as array slices, so the existing entries are never
+    # visited one by one. Larger batches are merged with a single sort
+    def add_many(self, pairs):
+        pairs = sorted(pairs)
+        if len(pairs) * 8 > len(self.prices):
+            entries = sorted(chain(zip(self.prices, self.product_ids), pairs))
+            self.prices = array("d", [price for price, _ in entries])
+            self.product_ids = array("q", [product_id for _, product_id in entries])
+            return
+        prices = array("d")
+        product_ids = array("q")
+        start = 0
+        for price, product_id in pairs:
+            position = self._position(price, product_id)
+            prices.extend(self.prices[start:position])
+            product_ids.extend(self.product_ids[start:position])
+            prices.append(price)
+            product_ids.append(product_id)
+            start = position
+        prices.extend(self.prices[start:])
+        product_ids.extend(self.product_ids[start:])
+        self.prices = prices
+        self.product_ids = product_ids
 
-    @lru_cache(maxsize=20000)  # Adding the cache
-    def search_product_by_name(self, name: str):
-        return [
-            product
-            for product in self.products.values()
-            if name.lower() in product.name.lower()
-        ]
+    # Remove a product price, the exact pair is located using binary search
+    def remove(self, price: float, product_id: int):
+        position = self._position(price, product_id)
+        if (
+            position < len(self.prices)
+            and self.prices[position] == price
+            and self.product_ids[position] == product_id
+        ):
+            del self.prices[position]
+            del self.product_ids[position]
 
-    # Manual cache memory search
-    def search_product_by_name_memo(self, name: str):
-        # If this name is present in the memory, return with the value
-        if name in self.memoized_search:
-            return self.memoized_search[name]
-        result = [
-            product
-            for product in self.products.values()
-            if name.lower() in product.name.lower()
-        ]
-        # Store this value to cache
-        self.memoized_search[name] = result
-        return result
+    # Remove many product prices at once
+    # Every pair is located with binary search and the runs between them are
+    # copied as array slices, pairs which are not in the index are ignored
+    def remove_many(self, pairs):
+        positions = []
+        for price, product_id in pairs:
+            position = self._position(price, product_id)
+            if (
+                position < len(self.prices)
+                and self.prices[position] == price
+                and self.product_ids[position] == product_id
+            ):
+                positions.append(position)
+        if not positions:
+            return
+        positions.sort()
+        prices = array("d")
+        product_ids = array("q")
+        start = 0
+        for position in positions:
+            prices.extend(self.prices[start:position])
+            product_ids.extend(self.product_ids[start:position])
+            start = position + 1
+        prices.extend(self.prices[start:])
+        product_ids.extend(self.product_ids[start:])
+        self.prices = prices
+        self.product_ids = product_ids
 
-    # Search product by price range
-    def search_product_by_price_range_no_cache(
-        self, min_price: float, max_price: float
+    # Return the product ids whose price is between min and max price (inclusive)
+    # Results are ordered by price and then by product id
+    def find_range(self, min_price: float, max_price: float):
+        low = bisect_left(self.prices, min_price)
+        high = bisect_right(self.prices, max_price)
+        return self.product_ids[low:high]
+
+    # Yield the product ids whose price is between min and max price (inclusive)
+    # Iteration resumes after the (price, product_id) pair passed in as after
+    def iter_range(
+        self, min_price: float, max_price: float, after=None, reverse: bool = False
     ):
-        return [
-            product
-            for product in self.products.values()
-            if min_price <= product.price <= max_price
-        ]
+        product_ids = self.product_ids
+        for position in self._range(min_price, max_price, after, reverse):
+            yield product_ids[position]
 
-    @lru_cache(maxsize=20000)  # Adding the cache
-    def search_product_by_price_range(self, min_price: float, max_price: float):
-        return [
-            product
-            for product in self.products.values()
-            if min_price <= product.price <= max_price
-        ]
+    # Yield the (price, product_id) pairs of iter_range, so the ranges of several
+    # indexes can be merged
+    def iter_pairs(
+        self, min_price: float, max_price: float, after=None, reverse: bool = False
+    ):
+        prices = self.prices
+        product_ids = self.product_ids
+        for position in self._range(min_price, max_price, after, reverse):
+            yield prices[position], product_ids[position]
 
-    # Manual cache memory search
-    def search_product_by_price_range_memo(self, min_price: float, max_price: float):
-        # Setup a unique key with min and max price
-        key = f"{min_price}-{max_price}"
-        # If this key is present, return value from memory
-        if key in self.memoized_search:
-            return self.memoized_search[key]
-        # Add this result to cache
-        result = [
-            product
-            for product in self.products.values()
-            if min_price <= product.price <= max_price
-        ]
-        self.memoized_search[key] = result
-        return result
+    # Number of product prices between min and max price (inclusive)
+    def count(self, min_price: float, max_price: float) -> int:
+        low = bisect_left(self.prices, min_price)
+        return bisect_right(self.prices, max_price, low) - low
 
-    # Search product by category id
-    def search_product_by_category_id_no_cache(self, category_id: int):
-        return [
-            product
-            for product in self.products.values()
-            if product.category.category_id == category_id
-        ]
+    # Number of indexed products
+    def __len__(self):
+        return len(self.prices)
 
-    @lru_cache(maxsize=20000)  # Adding the cache
-    def search_product_by_category_id(self, category_id: int):
-        return [
-            product
-            for product in self.products.values()
-            if product.category.category_id == category_id
-        ]
+    # Positions of the price range, after the (price, product_id) pair if passed
+    def _range(self, min_price: float, max_price: float, after, reverse: bool):
+        low = bisect_left(self.prices, min_price)
+        high = bisect_right(self.prices, max_price)
+        if after is not None:
+            position = self._position(*after)
+            if reverse:
+                high = min(high, position)
+            else:
+                if (
+                    position < len(self.prices)
+                    and self.prices[position] == after[0]
+                    and self.product_ids[position] == after[1]
+                ):
+                    position += 1
+                low = max(low, position)
+        return range(high - 1, low - 1, -1) if reverse else range(low, high)
 
-    # Manual memoization
-    def search_product_by_category_id_memo(self, category_id: int):
-        # Setup a unique key with category id
-        key = f"category-{category_id}"
-        if key in self.memoized_search:
-            return self.memoized_search[key]
+    # Position of the (price, product_id) pair, ids with equal prices are sorted
+    def _position(self, price: float, product_id: int) -> int:
+        low = bisect_left(self.prices, price)
+        high = bisect_right(self.prices, price, low)
+        return bisect_left(self.product_ids, product_id, low, high)
 
-        result = [
-            product
-            for product in self.products.values()
-            if product.category.category_id == category_id
-        ]
-        self.memoized_search[key] = result
-        return result
 
-    # Search product by category name
-    def search_product_by_category_name_no_cache(self, name: str):
-        return [
-            product
-            for product in self.products.values()
-            if name.lower() in product.category.name.lower()
-        ]
+# Defining a binary min-heap of items by priority with a position map
+# The position of every item is tracked, so an item can be updated or removed
+# in O(log n) and the smallest item is read in O(1)
+# Items with equal priority are ordered by item id
+# A loader returning the item ids and priorities in sorted order fills the heap
+# on first use instead, a sorted list is already a heap so nothing is moved
+class IndexedMinHeap:
+    # Constructor to initialize an empty heap
+    def __init__(self, loader=None):
+        self.entries = []
+        self.positions = {}
+        self.loader = loader
+        # Replaced with a real lock when the inventory is shared between threads
+        self.lock = nullcontext()
 
-    @lru_cache(maxsize=20000)  # Adding the cache
-    def search_product_by_category_name(self, name: str):
-        return [
-            product
-            for product in self.products.values()
-            if name.lower() in product.category.name.lower()
-        ]
+    # Add an item, or move an existing item to its new priority
+    def push(self, item_id, priority):
+        if self.loader is not None:
+            self._load()
+        entry = (priority, item_id)
+        with self.lock:
+            position = self.positions.get(item_id)
+            if position is None:
+                self.entries.append(entry)
+                self.positions[item_id] = len(self.entries) - 1
+                self._sift_up(len(self.entries) - 1)
+                return
+            old_entry = self.entries[position]
+            self.entries[position] = entry
+            if entry < old_entry:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
 
-    # Manual
-    def search_product_by_category_name_memo(self, name: str):
-        # Setup a unique key with category name
-        key = name
-        if key in self.memoized_search:
-            return self.memoized_search[key]
-        result = [
-            product
-            for product in self.products.values()
-            if name.lower() in product.category.name.lower()
-        ]
-        self.memoized_search[key] = result
-        return result
+    # Add many (item_id, priority) pairs at once by rebuilding the heap in O(n)
+    def push_many(self, items):
+        if self.loader is not None:
+            self._load()
+        with self.lock:
+            entries = self.entries
+            positions = self.positions
+            for item_id, priority in items:
+                position = positions.get(item_id)
+                if position is None:
+                    positions[item_id] = len(entries)
+                    entries.append((priority, item_id))
+                else:
+                    entries[position] = (priority, item_id)
+            for position in range(len(entries) // 2 - 1, -1, -1):
+                self._sift_down(position)
 
-    # A method to clear all cache
-    def clear_cache(self):
-        # Clearing all the manual cache
-        self.memoized_search.clear()
-        # Clearing all the automatic cache
-        self.search_category_by_name.cache_clear()
-        self.search_product_by_category_id.cache_clear()
-        self.search_product_by_category_name.cache_clear()
-        self.search_product_by_name.cache_clear()
-        self.search_product_by_price_range.cache_clear()
+    # Remove an item if it is in the heap
+    def remove(self, item_id):
+        if self.loader is not None:
+            self._load()
+        with self.lock:
+            position = self.positions.pop(item_id, None)
+            if position is None:
+                return
+            last = self.entries.pop()
+            if position == len(self.entries):
+                return
+            old_entry = self.entries[position]
+            self.entries[position] = last
+            self.positions[last[1]] = position
+            if last < old_entry:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
 
-    # Finally a product to print the inventory class
-    def __repr__(self):
-        return f"Inventory Details \nCategories:{list(self.categories.values())}, \n\nProducts:{list(self.products.values())})"
+    # The (priority, item_id) pair of the smallest item, None if the heap is empty
+    def peek(self):
+        if self.loader is not None:
+            self._load()
+        with self.lock:
+            return self.entries[0] if self.entries else None
 
+    # The (priority, item_id) pairs with a priority at or below the threshold
+    # Only the matching items and their children are visited, results are sorted
+    def at_most(self, threshold) -> list:
+        if self.loader is not None:
+            self._load()
+        with self.lock:
+            entries = self.entries
+            found = []
+            stack = [0] if entries else []
+            while stack:
+                position = stack.pop()
+                entry = entries[position]
+                if entry[0] > threshold:
+                    continue
+                found.append(entry)
+                child = 2 * position + 1
+                if child < len(entries):
+                    stack.append(child)
+                if child + 1 < len(entries):
+                    stack.append(child + 1)
+        found.sort()
+        return found
 
-## ****************************** ##
-## Comprehensive Test Case
-## ****************************** ##
-## Initializing the inventory
-inventory = Inventory()
-print("******************************")
-print("*** Initializing Inventory ***")
-print("******************************")
-
-## Add in the product categories
-start = time.time()
-for i in range(0, 20000):
-    inventory.add_new_category(i, f"Category-{i}")
-end = time.time()
-print("\n******************************")
-print("Adding new category")
-print("******************************")
-print("20000 new categories are added")
-print(f"Execution time - {end-start} seconds")
-print("Current inventory category size", len(inventory.categories))
-print("******************************")
-
-
-# Adding in products
-start = time.time()
-for i in range(0, 100000):
-    inventory.add_product(
-        i,
-        f"Product-{i}",
-        random.uniform(1, 200),
-        "Simple Description",
-        random.randint(1, 10000),
-        random.randint(1, 1000),
-    )
-end = time.time()
-print("\n******************************")
-print("Adding new products")
-print("******************************")
-print("100000 new products are added")
-print(f"Execution time - {end-start} seconds")
-print("Current inventory products size", len(inventory.products))
-print("******************************")
-
-# Testing to check basic functionalities such as add, update, search
-print("\n******************************")
-print("Basic functionality testing")
-print("******************************")
-
-# Beginning category class functionality testing
-print("\nCategory class functionality testing")
-print("Find Category by name functionality testing")
-print("Find Category by name - Category-10000")
-print(
-    f"Regular Search No Cache - {inventory.search_category_by_name_no_cache("Category-10000")}"
-)
-print(
-    f"Regular Search LRU Cache - {inventory.search_category_by_name("Category-10000")}"
-)
-print(
-    f"Regular Search Custom Memoized Cache - {inventory.search_category_by_name_memo("Category-10000")}"
-)
-
-print("\nUpdate category - Category-10000 to False status")
-inventory.update_category(10000, None, False)
-print(
-    f"Regular Search No Cache after update - {inventory.search_category_by_name_no_cache("Category-10000")}"
-)
-
-print("\nAdding new category - New Category")
-inventory.add_new_category(50000, "New Category", True)
-print(
-    f"Regular Search New Category No Cache Before Deletion - {inventory.search_category_by_name_no_cache("New Category")}"
-)
-print("Deleting new category - New Category")
-inventory.delete_category(50000)
-print(
-    f"Regular Search New Category No Cache After Deletion - {inventory.search_category_by_name_no_cache("New Category")}"
-)
-
-print("\n******************************")
-print("Product Class functionality testing")
-print("******************************")
-print("\nFind Products by name functionality testing")
-print("Find Products by name - Product-10000")
-print(
-    f"Regular Search No Cache - {inventory.search_product_by_name_no_cache("Product-10000")}"
-)
-print(f"Regular Search LRU Cache - {inventory.search_product_by_name("Product-10000")}")
-print(
-    f"Regular Search Custom Memoized Cache - {inventory.search_product_by_name_memo("Product-10000")}"
-)
-
-print("\nFind Products by price range functionality testing")
-print("Find Products by price range - 5 - 5.1")
-print(
-    f"Regular Search No Cache - {inventory.search_product_by_price_range_no_cache(5,5.1)}"
-)
-print(f"\nRegular Search LRU Cache - {inventory.search_product_by_price_range(5,5.1)}")
-print(
-    f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_price_range_memo(5,5.1)}"
-)
-
-print("\nFind Products by category id")
-print(
-    f"Regular Search No Cache - {inventory.search_product_by_category_id_no_cache(10000)}"
-)
-print(f"\nRegular Search LRU Cache - {inventory.search_product_by_category_id(10000)}")
-print(
-    f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_category_id_memo(10000)}"
-)
-
-print("\nFind Products by category name")
-print(
-    f"Regular Search No Cache - {inventory.search_product_by_category_name_no_cache("Category-10000")}"
-)
-print(
-    f"\nRegular Search LRU Cache - {inventory.search_product_by_category_name("Category-10000")}"
-)
-print(
-    f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_category_name_memo("Category-10000")}"
-)
-
-print(
-    "\nTest case to add a new product, update it, get its price history, and delete it"
-)
-inventory.add_product(9999999, "New Product", 500, "", 1000, 50)
-print(
-    "After adding new product - New Product -",
-    inventory.search_product_by_name("New Product"),
-)
-inventory.update_product(9999999, None, 450, "Description")
-print(
-    "After updating new product information - New Product -",
-    inventory.search_product_by_name("New Product"),
-)
-print("Price history of new product", inventory.get_product_price_history(9999999))
-inventory.increase_product_quantity(9999999, 50)
-print(
-    "After increasing product quantity by 50 - New Product quantity must be 100 -",
-    inventory.search_product_by_name("New Product"),
-)
-inventory.decrease_product_quantity(9999999, 40)
-print(
-    "After decreasing product quantity by 40 - New Product quantity must be 60 -",
-    inventory.search_product_by_name("New Product"),
-)
-
-
-# Beginning stress testing
-# Storing the execution time for each search
-# Creating a test case method to conduct the test
-searchTimes = {
-    "categoryName": [],
-    "productName": [],
-    "priceRange": [],
-    "productByCategegoryName": [],
-    "productByCategegoryId": [],
-}
-automaticCacheSearchTimes = {
-    "categoryName": [],
-    "productName": [],
-    "priceRange": [],
-    "productByCategegoryName": [],
-    "productByCategegoryId": [],
-}
-manualCacheSearchTimes = {
-    "categoryName": [],
-    "productName": [],
-    "priceRange": [],
-    "productByCategegoryName": [],
-    "productByCategegoryId": [],
-}
+    def __contains__(self, item_id):
+        if self.loader is not None:
+            self._load()
+        return item_id in self.positions
 
-# For general conduct 100 tests
-for _ in range(100):
-    # First search criterias
-    search_category_name = f"Category-{random.randint(1,10000)}"
-    search_product_name = f"Product-{random.randint(1,10000)}"
-    search_min_price = random.uniform(1, 200)
-    search_max_price = random.uniform(1, 200)
-    search_category_id = random.randint(1, 10000)
-
-    # Measuring the time for each search functionality
-    # *******************************
-    # Searching category by name
-    # *******************************
-    start = time.time()
-    inventory.search_category_by_name_no_cache(search_category_name)
-    end = time.time()
-    searchTimes["categoryName"].append(end - start)
-    # print(search_category_name)
-    # print(inventory.search_category_by_name_no_cache(search_category_name))
-    # Automatic cache
-    start = time.time()
-    inventory.search_category_by_name(search_category_name)
-    end = time.time()
-    automaticCacheSearchTimes["categoryName"].append(end - start)
-    # print(search_category_name)
-    # print(inventory.search_category_by_name(search_category_name))
-    # Manual Cache
-    start = time.time()
-    inventory.search_category_by_name_memo(search_category_name)
-    end = time.time()
-    manualCacheSearchTimes["categoryName"].append(end - start)
-    # print(search_category_name)
-    # print(inventory.search_category_by_name_memo(search_category_name))
+    def __len__(self):
+        if self.loader is not None:
+            self._load()
+        return len(self.entries)
 
-    # *******************************
-    # Searching product by name
-    # *******************************
-    start = time.time()
-    inventory.search_product_by_name_no_cache(search_product_name)
-    end = time.time()
-    searchTimes["productName"].append(end - start)
-    # Automatic cache
-    start = time.time()
-    inventory.search_product_by_name(search_product_name)
-    end = time.time()
-    automaticCacheSearchTimes["productName"].append(end - start)
-    # Manual Cache
-    start = time.time()
-    inventory.search_product_by_name_memo(search_product_name)
-    end = time.time()
-    manualCacheSearchTimes["productName"].append(end - start)
+    # Fill the heap from the loader
+    def _load(self):
+        with self.lock:
+            if self.loader is None:
+                return
+            item_ids, priorities = self.loader()
+            self.entries = list(zip(priorities, item_ids))
+            self.positions = dict(zip(item_ids, range(len(self.entries))))
+            self.loader = None
 
-    # *******************************
-    # Searching product by price range
-    # *******************************
-    start = time.time()
-    inventory.search_product_by_price_range_no_cache(search_min_price, search_max_price)
-    end = time.time()
-    searchTimes["priceRange"].append(end - start)
-    # Automatic cache
-    start = time.time()
-    inventory.search_product_by_price_range(search_min_price, search_max_price)
-    end = time.time()
-    automaticCacheSearchTimes["priceRange"].append(end - start)
-    # Manual Cache
-    start = time.time()
-    inventory.search_product_by_price_range_memo(search_min_price, search_max_price)
-    end = time.time()
-    manualCacheSearchTimes["priceRange"].append(end - start)
+    # Move the entry up while it is smaller than its parent
+    def _sift_up(self, position: int):
+        entries = self.entries
+        positions = self.positions
+        entry = entries[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if entries[parent] <= entry:
+                break
+            entries[position] = entries[parent]
+            positions[entries[position][1]] = position
+            position = parent
+        entries[position] = entry
+        positions[entry[1]] = position
 
-    # *******************************
-    # Searching prodcut by category id
-    # *******************************
-    start = time.time()
-    inventory.search_product_by_category_id_no_cache(search_category_id)
-    end = time.time()
-    searchTimes["productByCategegoryId"].append(end - start)
-    # Automatic cache
-    start = time.time()
-    inventory.search_product_by_category_id(search_category_id)
-    end = time.time()
-    automaticCacheSearchTimes["productByCategegoryId"].append(end - start)
-    # Manual Cache
-    start = time.time()
-    inventory.search_product_by_category_id_memo(search_category_id)
-    end = time.time()
-    manualCacheSearchTimes["productByCategegoryId"].append(end - start)
+    # Move the entry down while a child is smaller
+    def _sift_down(self, position: int):
+        entries = self.entries
+        positions = self.positions
+        size = len(entries)
+        entry = entries[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and entries[child + 1] < entries[child]:
+                child += 1
+            if entry <= entries[child]:
+                break
+            entries[position] = entries[child]
+            positions[entries[position][1]] = position
+            position = child
+        entries[position] = entry
+        positions[entry[1]] = position
+
+
+# Defining an inverted n-gram index for case-insensitive substring search
+# Every casefolded search name is split into its overlapping n-grams (trigrams
+# by default) and each n-gram maps to the ids of the names containing it
+# A query only verifies the ids found in all of its n-gram postings
+# A loader yielding (id, search name) pairs builds the index on first use instead
+# A compact index keeps every posting as a sorted array of integer ids, 8 bytes
+# per id instead of about 45 in a set. Its searches verify the smallest posting
+# instead of intersecting them, and adding an id below the largest one of a
+# posting moves the ids after it
+class NgramIndex:
+    # Constructor to initialize an empty index
+    def __init__(self, n: int = 3, loader=None, compact: bool = False):
+        self.n = n
+        self.compact = compact
+        self.postings = {}
+        # The search name of every indexed id, shared with the product or category
+        self.keys = {}
+        self.loader = loader
+        # Concurrent readers may trigger the first load at the same time
+        self.load_lock = threading.Lock()
+        # Number of names compared by searches, reported by the inventory metrics
+        self.scanned = 0
+
+    # Add a casefolded search name to the index
+    def add(self, item_id, key: str):
+        if self.loader is not None:
+            self._load()
+        self.keys[item_id] = key
+        if self.compact:
+            for gram in self._grams(key):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    self.postings[gram] = array("q", (item_id,))
+                elif not posting or posting[-1] < item_id:
+                    posting.append(item_id)
+                else:
+                    index = bisect_left(posting, item_id)
+                    if posting[index] != item_id:
+                        posting.insert(index, item_id)
+            return
+        for gram in self._grams(key):
+            self.postings.setdefault(gram, set()).add(item_id)
+
+    # Add many (id, search name) pairs of ids not in the index yet
+    # A compact index sorts the new ids of every n-gram and merges each posting
+    # once, so unsorted ids do not move the posting for every name
+    def add_many(self, items):
+        if not self.compact:
+            for item_id, key in items:
+                self.add(item_id, key)
+            return
+        if self.loader is not None:
+            self._load()
+        added = {}
+        for item_id, key in items:
+            self.keys[item_id] = key
+            for gram in self._grams(key):
+                added.setdefault(gram, []).append(item_id)
+        postings = self.postings
+        for gram, item_ids in added.items():
+            item_ids.sort()
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array("q", item_ids)
+            elif not posting or posting[-1] < item_ids[0]:
+                posting.extend(item_ids)
+            else:
+                # Sorting two sorted runs merges them
+                postings[gram] = array("q", sorted(chain(posting, item_ids)))
+
+    # Remove a name from the index
+    def remove(self, item_id):
+        if self.loader is not None:
+            self._load()
+        key = self.keys.pop(item_id, None)
+        if key is None:
+            return
+        for gram in self._grams(key):
+            posting = self.postings[gram]
+            if self.compact:
+                index = bisect_left(posting, item_id)
+                if index < len(posting) and posting[index] == item_id:
+                    del posting[index]
+            else:
+                posting.discard(item_id)
+            if not posting:
+                del self.postings[gram]
+
+    # Return the ids whose name contains the query, ignoring case
+    def search(self, query: str):
+        if self.loader is not None:
+            self._load()
+        query = query.casefold()
+        keys = self.keys
+        # Queries shorter than an n-gram have no postings, compare the stored keys
+        if len(query) < self.n:
+            self.scanned += len(keys)
+            return [item_id for item_id, key in keys.items() if query in key]
+
+        # Intersect the postings starting with the smallest one
+        postings = sorted(
+            (self.postings.get(gram, ()) for gram in self._grams(query)), key=len
+        )
+        if not postings[0]:
+            return []
+        if self.compact:
+            candidates = postings[0]
+        else:
+            candidates = postings[0].intersection(*postings[1:])
+        self.scanned += len(candidates)
+        return [item_id for item_id in candidates if query in keys[item_id]]
+
+    # Upper bound of the number of ids a search would compare, the size of the
+    # smallest posting of the query n-grams
+    def estimate(self, query: str) -> int:
+        if self.loader is not None:
+            self._load()
+        query = query.casefold()
+        if len(query) < self.n:
+            return len(self.keys)
+        return min(len(self.postings.get(gram, ())) for gram in self._grams(query))
+
+    # Number of indexed names
+    def __len__(self):
+        if self.loader is not None:
+            self._load()
+        return len(self.keys)
+
+    # Build the index from the loader
+    def _load(self):
+        with self.load_lock:
+            if self.loader is None:
+                return
+            loader = self.loader
+            for item_id, key in loader():
+                self.keys[item_id] = key
+                for gram in self._grams(key):
+                    self.postings.setdefault(gram, set()).add(item_id)
+            if self.compact:
+                for gram, posting in self.postings.items():
+                    self.postings[gram] = array("q", sorted(posting))
+            self.loader = None
+
+    # The distinct n-grams of a search name
+    def _grams(self, key: str):
+        n = self.n
+        return {key[i : i + n] for i in range(len(key) - n + 1)}
+
+
+# Cached (low, high) range keys, grouped by the power of two above their width
+# Each group is sorted by the low bound, so the ranges holding a value are found
+# between the value and twice the group width below it, not by visiting them all
+class RangeKeys:
+    # Constructor to initialize the empty groups
+    def __init__(self):
+        # Sorted keys by the width they are grouped under
+        self.groups = {}
+        # Ranges with an infinite or nan width are compared one by one
+        self.unbounded = set()
+        self.size = 0
+
+    # Add a range key, a range whose low bound is above its high holds nothing
+    def add(self, key):
+        low, high = key
+        width = high - low
+        if not isfinite(width):
+            if key in self.unbounded:
+                return
+            self.unbounded.add(key)
+        elif width >= 0:
+            keys = self.groups.setdefault(self._span(width), [])
+            index = bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                return
+            keys.insert(index, key)
+        else:
+            return
+        self.size += 1
+
+    # Remove a range key if it was added
+    def discard(self, key):
+        low, high = key
+        width = high - low
+        if not isfinite(width):
+            if key in self.unbounded:
+                self.unbounded.remove(key)
+                self.size -= 1
+            return
+        if width < 0:
+            return
+        span = self._span(width)
+        keys = self.groups[span]
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            del keys[index]
+            self.size -= 1
+            if not keys:
+                del self.groups[span]
+
+    # The range keys holding the value
+    def containing(self, value) -> list:
+        found = [key for key in self.unbounded if key[0] <= value <= key[1]]
+        for span, keys in self.groups.items():
+            start = bisect_left(keys, (value - 2 * span,))
+            end = bisect_right(keys, (value, inf))
+            found += [key for key in keys[start:end] if value <= key[1]]
+        return found
+
+    # Number of range keys
+    def __len__(self):
+        return self.size
+
+    # The power of two above the width, widths under it share the group
+    @staticmethod
+    def _span(width) -> float:
+        return ldexp(1.0, frexp(width)[1]) if width else 0.0
+
+
+# Defining a dependency tracked search cache
+# Results are grouped by the kind of search that produced them, so a mutation
+# only invalidates the entries of the searches whose results it could change
+# The cache can be bounded by the number of entries and by the total number of
+# references held in the cached results, evicting with an LRU, LFU or TTL policy
+class SearchCache:
+    POLICIES = ("lru", "lfu", "ttl")
+    # Kinds whose keys are (low, high) ranges, indexed by the range they cover
+    RANGE_KINDS = ("price_range",)
+
+    # Constructor to initialize an empty cache and its counters
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_result_size: int = None,
+        policy: str = "lru",
+        ttl: float = None,
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Cache policy must be one of {self.POLICIES}")
+        if policy == "ttl" and ttl is None:
+            raise ValueError("A ttl in seconds is required for the ttl policy")
+        self.max_entries = max_entries
+        self.max_result_size = max_result_size
+        self.policy = policy
+        self.ttl = ttl
+        # Entries keyed by (kind, key), ordered by recency for lru and by
+        # insertion for ttl
+        self.entries = OrderedDict()
+        # Keys of the cached searches grouped by kind
+        self.kinds = {}
+        # Keys of the cached range searches indexed by their bounds
+        self.ranges = {}
+        # lfu bookkeeping, the use count of each entry and entries grouped by count
+        self.frequency = {}
+        self.frequency_buckets = {}
+        self.min_frequency = 0
+        # ttl bookkeeping, the expiry time of each entry
+        self.expires = {}
+        # Memory accounting
+        self.result_size = 0
+        self.result_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        # Replaced with a real lock when the inventory is shared between threads
+        self.lock = nullcontext()
+
+    # Return the cached result for the search, or None on a miss
+    def get(self, kind: str, key):
+        with self.lock:
+            entry = (kind, key)
+            result = self.entries.get(entry)
+            if result is not None and self.policy == "ttl":
+                if self.expires[entry] <= time.monotonic():
+                    self._remove(entry)
+                    self.evictions += 1
+                    result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.policy == "lru":
+                self.entries.move_to_end(entry)
+            elif self.policy == "lfu":
+                self._increase_frequency(entry)
+            return result
+
+    # Store the result of a search, evicting entries to stay within the limits
+    def put(self, kind: str, key, result):
+        with self.lock:
+            entry = (kind, key)
+            if entry in self.entries:
+                self._remove(entry)
+            # A cache without room never stores anything
+            if self.max_entries == 0:
+                return
+            # A result larger than the whole cache budget is never cached
+            if self.max_result_size is not None and len(result) > self.max_result_size:
+                return
+            if self.policy == "ttl":
+                self._remove_expired()
+            while self.entries and (
+                (self.max_entries is not None and len(self.entries) >= self.max_entries)
+                or (
+                    self.max_result_size is not None
+                    and self.result_size + len(result) > self.max_result_size
+                )
+            ):
+                self._remove(self._victim())
+                self.evictions += 1
+
+            self.entries[entry] = result
+            self.kinds.setdefault(kind, set()).add(key)
+            if kind in self.RANGE_KINDS:
+                self.ranges.setdefault(kind, RangeKeys()).add(key)
+            self.result_size += len(result)
+            self.result_bytes += sys.getsizeof(result)
+            if self.policy == "lfu":
+                self.frequency[entry] = 1
+                self.frequency_buckets.setdefault(1, {})[entry] = None
+                self.min_frequency = 1
+            elif self.policy == "ttl":
+                self.expires[entry] = time.monotonic() + self.ttl
+
+    # Remove a single cached search
+    def discard(self, kind: str, key):
+        with self.lock:
+            entry = (kind, key)
+            if entry in self.entries:
+                self._remove(entry)
+                self.invalidations += 1
+
+    # Remove every cached search of this kind whose key matches the predicate
+    def invalidate(self, kind: str, predicate):
+        with self.lock:
+            keys = self.kinds.get(kind)
+            if not keys:
+                return
+            stale = [key for key in keys if predicate(key)]
+            for key in stale:
+                self._remove((kind, key))
+            self.invalidations += len(stale)
+
+    # Remove every cached range search of this kind whose range holds the value
+    def invalidate_containing(self, kind: str, value):
+        with self.lock:
+            ranges = self.ranges.get(kind)
+            if not ranges:
+                return
+            stale = ranges.containing(value)
+            for key in stale:
+                self._remove((kind, key))
+            self.invalidations += len(stale)
+
+    # Remove every cached search of this kind whose query is part of the text
+    # The queries are looked up by the substrings of the text when they are
+    # fewer than the cached queries
+    def invalidate_substrings(self, kind: str, text: str):
+        with self.lock:
+            keys = self.kinds.get(kind)
+            if not keys:
+                return
+            length = len(text)
+            if length * (length + 1) // 2 < len(keys):
+                stale = keys.intersection(
+                    [text[i:j] for i in range(length) for j in range(i + 1, length + 1)]
+                )
+                if "" in keys:
+                    stale.add("")
+            else:
+                stale = [key for key in keys if key in text]
+            for key in stale:
+                self._remove((kind, key))
+            self.invalidations += len(stale)
+
+    # Remove every cached search
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.kinds.clear()
+            self.ranges.clear()
+            self.frequency.clear()
+            self.frequency_buckets.clear()
+            self.min_frequency = 0
+            self.expires.clear()
+            self.result_size = 0
+            self.result_bytes = 0
+
+    # Hit and miss rates, evictions and memory use of the cache
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "policy": self.policy,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "result_size": self.result_size,
+                "max_result_size": self.max_result_size,
+                "result_bytes": self.result_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "miss_rate": self.misses / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+    # Number of cached searches
+    def __len__(self):
+        return len(self.entries)
+
+    # Pick the entry to evict according to the policy
+    def _victim(self):
+        if self.policy == "lfu":
+            bucket = self.frequency_buckets.get(self.min_frequency)
+            if not bucket:
+                self.min_frequency = min(self.frequency_buckets)
+                bucket = self.frequency_buckets[self.min_frequency]
+            return next(iter(bucket))
+        # Least recently used for lru, oldest insertion for ttl
+        return next(iter(self.entries))
+
+    # Drop the expired entries, the oldest entries expire first
+    def _remove_expired(self):
+        now = time.monotonic()
+        while self.entries:
+            entry = next(iter(self.entries))
+            if self.expires[entry] > now:
+                break
+            self._remove(entry)
+            self.evictions += 1
+
+    # Move an lfu entry to the next frequency bucket
+    def _increase_frequency(self, entry):
+        count = self.frequency[entry]
+        bucket = self.frequency_buckets[count]
+        del bucket[entry]
+        if not bucket:
+            del self.frequency_buckets[count]
+            if self.min_frequency == count:
+                self.min_frequency = count + 1
+        self.frequency[entry] = count + 1
+        self.frequency_buckets.setdefault(count + 1, {})[entry] = None
+
+    # Remove an entry and its bookkeeping
+    def _remove(self, entry):
+        result = self.entries.pop(entry)
+        kind, key = entry
+        self.kinds[kind].discard(key)
+        if kind in self.ranges:
+            self.ranges[kind].discard(key)
+        self.result_size -= len(result)
+        self.result_bytes -= sys.getsizeof(result)
+        if self.policy == "lfu":
+            count = self.frequency.pop(entry)
+            bucket = self.frequency_buckets[count]
+            del bucket[entry]
+            if not bucket:
+                del self.frequency_buckets[count]
+        elif self.policy == "ttl":
+            del self.expires[entry]
+
+
+# Defining a vectorized query engine
+# Keeps product ids, prices, quantities and category ids as parallel NumPy arrays
+# so price, category and stock filters are evaluated as boolean masks over every
+# product at once. Bounds are inclusive like search_product_by_price_range
+# The arrays are rebuilt on the next query after the inventory changes
+class VectorQueryEngine:
+    # Constructor to bind the engine to an inventory
+    def __init__(self, inventory):
+        if np is None:
+            raise ImportError("NumPy is required for the vectorized query engine")
+        self.inventory = inventory
+        self.version = None
+        self.lock = threading.Lock()
+        self.product_ids = None
+        self.prices = None
+        self.quantities = None
+        self.category_ids = None
+
+    # Rebuild the columns if the inventory changed since they were built
+    # A shared inventory is read under its lock so writers cannot interleave
+    def refresh(self):
+        lock = self.inventory.lock
+        with self.lock:
+            if lock is None:
+                self._rebuild()
+                return
+            lock.acquire_read()
+            try:
+                self._rebuild()
+            finally:
+                lock.release()
+
+    def _rebuild(self):
+        if self.version == self.inventory.version:
+            return
+        products = self.inventory.products
+        if isinstance(products, ProductStore):
+            # The store columns are typed arrays, copy their buffers directly
+            self.product_ids = np.frombuffer(products.product_ids, np.int64).copy()
+            self.prices = np.frombuffer(products.prices, np.float64).copy()
+            self.quantities = np.frombuffer(products.quantities, np.int64).copy()
+            self.category_ids = np.frombuffer(products.category_ids, np.int64).copy()
+        else:
+            count = len(products)
+            values = products.values()
+            self.product_ids = np.fromiter(
+                (product.product_id for product in values), np.int64, count
+            )
+            self.prices = np.fromiter(
+                (product.price for product in values), np.float64, count
+            )
+            self.quantities = np.fromiter(
+                (product.quantity for product in values), np.int64, count
+            )
+            self.category_ids = np.fromiter(
+                (product.category.category_id for product in values), np.int64, count
+            )
+        self.version = self.inventory.version
+
+    # Boolean mask of the products matching every passed in predicate
+    def mask(
+        self,
+        category_ids=None,
+        min_price: float = None,
+        max_price: float = None,
+        in_stock: bool = False,
+    ):
+        self.refresh()
+        mask = np.ones(len(self.product_ids), dtype=bool)
+        if category_ids is not None:
+            mask &= np.isin(self.category_ids, np.fromiter(category_ids, np.int64))
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        if in_stock:
+            mask &= self.quantities > 0
+        return mask
+
+    # Product ids matching every passed in predicate
+    # For example filter({1, 2}, 10, 50, in_stock=True) is
+    # category in {1, 2} and 10 <= price <= 50 and quantity > 0
+    def filter(
+        self,
+        category_ids=None,
+        min_price: float = None,
+        max_price: float = None,
+        in_stock: bool = False,
+    ):
+        # The mask refreshes the columns, so it is computed before they are read
+        mask = self.mask(category_ids, min_price, max_price, in_stock)
+        return self.product_ids[mask]
+
+    # Same products and order as search_product_by_price_range, as product ids
+    def price_range(self, min_price: float, max_price: float):
+        mask = self.mask(min_price=min_price, max_price=max_price)
+        product_ids = self.product_ids[mask]
+        return product_ids[np.lexsort((product_ids, self.prices[mask]))]
+
+    # Same products as search_product_by_category_id, as product ids
+    def category_id(self, category_id: int):
+        self.refresh()
+        return self.product_ids[self.category_ids == category_id]
+
+    # Look up the products of the returned product ids
+    def products(self, product_ids):
+        products = self.inventory.products
+        return [products[product_id] for product_id in product_ids.tolist()]
+
+
+# Defining the binary snapshot format
+# A snapshot file holds, in order, a header, fixed-width category records,
+# fixed-width product records sorted by product id, price history segments,
+# the price index columns and an interned string table of names and descriptions
+# followed by the stock and category indexes
+# All numbers are little endian. The header records the offset of every section
+SNAPSHOT_MAGIC = b"INVSNAP\0"
+SNAPSHOT_VERSION = 3
+# magic, version, category, product, history and string counts, section offsets
+# Version 2 appends the sequence number of the last write-ahead log record
+# Version 3 appends the offsets of the stock and category indexes and the number
+# of categories with products
+SNAPSHOT_HEADERS = {
+    1: struct.Struct("<8sH6x10Q"),
+    2: struct.Struct("<8sH6x11Q"),
+    3: struct.Struct("<8sH6x14Q"),
+}
+SNAPSHOT_HEADER = SNAPSHOT_HEADERS[SNAPSHOT_VERSION]
+# category id, name string, flags
+SNAPSHOT_CATEGORY = struct.Struct("<qIB3x")
+# product id, price, quantity, category id, name string, description string,
+# first history entry and number of history entries
+SNAPSHOT_PRODUCT = struct.Struct("<qdqqIIQI4x")
+# timestamp, price
+SNAPSHOT_HISTORY = struct.Struct("<dd")
+# Category flags, deleted categories still referenced by products are detached
+CATEGORY_ACTIVE = 1
+CATEGORY_DETACHED = 2
+
+
+# Defining a memory-mapped snapshot file
+# Records and strings are read straight from the mapping when they are needed
+# The stock index holds the product ids and quantities sorted by quantity, and
+# the category index the (category id, product count) pairs of the categories
+# followed by their product ids, so loading them needs no pass over the records
+class SnapshotFile:
+    # Constructor to map the file and read its header
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as snapshot:
+            self.mmap = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from("<8sH", self.mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("The passed in file is not an inventory snapshot")
+        if version not in SNAPSHOT_HEADERS:
+            raise ValueError(f"Unsupported inventory snapshot version {version}")
+        fields = SNAPSHOT_HEADERS[version].unpack_from(self.mmap, 0)
+        (
+            self.category_count,
+            self.product_count,
+            self.history_count,
+            self.string_count,
+            self.categories_offset,
+            self.products_offset,
+            self.history_offset,
+            self.prices_offset,
+            self.strings_offset,
+            self.string_data_offset,
+        ) = fields[2:12]
+        # Snapshots written before the write-ahead log have no sequence number
+        self.lsn = fields[12] if version >= 2 else 0
+        # Snapshots written before version 3 have no stock and category indexes
+        if version >= 3:
+            self.stock_offset, self.groups_offset, self.group_count = fields[13:16]
+        else:
+            self.stock_offset = self.groups_offset = self.group_count = None
+
+    # Decode a string of the string table
+    def string(self, index: int) -> str:
+        start, end = struct.unpack_from(
+            "<2Q", self.mmap, self.strings_offset + index * 8
+        )
+        return str(
+            self.mmap[self.string_data_offset + start : self.string_data_offset + end],
+            "utf-8",
+        )
+
+    # Every category record
+    def category_records(self):
+        return SNAPSHOT_CATEGORY.iter_unpack(
+            self._section(self.categories_offset, self.category_count, SNAPSHOT_CATEGORY)
+        )
+
+    # Every product record, ordered by product id
+    def product_records(self):
+        return SNAPSHOT_PRODUCT.iter_unpack(
+            self._section(self.products_offset, self.product_count, SNAPSHOT_PRODUCT)
+        )
+
+    # Binary search the product records for the product id
+    def find_product(self, product_id: int):
+        low, high = 0, self.product_count
+        while low < high:
+            middle = (low + high) // 2
+            record = SNAPSHOT_PRODUCT.unpack_from(
+                self.mmap, self.products_offset + middle * SNAPSHOT_PRODUCT.size
+            )
+            if record[0] < product_id:
+                low = middle + 1
+            elif record[0] > product_id:
+                high = middle
+            else:
+                return record
+        return None
+
+    # The price history segment of a product
+    # Segments are packed (timestamp, price) pairs, the layout of PriceHistory
+    def price_history(self, start: int, count: int) -> PriceHistory:
+        return PriceHistory.frombytes(
+            self.mmap[
+                self.history_offset
+                + start * SNAPSHOT_HISTORY.size : self.history_offset
+                + (start + count) * SNAPSHOT_HISTORY.size
+            ]
+        )
+
+    # The price index columns, sorted by price and product id
+    def price_index(self) -> PriceIndex:
+        index = PriceIndex()
+        size = self.product_count * 8
+        index.prices.frombytes(self.mmap[self.prices_offset : self.prices_offset + size])
+        index.product_ids.frombytes(
+            self.mmap[self.prices_offset + size : self.prices_offset + 2 * size]
+        )
+        return index
+
+    # The product ids and quantities sorted by quantity and product id
+    def stock_index(self) -> tuple:
+        size = self.product_count * 8
+        product_ids = array("q")
+        quantities = array("q")
+        product_ids.frombytes(self.mmap[self.stock_offset : self.stock_offset + size])
+        quantities.frombytes(
+            self.mmap[self.stock_offset + size : self.stock_offset + 2 * size]
+        )
+        return product_ids, quantities
+
+    # The product ids of every category with products, as (category id, ids)
+    def category_index(self):
+        counts = array("q")
+        end = self.groups_offset + self.group_count * 16
+        counts.frombytes(self.mmap[self.groups_offset : end])
+        product_ids = array("q")
+        product_ids.frombytes(self.mmap[end : end + self.product_count * 8])
+        start = 0
+        for index in range(0, len(counts), 2):
+            yield counts[index], product_ids[start : start + counts[index + 1]]
+            start += counts[index + 1]
+
+    # Unmap the file, the records can no longer be read
+    def close(self):
+        self.mmap.close()
+
+    # Bytes of a section of fixed-width records
+    def _section(self, offset: int, count: int, record: struct.Struct):
+        return memoryview(self.mmap)[offset : offset + count * record.size]
+
+
+# Defining the products of an inventory loaded from a snapshot
+# Products are materialized from their records on first access and kept, so
+# reads only touch the records they need. New and changed products live in
+# memory on top of the snapshot and deleted snapshot products are remembered
+class SnapshotProducts(MutableMapping):
+    # Constructor to serve the products of a snapshot file
+    def __init__(self, snapshot: SnapshotFile, categories: dict):
+        self.snapshot = snapshot
+        # Category of every category id, including detached categories
+        self.categories = categories
+        self.materialized = {}
+        self.deleted = set()
+        self.new_ids = set()
+
+    # Serve the products from a newer snapshot of the same inventory
+    # Every product is in its records, the materialized products are kept
+    def remap(self, snapshot: SnapshotFile):
+        self.snapshot = snapshot
+        self.deleted = set()
+        self.new_ids = set()
+
+    def __getitem__(self, product_id: int):
+        product = self.materialized.get(product_id)
+        if product is not None:
+            return product
+        if product_id in self.deleted:
+            raise KeyError(product_id)
+        record = self.snapshot.find_product(product_id)
+        if record is None:
+            raise KeyError(product_id)
+        # Concurrent readers materializing the same product share the first copy
+        return self.materialized.setdefault(product_id, self._materialize(record))
+
+    def __setitem__(self, product_id: int, product):
+        if product_id not in self:
+            if product_id in self.deleted:
+                self.deleted.discard(product_id)
+            else:
+                self.new_ids.add(product_id)
+        self.materialized[product_id] = product
+
+    def __delitem__(self, product_id: int):
+        if product_id not in self:
+            raise KeyError(product_id)
+        self.materialized.pop(product_id, None)
+        if product_id in self.new_ids:
+            self.new_ids.discard(product_id)
+        else:
+            self.deleted.add(product_id)
+
+    def __contains__(self, product_id):
+        if product_id in self.materialized:
+            return True
+        return (
+            product_id not in self.deleted
+            and product_id not in self.new_ids
+            and self.snapshot.find_product(product_id) is not None
+        )
+
+    # Snapshot products in product id order followed by the new products
+    def __iter__(self):
+        deleted = self.deleted
+        for record in self.snapshot.product_records():
+            if record[0] not in deleted:
+                yield record[0]
+        yield from list(self.new_ids)
+
+    def __len__(self):
+        return self.snapshot.product_count - len(self.deleted) + len(self.new_ids)
+
+    # Build the product of a record
+    def _materialize(self, record) -> Product:
+        (
+            product_id,
+            price,
+            quantity,
+            category_id,
+            name,
+            description,
+            history_start,
+            history_count,
+        ) = record
+        product = Product(
+            product_id,
+            self.snapshot.string(name),
+            price,
+            self.snapshot.string(description),
+            self.categories[category_id],
+            quantity,
+        )
+        product.price_history = self.snapshot.price_history(
+            history_start, history_count
+        )
+        return product
+
+
+# Defining a reader-writer lock
+# Many readers can hold the lock at once, a writer holds it alone
+# Waiting writers block new readers, so a steady stream of reads cannot starve them
+# The lock is reentrant per thread, a writer may also read but a reader
+# cannot upgrade to a writer
+class ReadWriteLock:
+    # Constructor to initialize an unlocked lock
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        # Depth and mode of the lock held by the current thread
+        self.held = threading.local()
+
+    # Acquire the lock for reading
+    def acquire_read(self):
+        depth = getattr(self.held, "depth", 0)
+        if depth:
+            self.held.depth = depth + 1
+            return
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        self.held.depth = 1
+        self.held.writing = False
+
+    # Acquire the lock for writing
+    def acquire_write(self):
+        depth = getattr(self.held, "depth", 0)
+        if depth:
+            if not self.held.writing:
+                raise RuntimeError("A read lock cannot be upgraded to a write lock")
+            self.held.depth = depth + 1
+            return
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+        self.held.depth = 1
+        self.held.writing = True
+
+    # Release the lock held by the current thread
+    def release(self):
+        self.held.depth -= 1
+        if self.held.depth:
+            return
+        with self.condition:
+            if self.held.writing:
+                self.writer = False
+            else:
+                self.readers -= 1
+            self.condition.notify_all()
+
+
+# Defining an append-only write-ahead log of inventory mutations
+# Every record is one line holding a crc32 checksum and a JSON array of the log
+# sequence number (lsn), the time, the inventory method and its arguments
+# Records are buffered and written with a single fsync per group (group commit),
+# either once group_size records are pending or after group_interval seconds
+# append returns before its record is synced, so the records of the last
+# group_interval seconds can be lost by a crash. wait blocks until a record is
+# synced, for callers which must not acknowledge a change before it is durable
+class WriteAheadLog:
+    # Constructor to open the log for appending, numbering continues after the
+    # last record already in the file and a torn tail left by a crash is cut off
+    def __init__(self, path: str, group_size: int = 1000, group_interval: float = 0.01):
+        self.path = path
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.lsn = 0
+        valid_size = 0
+        for record, valid_size in self._records(path):
+            self.lsn = record[0]
+        self.file = open(path, "ab")
+        self.file.truncate(valid_size)
+        self.pending = []
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        # Notified after every sync, the last synced lsn is kept with it
+        self.synced = threading.Condition(self.lock)
+        self.synced_lsn = self.lsn
+        self.closed = False
+        # Background flusher so a quiet log is still synced within the interval
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    # Append a mutation and return its log sequence number
+    def append(self, op: str, args, timestamp: float = None) -> int:
+        with self.lock:
+            self.lsn += 1
+            payload = json.dumps(
+                [self.lsn, timestamp or time.time(), op, args], separators=(",", ":")
+            ).encode("utf-8")
+            self.pending.append(b"%08x %s\n" % (zlib.crc32(payload), payload))
+            if (
+                len(self.pending) >= self.group_size
+                or time.monotonic() - self.last_sync >= self.group_interval
+            ):
+                self._sync()
+            return self.lsn
+
+    # Wait until the record with this lsn is synced, False if the timeout passed
+    def wait(self, lsn: int, timeout: float = None) -> bool:
+        with self.synced:
+            return self.synced.wait_for(
+                lambda: self.closed or not self.pending or self.synced_lsn >= lsn,
+                timeout,
+            )
+
+    # Write and fsync every pending record
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    # Drop every record, used once the records are folded into a snapshot
+    def truncate(self):
+        with self.lock:
+            self._sync()
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+
+    # Flush the pending records and close the file
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self._sync()
+            self.closed = True
+            self.file.close()
+
+    # Yield every complete record of a log file as [lsn, time, op, args]
+    # Reading stops at the first torn or corrupted record, the tail of a crash
+    @classmethod
+    def read(cls, path: str):
+        for record, _ in cls._records(path):
+            yield record
+
+    # Yield every complete record with the file size up to the end of the record
+    @staticmethod
+    def _records(path: str):
+        if not os.path.exists(path):
+            return
+        size = 0
+        with open(path, "rb") as log:
+            for line in log:
+                checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+                if not line.endswith(b"\n") or len(checksum) != 8:
+                    return
+                try:
+                    if int(checksum, 16) != zlib.crc32(payload):
+                        return
+                except ValueError:
+                    # A checksum which is not hexadecimal is corruption as well
+                    return
+                size += len(line)
+                yield json.loads(payload), size
+
+    # Write the pending records with one fsync, the lock must be held
+    def _sync(self):
+        if self.pending:
+            self.file.write(b"".join(self.pending))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending.clear()
+        self.synced_lsn = self.lsn
+        self.last_sync = time.monotonic()
+        self.synced.notify_all()
+
+    # Sync pending records every group interval until the log is closed
+    def _flush_periodically(self):
+        while not self.closed:
+            time.sleep(self.group_interval)
+            with self.lock:
+                if not self.closed and self.pending:
+                    self._sync()
+
+
+# Defining the metrics recorded by an instrumented inventory
+# Latencies are counted in histogram buckets per method, searches also count the
+# rows they compared and returned, and mutations count the cached searches they
+# invalidated. Exported as a dictionary or in the Prometheus text format
+class InventoryMetrics:
+    # Upper bounds of the latency buckets in seconds
+    BUCKETS = (
+        0.00001,
+        0.000025,
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        inf,
+    )
+
+    # Constructor to initialize empty metrics
+    def __init__(self):
+        # Method name to its bucket counts, total seconds and number of calls
+        self.latency = {}
+        self.rows_scanned = {}
+        self.rows_returned = {}
+        # Mutation method name to the number of cached searches it invalidated
+        self.invalidations = {}
+        # The method a thread is running, calls it makes to other methods (a bulk
+        # load clearing the caches) are counted as part of it
+        self.active = threading.local()
+        self.lock = threading.Lock()
+
+    # Record the duration of a method call, and the rows compared and returned
+    # when the method is a search
+    def observe(
+        self, method: str, seconds: float, scanned: int = None, returned: int = None
+    ):
+        with self.lock:
+            latency = self.latency.get(method)
+            if latency is None:
+                latency = self.latency[method] = [[0] * len(self.BUCKETS), 0.0, 0]
+            latency[0][bisect_left(self.BUCKETS, seconds)] += 1
+            latency[1] += seconds
+            latency[2] += 1
+            if returned is not None:
+                self.rows_scanned[method] = self.rows_scanned.get(method, 0) + scanned
+                self.rows_returned[method] = (
+                    self.rows_returned.get(method, 0) + returned
+                )
+
+    # Record the cached searches invalidated by a mutation
+    def invalidated(self, trigger: str, count: int):
+        with self.lock:
+            self.invalidations[trigger] = self.invalidations.get(trigger, 0) + count
+
+    # The metrics as a dictionary, with the statistics of the passed in caches
+    def snapshot(self, caches: dict = None) -> dict:
+        with self.lock:
+            methods = {}
+            for method, (buckets, total, count) in self.latency.items():
+                methods[method] = {
+                    "count": count,
+                    "seconds": total,
+                    "buckets": dict(zip(self.BUCKETS, buckets)),
+                    "rows_scanned": self.rows_scanned.get(method, 0),
+                    "rows_returned": self.rows_returned.get(method, 0),
+                }
+            return {
+                "methods": methods,
+                "invalidations": dict(self.invalidations),
+                "caches": caches or {},
+            }
+
+    # The metrics in the Prometheus text exposition format
+    def prometheus(self, caches: dict = None) -> str:
+        snapshot = self.snapshot(caches)
+        lines = [
+            "# HELP inventory_method_duration_seconds Latency of inventory methods",
+            "# TYPE inventory_method_duration_seconds histogram",
+        ]
+        for method, metrics in snapshot["methods"].items():
+            cumulative = 0
+            for bound, count in metrics["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == inf else repr(bound)
+                lines.append(
+                    f'inventory_method_duration_seconds_bucket{{method="{method}",'
+                    f'le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f'inventory_method_duration_seconds_sum{{method="{method}"}} '
+                f'{metrics["seconds"]!r}'
+            )
+            lines.append(
+                f'inventory_method_duration_seconds_count{{method="{method}"}} '
+                f'{metrics["count"]}'
+            )
+        for name, help_text in (
+            ("rows_scanned", "Rows compared by searches"),
+            ("rows_returned", "Rows returned by searches"),
+        ):
+            lines.append(f"# HELP inventory_{name}_total {help_text}")
+            lines.append(f"# TYPE inventory_{name}_total counter")
+            for method, metrics in snapshot["methods"].items():
+                if method.startswith("search_"):
+                    lines.append(
+                        f'inventory_{name}_total{{method="{method}"}} {metrics[name]}'
+                    )
+        lines.append(
+            "# HELP inventory_invalidations_total Cached searches invalidated by"
+            " each mutation"
+        )
+        lines.append("# TYPE inventory_invalidations_total counter")
+        for trigger, count in snapshot["invalidations"].items():
+            lines.append(
+                f'inventory_invalidations_total{{trigger="{trigger}"}} {count}'
+            )
+        for name, kind in (
+            ("hits", "counter"),
+            ("misses", "counter"),
+            ("evictions", "counter"),
+            ("invalidations", "counter"),
+            ("entries", "gauge"),
+        ):
+            metric = f"inventory_cache_{name}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {metric} Search cache {name}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache, stats in snapshot["caches"].items():
+                lines.append(f'{metric}{{cache="{cache}"}} {stats[name]}')
+        return "\n".join(lines) + "\n"
+
+
+# Defining one change of the inventory, published by the change feed
+# entity is "product" or "category", key its id and action "add", "update" or
+# "delete". op is the inventory method which made the change
+# changes holds the field values of an added entity, (old, new) pairs of the
+# changed fields of an update, and the appended (timestamp, price) entries of a
+# price change under "price_history". Deletes have no changes
+class ChangeEvent:
+    __slots__ = ("offset", "timestamp", "op", "entity", "key", "action", "changes")
+
+    # Constructor to initialize an event
+    def __init__(
+        self,
+        offset: int,
+        timestamp: float,
+        op: str,
+        entity: str,
+        key,
+        action: str,
+        changes: dict,
+    ):
+        self.offset = offset
+        self.timestamp = timestamp
+        self.op = op
+        self.entity = entity
+        self.key = key
+        self.action = action
+        self.changes = changes
+
+    # The event as a dictionary, ready for JSON
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return (
+            f"ChangeEvent {self.offset}: {self.action} {self.entity} {self.key} "
+            f"by {self.op} {self.changes}"
+        )
+
+
+# Defining a change feed of the inventory (change data capture)
+# Every change is published as a ChangeEvent with the next offset, so events
+# are totally ordered. The latest events are kept in a ring buffer of retention
+# events, so memory is bounded however far behind a consumer falls
+# A consumer resumes from the offset after the last event it handled, as long
+# as that event is still retained, and reads batches with poll or receives them
+# through a callback once a full batch is waiting
+class ChangeFeed:
+    # Constructor to initialize an empty feed
+    def __init__(self, retention: int = 100000):
+        if retention < 1:
+            raise ValueError("The change feed must retain at least one event")
+        self.retention = retention
+        self.events = [None] * retention
+        # Offset of the next event published
+        self.next_offset = 0
+        self.subscriptions = []
+        # Quantity changes on different stripes publish concurrently
+        self.lock = threading.Lock()
+
+    # Publish a change, returns its offset
+    def publish(
+        self,
+        op: str,
+        entity: str,
+        key,
+        action: str,
+        changes: dict,
+        timestamp: float = None,
+    ) -> int:
+        with self.lock:
+            offset = self.next_offset
+            self.events[offset % self.retention] = ChangeEvent(
+                offset,
+                time.time() if timestamp is None else timestamp,
+                op,
+                entity,
+                key,
+                action,
+                changes,
+            )
+            self.next_offset += 1
+            ready = [
+                subscription
+                for subscription in self.subscriptions
+                if subscription.callback is not None
+                and not subscription.lagging
+                and self.next_offset - subscription.offset >= subscription.batch_size
+            ]
+        for subscription in ready:
+            subscription.deliver()
+        return offset
+
+    # Offset of the oldest retained event
+    def first_offset(self) -> int:
+        return max(self.next_offset - self.retention, 0)
+
+    # The retained events from the offset on, at most limit of them
+    def read(self, offset: int, limit: int = None) -> list:
+        with self.lock:
+            self._check_offset(offset)
+            stop = self.next_offset
+            if limit is not None:
+                stop = min(stop, offset + limit)
+            return [
+                self.events[position % self.retention]
+                for position in range(offset, stop)
+            ]
+
+    # Subscribe from the offset, the next event published by default
+    # With a callback, batches of batch_size events are delivered to it as soon
+    # as they are published, call flush for the last partial batch. Without
+    # one, read the batches with poll
+    # A batch can never be larger than the retained events, the default is 100
+    def subscribe(
+        self, offset: int = None, batch_size: int = None, callback=None
+    ) -> "FeedSubscription":
+        if batch_size is None:
+            batch_size = min(100, self.retention)
+        if not 1 <= batch_size <= self.retention:
+            raise ValueError(
+                f"Batch size must be between 1 and the retention of {self.retention}"
+            )
+        with self.lock:
+            if offset is None:
+                offset = self.next_offset
+            self._check_offset(offset)
+            subscription = FeedSubscription(self, offset, batch_size, callback)
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: "FeedSubscription"):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def __len__(self):
+        return self.next_offset - self.first_offset()
+
+    # A resumed offset must not be older than the retained events
+    def _check_offset(self, offset: int):
+        first = self.first_offset()
+        if offset < first:
+            raise ValueError(
+                f"Offset {offset} is no longer retained, the oldest event is {first}"
+            )
+        if offset > self.next_offset:
+            raise ValueError(
+                f"Offset {offset} is ahead of the feed, the next event is "
+                f"{self.next_offset}"
+            )
+
+
+# Defining the position of one consumer in a change feed
+# offset is the next event the consumer receives, save it to resume later
+# Callbacks run inside the inventory change that published the event, so their
+# errors never reach it. A callback which raises, or which fell behind the
+# retained events, marks the subscription as lagging and stops its deliveries
+# The batch which failed is not consumed, call resume to deliver it again
+class FeedSubscription:
+    # Constructor to initialize a subscription, use ChangeFeed.subscribe
+    def __init__(self, feed: ChangeFeed, offset: int, batch_size: int, callback):
+        self.feed = feed
+        self.offset = offset
+        self.batch_size = batch_size
+        self.callback = callback
+        # Set when a delivery failed, with the error that stopped it
+        self.lagging = False
+        self.error = None
+        # Only one thread delivers the batches of a subscription at a time
+        self.delivering = threading.Lock()
+
+    # The next batch of events, at most max_events or batch_size of them
+    # Raises ValueError when the consumer fell behind the retained events
+    def poll(self, max_events: int = None) -> list:
+        try:
+            events = self.feed.read(self.offset, max_events or self.batch_size)
+        except ValueError as error:
+            self.lagging = True
+            self.error = error
+            raise
+        if events:
+            self.offset = events[-1].offset + 1
+        return events
+
+    # Number of published events not received yet
+    def lag(self) -> int:
+        return self.feed.next_offset - self.offset
+
+    # Deliver the full batches waiting to the callback, called by the feed
+    def deliver(self):
+        if not self.delivering.acquire(blocking=False):
+            return
+        try:
+            while not self.lagging and self.lag() >= self.batch_size:
+                self._deliver_batch()
+        except Exception as error:
+            self.lagging = True
+            self.error = error
+        finally:
+            self.delivering.release()
+
+    # Deliver every waiting event to the callback, the last batch may be partial
+    # Errors are raised to the caller
+    def flush(self):
+        with self.delivering:
+            while self.lag():
+                self._deliver_batch()
+
+    # Deliver again after a failure, from the first batch not delivered
+    # Raises ValueError when those events are no longer retained, the consumer
+    # then has to load the full catalog again
+    def resume(self):
+        self.feed.read(self.offset, 0)
+        self.lagging = False
+        self.error = None
+        self.deliver()
+
+    # The offset only moves once the callback accepted the batch
+    def _deliver_batch(self):
+        events = self.feed.read(self.offset, self.batch_size)
+        self.callback(events)
+        self.offset = events[-1].offset + 1
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+# Defining the plan of a multi-predicate product query
+# The planner estimates the rows each usable index would return, reads the
+# candidates from the most selective one and checks the other predicates on them
+# Category sets and price ranges are counted exactly, name searches are bounded
+# by the smallest n-gram posting of the query
+# Active only queries read the live indexes, which leave out the products of
+# inactive categories, and a full scan reads the live price index
+class QueryPlan:
+    ACCESS_PATHS = {
+        "category": "category set",
+        "price": "price index",
+        "name": "name postings",
+        "scan": "full scan",
+    }
+
+    # Constructor to plan the query over the passed in inventory
+    # price is a (min, max) pair, either bound may be None
+    def __init__(
+        self,
+        inventory,
+        category_id: int = None,
+        price: tuple = None,
+        name_contains: str = None,
+        in_stock: bool = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        active_only: bool = False,
+    ):
+        if order_by is not None and order_by not in inventory.SORT_KEYS:
+            raise ValueError(f"Unable to sort products by {order_by}")
+        self.inventory = inventory
+        self.category_id = category_id
+        self.min_price, self.max_price = price if price is not None else (None, None)
+        self.name_contains = None if name_contains is None else name_contains.casefold()
+        self.in_stock = in_stock
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+        self.active_only = active_only
+
+        # Estimated rows of every usable access path
+        self.estimates = {}
+        if category_id is not None:
+            # The products of a deleted category are only listed as orphans
+            if category_id not in inventory.categories or (
+                active_only and not inventory._is_active(category_id)
+            ):
+                self.estimates["category"] = 0
+            else:
+                self.estimates["category"] = len(
+                    inventory.category_products.get(category_id, ())
+                )
+        if self.min_price is not None or self.max_price is not None:
+            self.estimates["price"] = inventory.price_index.count(*self._price_bounds())
+            if not active_only:
+                self.estimates["price"] += inventory.inactive_price_index.count(
+                    *self._price_bounds()
+                )
+        if self.name_contains is not None:
+            self.estimates["name"] = inventory.product_name_index.estimate(
+                self.name_contains
+            )
+            if not active_only and len(inventory.inactive_name_index):
+                self.estimates["name"] += inventory.inactive_name_index.estimate(
+                    self.name_contains
+                )
+        if active_only:
+            self.estimates["scan"] = len(inventory.price_index)
+        else:
+            self.estimates["scan"] = len(inventory.products)
+        self.access = min(self.estimates, key=self.estimates.get)
+        # A scan sorted by price reads the price index instead, in order, so a
+        # limited query stops after the first matches. An active only scan reads
+        # the live price index as well
+        if self.access == "scan" and (order_by == "price" or active_only):
+            self.access = "price"
+        self.index_ordered = self.access == "price" and order_by == "price"
+
+    # The matching products, in price order when the plan is index ordered
+    def rows(self):
+        inventory = self.inventory
+        products = inventory.products
+        if self.access == "category":
+            if self.estimates["category"]:
+                product_ids = inventory.category_products.get(self.category_id, ())
+            else:
+                product_ids = ()
+        elif self.access == "price":
+            product_ids = inventory._price_range(
+                *self._price_bounds(),
+                self.active_only,
+                reverse=self.index_ordered and self.descending,
+            )
+        elif self.access == "name":
+            product_ids = inventory._search_names(self.name_contains, self.active_only)
+        else:
+            product_ids = None
+
+        check_category = self.category_id is not None and self.access != "category"
+        check_price = "price" in self.estimates and self.access != "price"
+        min_price, max_price = self._price_bounds()
+        check_name = self.name_contains is not None and self.access != "name"
+        candidates = (
+            iter(products.values())
+            if product_ids is None
+            else (products[product_id] for product_id in product_ids)
+        )
+        read = 0
+        try:
+            for read, product in enumerate(candidates, 1):
+                if check_category and product.category.category_id != self.category_id:
+                    continue
+                if check_price and not min_price <= product.price <= max_price:
+                    continue
+                if check_name and self.name_contains not in product.search_name:
+                    continue
+                if (
+                    self.in_stock is not None
+                    and (product.quantity > 0) != self.in_stock
+                ):
+                    continue
+                yield product
+        finally:
+            # Counted once the rows are consumed or closed
+            inventory.rows_read += read
+
+    # Run the query, sorting and limiting the matches
+    def execute(self) -> list:
+        rows = self.rows()
+        try:
+            if self.order_by is None or self.index_ordered:
+                return list(rows if self.limit is None else islice(rows, self.limit))
+            sort_key = self.inventory.SORT_KEYS[self.order_by]
+            if self.limit is None:
+                return sorted(rows, key=sort_key, reverse=self.descending)
+            select = heapq.nlargest if self.descending else heapq.nsmallest
+            return select(self.limit, rows, key=sort_key)
+        finally:
+            # A limited query stops early, closing the rows counts what was read
+            rows.close()
+
+    # Describe the chosen access path, the filters and the ordering
+    def explain(self) -> str:
+        lines = [
+            f"Access: {self.ACCESS_PATHS[self.access]}"
+            f" (estimated {self.estimates.get(self.access, self.estimates['scan'])}"
+            " rows)",
+            "Considered: "
+            + ", ".join(
+                f"{self.ACCESS_PATHS[access]} {rows}"
+                for access, rows in self.estimates.items()
+            ),
+        ]
+        filters = []
+        if self.category_id is not None and self.access != "category":
+            filters.append(f"category_id = {self.category_id}")
+        if "price" in self.estimates and self.access != "price":
+            filters.append("price between {} and {}".format(*self._price_bounds()))
+        if self.name_contains is not None and self.access != "name":
+            filters.append(f"name contains {self.name_contains!r}")
+        if self.in_stock is not None:
+            filters.append("in stock" if self.in_stock else "out of stock")
+        lines.append("Filter: " + (", ".join(filters) if filters else "none"))
+        if self.active_only:
+            lines.append("Active only: inactive categories are not read")
+        if self.order_by is not None:
+            direction = "descending" if self.descending else "ascending"
+            if self.index_ordered:
+                how = "read in index order"
+            elif self.limit is not None:
+                how = "heap selection"
+            else:
+                how = "sort"
+            lines.append(f"Order: {self.order_by} {direction}, {how}")
+        if self.limit is not None:
+            lines.append(f"Limit: {self.limit}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.explain()
+
+    # Price bounds with the missing ones open
+    def _price_bounds(self) -> tuple:
+        return (
+            -inf if self.min_price is None else self.min_price,
+            inf if self.max_price is None else self.max_price,
+        )
+
+
+# Finally as we now have product and category class, create Inventory class
+# With thread_safe=True one inventory can be shared by many threads
+# Searches hold the read side of a reader-writer lock and structural mutations
+# the write side. Quantity changes only touch one product, so they hold the read
+# side plus the lock of the product's stripe, and never block searches
+class Inventory:
+    # Methods holding the read side of the lock
+    READ_METHODS = (
+        "is_category_id_unique",
+        "is_product_id_unique",
+        "search_category_by_name",
+        "search_category_by_name_no_cache",
+        "search_category_by_name_memo",
+        "get_product_price_history",
+        "get_product_price_at",
+        "get_product_price_history_between",
+        "search_product_by_name_no_cache",
+        "search_product_by_name",
+        "search_product_by_name_memo",
+        "search_product_by_price_range_no_cache",
+        "search_product_by_price_range",
+        "search_product_by_price_range_memo",
+        "search_product_by_category_id_no_cache",
+        "search_product_by_category_id",
+        "search_product_by_category_id_memo",
+        "search_product_by_category_name_no_cache",
+        "search_product_by_category_name",
+        "search_product_by_category_name_memo",
+        "top_products",
+        "page_products",
+        "query",
+        "explain",
+        "orphaned_products",
+        "peek_low_stock",
+        "low_stock_products",
+        "save_snapshot",
+        "cache_stats",
+    )
+    # Methods holding the write side of the lock
+    WRITE_METHODS = (
+        "add_new_category",
+        "add_categories_bulk",
+        "update_category",
+        "delete_category",
+        "add_product",
+        "add_products_bulk",
+        "update_product",
+        "delete_product",
+        "attach_wal",
+        "checkpoint",
+        "clear_cache",
+        "subscribe_low_stock",
+        "unsubscribe_low_stock",
+        "snapshot",
+        "release_snapshot",
+    )
+    # Sort keys of paginated searches, product ids break ties
+    SORT_KEYS = {
+        "price": lambda product: (product.price, product.product_id),
+        "quantity": lambda product: (product.quantity, product.product_id),
+        "name": lambda product: (product.search_name, product.product_id),
+    }
+    # What delete_category does with the products of the deleted category
+    CASCADE_MODES = ("orphan", "reassign", "delete")
+    # Methods changing the quantity of the product passed in first
+    STOCK_METHODS = ("increase_product_quantity", "decrease_product_quantity")
+    # Methods changing the quantities of a batch of products
+    STOCK_BATCH_METHODS = ("apply_stock_batch",)
+    # Every method changing the inventory
+    MUTATING_METHODS = WRITE_METHODS + STOCK_METHODS + STOCK_BATCH_METHODS
+
+    # Intialize inventory class with empty categories and product dictionary
+    # The search caches belong to this inventory and are bounded by the number of
+    # entries and by the total number of product references held in the results
+    # A ProductStore can be passed in to keep the products in columns instead
+    # Price histories keep at most price_history_limit changes and the changes of
+    # the last price_history_retention seconds when those are set
+    def __init__(
+        self,
+        cache_size: int = 20000,
+        cache_result_size: int = None,
+        cache_policy: str = "lru",
+        cache_ttl: float = None,
+        product_store: ProductStore = None,
+        thread_safe: bool = False,
+        lock_stripes: int = 64,
+        price_history_limit: int = None,
+        price_history_retention: float = None,
+        metrics: bool = False,
+        change_feed: bool = False,
+    ):
+        self.categories = {}
+        self.products = {} if product_store is None else product_store
+        self.price_history_limit = price_history_limit
+        self.price_history_retention = price_history_retention
+        # Incremented on every mutation so derived structures know when to rebuild
+        self.version = 0
+        # Write-ahead log of the mutations and the sequence number of the last one
+        self.wal = None
+        self.lsn = 0
+        # Time of the log record being replayed during recovery
+        self.replay_time = None
+        # Reader-writer lock and quantity stripes, only when shared between threads
+        self.lock = None
+        self.stripes = None
+        # Quantity changes on different stripes bump the version concurrently
+        self.version_lock = nullcontext()
+        # Instrumentation, only when metrics are enabled
+        self.metrics = None
+        # Number of products read by queries and pages, reported by the metrics
+        self.rows_read = 0
+        # Feed of the changes, only when change data capture is enabled
+        self.change_feed = None
+        # Open point-in-time snapshots, forgotten ones are dropped automatically
+        self.snapshots = weakref.WeakSet()
+        # Vectorized query engine, created on first use
+        self.vector_engine = None
+        # Sorted price index used by the price range searches
+        # The price and name indexes only hold the products of active categories,
+        # the products of inactive categories are kept in their own indexes so the
+        # active only searches never visit them
+        self.price_index = PriceIndex()
+        self.inactive_price_index = PriceIndex()
+        # Min-heap of product ids by quantity for low stock monitoring
+        self.stock_heap = IndexedMinHeap()
+        # (threshold, callback) pairs notified when a quantity falls to the threshold
+        self.low_stock_subscriptions = []
+        # Secondary index mapping category id to the set of its product ids
+        self.category_products = {}
+        # Trigram indexes over the product and category names, the product
+        # indexes are compact for the integer ids of a product store
+        self.product_name_index = NgramIndex(compact=product_store is not None)
+        self.inactive_name_index = NgramIndex(compact=product_store is not None)
+        self.category_name_index = NgramIndex()
+        # Implementing manual caching, tracked by the kind of search and bounded
+        # like the automatic cache
+        self.memoized_search = SearchCache(
+            cache_size, cache_result_size, cache_policy, cache_ttl
+        )
+        # Bounded automatic caching used by the cached search methods
+        self.search_cache = SearchCache(
+            cache_size, cache_result_size, cache_policy, cache_ttl
+        )
+        if thread_safe:
+            self._enable_locking(lock_stripes)
+        if metrics:
+            self.enable_metrics()
+        if change_feed:
+            self.enable_change_feed()
+
+    ## ******************************************** ##
+    # Inventory Category Management
+    ## ******************************************** ##
+    # Functions to add and update category and products
+    # Each id needs to be unique so
+    # The id of a deleted category stays taken while it has orphaned products
+    def is_category_id_unique(self, category_id: int) -> bool:
+        return category_id not in self.categories and not self.category_products.get(
+            category_id
+        )
+
+    # Also check if product id is unique
+    def is_product_id_unique(self, product_id: int) -> bool:
+        return product_id not in self.products
+
+    # Add new category
+    def add_new_category(self, category_id: int, name: str, status: bool = True):
+        # First check if the category id is unique
+        if not self.is_category_id_unique(category_id):
+            raise ValueError("Category Id must be unique. This id already exists")
+
+        # Add the category using category_id as key
+        category = Category(category_id, name, status)
+        self._preserve_categories((category_id,))
+        self.categories[category_id] = category
+        self.category_name_index.add(category_id, category.search_name)
+        self.version += 1
+        self._log("add_new_category", category_id, name, status)
+        # Only the searches matching the new name are affected
+        self._invalidate_category_searches(category.search_name)
+        if self.change_feed is not None:
+            self._publish(
+                "add_new_category",
+                "category",
+                category_id,
+                "add",
+                {"name": name, "status": status},
+            )
+
+    # Add many categories at once
+    # Rows are (category_id, name) or (category_id, name, status) tuples
+    # Every row is validated before anything is added and the caches are
+    # invalidated once at the end instead of once per category
+    def add_categories_bulk(self, rows) -> int:
+        categories = []
+        new_ids = set()
+        for row in rows:
+            category = Category(*row)
+            if (
+                not self.is_category_id_unique(category.category_id)
+                or category.category_id in new_ids
+            ):
+                raise ValueError(
+                    f"Category Id must be unique. Id {category.category_id} already exists"
+                )
+            new_ids.add(category.category_id)
+            categories.append(category)
+
+        self._preserve_categories(new_ids)
+        for category in categories:
+            self.categories[category.category_id] = category
+            self.category_name_index.add(category.category_id, category.search_name)
+        self.version += 1
+        self._log(
+            "add_categories_bulk",
+            [
+                (category.category_id, category.name, category.status)
+                for category in categories
+            ],
+        )
+        self.clear_cache()
+        if self.change_feed is not None:
+            for category in categories:
+                self._publish(
+                    "add_categories_bulk",
+                    "category",
+                    category.category_id,
+                    "add",
+                    {"name": category.name, "status": category.status},
+                )
+        return len(categories)
+
+    # Update Category name or status
+    def update_category(self, cagetory_id: int, name: str = None, status: bool = None):
+        # If passed in category id is not present, return error
+        if cagetory_id not in self.categories:
+            raise ValueError(
+                "Unable to find the category for this passed in cateogry id"
+            )
+
+        # Use category update method to update the category details
+        category = self.categories[cagetory_id]
+        old_name = category.name
+        old_search_name = category.search_name
+        old_status = category.status
+        self._preserve_categories((cagetory_id,))
+        category.update(name, status)
+        # Move the products of the category between the live and inactive
+        # indexes, only its own products are visited
+        if bool(category.status) != bool(old_status):
+            self._move_products(
+                self._category_products(cagetory_id), bool(category.status)
+            )
+        self.version += 1
+        self._log("update_category", cagetory_id, name, status)
+        # A status change keeps every cached result valid, a rename only
+        # affects the searches matching the old or the new name
+        if category.search_name != old_search_name:
+            self.category_name_index.remove(cagetory_id)
+            self.category_name_index.add(cagetory_id, category.search_name)
+            self._invalidate_category_searches(old_search_name)
+            self._invalidate_category_searches(category.search_name)
+        if self.change_feed is not None:
+            changes = {}
+            if category.name != old_name:
+                changes["name"] = (old_name, category.name)
+            if category.status != old_status:
+                changes["status"] = (old_status, category.status)
+            if changes:
+                self._publish(
+                    "update_category", "category", cagetory_id, "update", changes
+                )
+
+    # Delete existing category
+    # cascade decides what happens to the products of the category
+    # "orphan" keeps them with the deleted category, which becomes inactive, until
+    # they are moved with update_product or deleted, see orphaned_products
+    # "reassign" moves them to the category reassign_to
+    # "delete" deletes them
+    # Only the products of the category are visited, using the category index
+    def delete_category(
+        self, cagetory_id: int, cascade: str = "orphan", reassign_to: int = None
+    ):
+        # If passed in category id is not present, return error
+        if cagetory_id not in self.categories:
+            raise ValueError(
+                "Unable to find the category for this passed in cateogry id"
+            )
+        if cascade not in self.CASCADE_MODES:
+            raise ValueError(f"Unknown cascade mode {cascade}")
+        if cascade == "reassign" and (
+            reassign_to == cagetory_id or reassign_to not in self.categories
+        ):
+            raise ValueError("Unable to find the category to reassign products to")
+
+        self._preserve_categories((cagetory_id,))
+        if cascade != "orphan":
+            self._preserve(self.category_products.get(cagetory_id, ()))
+        category = self.categories.pop(cagetory_id)
+        self.category_name_index.remove(cagetory_id)
+        products = self._category_products(cagetory_id)
+        # Views of a product store are gone once their products are deleted
+        product_ids = [product.product_id for product in products]
+        if cascade == "orphan":
+            if category.status:
+                category.status = False
+                self._move_products(products, False)
+        elif cascade == "reassign":
+            target = self.categories[reassign_to]
+            for product in products:
+                product.category = target
+            self.category_products.setdefault(reassign_to, set()).update(
+                self.category_products.pop(cagetory_id, ())
+            )
+            if bool(target.status) != bool(category.status):
+                self._move_products(products, bool(target.status))
+        else:
+            self._delete_products(products)
+        self.version += 1
+        self._log("delete_category", cagetory_id, cascade, reassign_to)
+        if cascade == "orphan":
+            # Only the searches of the deleted id and matching the deleted name
+            # are affected
+            self._invalidate_category_searches(category.search_name)
+            for cache in self._caches():
+                cache.discard("category_id", cagetory_id)
+        else:
+            self.clear_cache()
+        if self.change_feed is not None:
+            # The products of the category change first, then the category
+            if cascade == "reassign":
+                for product_id in product_ids:
+                    self._publish(
+                        "delete_category",
+                        "product",
+                        product_id,
+                        "update",
+                        {"category_id": (cagetory_id, reassign_to)},
+                    )
+            elif cascade == "delete":
+                for product_id in product_ids:
+                    self._publish(
+                        "delete_category", "product", product_id, "delete", {}
+                    )
+            self._publish("delete_category", "category", cagetory_id, "delete", {})
+
+    # The products of a deleted category which were kept with it
+    # Pass a category id for the orphans of that category only
+    def orphaned_products(self, category_id: int = None) -> list:
+        if category_id is not None:
+            if category_id in self.categories:
+                return []
+            return self._category_products(category_id)
+        return [
+            product
+            for category_id in list(self.category_products)
+            if category_id not in self.categories
+            for product in self._category_products(category_id)
+        ]
+
+    # Adding automatic caching as well
+    # A function to search category by name
+    def search_category_by_name(self, name: str):
+        return self._cached_search(
+            "category_name",
+            name.casefold(),
+            self.search_category_by_name_no_cache,
+            name,
+        )
+
+    # Without cache
+    # Uses the trigram index so only the candidate categories are compared
+    def search_category_by_name_no_cache(self, name: str):
+        categories = self.categories
+        return [
+            categories[category_id]
+            for category_id in self.category_name_index.search(name)
+        ]
+
+    # Manual caching
+    def search_category_by_name_memo(self, name: str):
+        # if the name is already in cache, return from cache
+        key = name.casefold()
+        result = self.memoized_search.get("category_name", key)
+        if result is not None:
+            return result
+        result = self.search_category_by_name_no_cache(name)
+        # Add this result to cache for faster retrieval
+        self.memoized_search.put("category_name", key, result)
+        return result
+
+    ## ******************************************** ##
+    # Inventory Product Management
+    ## ******************************************** ##
+
+    # Add in a new product
+    def add_product(
+        self,
+        product_id: int,
+        name: str,
+        price: float,
+        description: str,
+        category_id: int,
+        quantity: int,
+    ):
+        # First check if the product id is unique
+        if not self.is_product_id_unique(product_id):
+            raise ValueError("Product with the same id already exists.")
+
+        # Now check if the category id exists
+        if category_id not in self.categories:
+            raise ValueError("Passed in category id is invalid")
+
+        # Extract the category
+        category = self.categories[category_id]
+
+        # Finally add in the product
+        created_at = self._timestamp()
+        product = Product(
+            product_id, name, price, description, category, quantity, created_at
+        )
+        self._preserve((product_id,))
+        self.products[product_id] = product
+        self._index_product(product)
+        self.version += 1
+        self._log(
+            "add_product",
+            product_id,
+            name,
+            price,
+            description,
+            category_id,
+            quantity,
+            timestamp=created_at,
+        )
+        # Only the searches which could match the new product are affected
+        self._invalidate_product_searches(
+            product.search_name, product.price, category
+        )
+        if self.change_feed is not None:
+            self._publish(
+                "add_product",
+                "product",
+                product_id,
+                "add",
+                self._product_fields(product),
+                created_at,
+            )
+
+    # Add many products at once
+    # Rows are (product_id, name, price, description, category_id, quantity) tuples
+    # Ids and category references are validated in one pass before anything is
+    # added, the price index is merged once and the caches are invalidated once
+    def add_products_bulk(self, rows) -> int:
+        products = []
+        new_ids = set()
+        categories = self.categories
+        created_at = self._timestamp()
+        for product_id, name, price, description, category_id, quantity in rows:
+            if not self.is_product_id_unique(product_id) or product_id in new_ids:
+                raise ValueError(
+                    f"Product with the same id already exists. Product id {product_id}"
+                )
+            if category_id not in categories:
+                raise ValueError(
+                    f"Passed in category id is invalid. Category id {category_id}"
+                )
+            new_ids.add(product_id)
+            products.append(
+                Product(
+                    product_id,
+                    name,
+                    price,
+                    description,
+                    categories[category_id],
+                    quantity,
+                    created_at,
+                )
+            )
+
+        self._preserve(new_ids)
+        category_products = self.category_products
+        for product in products:
+            self.products[product.product_id] = product
+            category_products.setdefault(product.category.category_id, set()).add(
+                product.product_id
+            )
+        self.product_name_index.add_many(
+            (product.product_id, product.search_name)
+            for product in products
+            if product.category.status
+        )
+        self.inactive_name_index.add_many(
+            (product.product_id, product.search_name)
+            for product in products
+            if not product.category.status
+        )
+        self.price_index.add_many(
+            (product.price, product.product_id)
+            for product in products
+            if product.category.status
+        )
+        self.inactive_price_index.add_many(
+            (product.price, product.product_id)
+            for product in products
+            if not product.category.status
+        )
+        self.stock_heap.push_many(
+            (product.product_id, product.quantity) for product in products
+        )
+        if self.low_stock_subscriptions:
+            for product in products:
+                self._notify_low_stock(product, None)
+        self.version += 1
+        self._log(
+            "add_products_bulk",
+            [
+                (
+                    product.product_id,
+                    product.name,
+                    product.price,
+                    product.description,
+                    product.category.category_id,
+                    product.quantity,
+                )
+                for product in products
+            ],
+            timestamp=created_at,
+        )
+        self.clear_cache()
+        if self.change_feed is not None:
+            for product in products:
+                self._publish(
+                    "add_products_bulk",
+                    "product",
+                    product.product_id,
+                    "add",
+                    self._product_fields(product),
+                    created_at,
+                )
+        return len(products)
+
+    # Update the existing product details
+    def update_product(
+        self,
+        product_id: int,
+        name: str = None,
+        price: float = None,
+        description: str = None,
+        category_id: int = None,
+        quantity: int = None,
+    ):
+        if product_id not in self.products:
+            raise ValueError("Unable to find product using the passed in id")
+
+        # Get existing product
+        product = self.products[product_id]
+
+        # Check if category changed, if changed get the new category
+        # If new category id exists, get the category by id or use existing
+        category = (
+            self.categories.get(category_id, product.category)
+            if category_id
+            else product.category
+        )
+
+        # Finally call in product update function to update the values
+        old_name = product.name
+        old_search_name = product.search_name
+        old_description = product.description
+        old_price = product.price
+        old_category = product.category
+        old_category_id = old_category.category_id
+        old_quantity = product.quantity
+        changed_at = self._timestamp()
+        self._preserve((product_id,))
+        product.update(name, price, description, category, quantity, changed_at)
+        self.version += 1
+        self._log(
+            "update_product",
+            product_id,
+            name,
+            price,
+            description,
+            category_id,
+            quantity,
+            timestamp=changed_at,
+        )
+        # Keep the price index current when the price changes
+        # A product moved to a category of the other status also moves between
+        # the live and inactive indexes
+        old_price_index, old_name_index = self._indexes(old_category)
+        price_index, name_index = self._indexes(product.category)
+        if product.price != old_price or price_index is not old_price_index:
+            old_price_index.remove(old_price, product_id)
+            price_index.add(product.price, product_id)
+        if product.price != old_price:
+            self._retain_price_history(product, changed_at)
+        # Re-index the name when the product is renamed
+        if product.search_name != old_search_name or name_index is not old_name_index:
+            old_name_index.remove(product_id)
+            name_index.add(product_id, product.search_name)
+        # Move the product between category sets when the category is reassigned
+        if product.category.category_id != old_category_id:
+            self.category_products[old_category_id].discard(product_id)
+            self.category_products.setdefault(
+                product.category.category_id, set()
+            ).add(product_id)
+        if product.quantity != old_quantity:
+            self._stock_changed(product, old_quantity)
+
+        # Invalidate only the searches which depend on the changed fields
+        # Results hold product references, so quantity and description
+        # changes keep every cached result valid
+        if product.search_name != old_search_name:
+            self._invalidate_product_searches(search_name=old_search_name)
+            self._invalidate_product_searches(search_name=product.search_name)
+        if product.price != old_price:
+            self._invalidate_product_searches(price=old_price)
+            self._invalidate_product_searches(price=product.price)
+        if product.category is not old_category:
+            self._invalidate_product_searches(category=old_category)
+            self._invalidate_product_searches(category=product.category)
+        if self.change_feed is not None:
+            changes = {}
+            for field, old_value, new_value in (
+                ("name", old_name, product.name),
+                ("price", old_price, product.price),
+                ("description", old_description, product.description),
+                ("category_id", old_category_id, product.category.category_id),
+                ("quantity", old_quantity, product.quantity),
+            ):
+                if new_value != old_value:
+                    changes[field] = (old_value, new_value)
+            if product.price != old_price:
+                changes["price_history"] = [(changed_at.timestamp(), product.price)]
+            if changes:
+                self._publish(
+                    "update_product",
+                    "product",
+                    product_id,
+                    "update",
+                    changes,
+                    changed_at,
+                )
+
+    # Delete an existing product
+    def delete_product(self, product_id: int):
+        if product_id not in self.products:
+            raise ValueError("Unable to find product using the passed in id")
+
+        self._preserve((product_id,))
+        product = self.products.pop(product_id)
+        self._unindex_product(product)
+        self.version += 1
+        self._log("delete_product", product_id)
+        self._invalidate_product_searches(
+            product.search_name, product.price, product.category
+        )
+        if self.change_feed is not None:
+            self._publish("delete_product", "product", product_id, "delete", {})
+
+    # Add the product to every index maintained by the inventory
+    def _index_product(self, product: Product):
+        price_index, name_index = self._indexes(product.category)
+        price_index.add(product.price, product.product_id)
+        name_index.add(product.product_id, product.search_name)
+        self.category_products.setdefault(product.category.category_id, set()).add(
+            product.product_id
+        )
+        self._stock_changed(product, None)
+
+    # Remove the product from every index maintained by the inventory
+    def _unindex_product(self, product: Product):
+        price_index, name_index = self._indexes(product.category)
+        price_index.remove(product.price, product.product_id)
+        self.stock_heap.remove(product.product_id)
+        name_index.remove(product.product_id)
+        self.category_products[product.category.category_id].discard(
+            product.product_id
+        )
+
+    # The price and name indexes of the products of the category, the live ones
+    # unless the category is inactive
+    def _indexes(self, category: Category) -> tuple:
+        if category.status:
+            return self.price_index, self.product_name_index
+        return self.inactive_price_index, self.inactive_name_index
+
+    # The products of a category, read from the category index
+    def _category_products(self, category_id: int) -> list:
+        products = self.products
+        return [
+            products[product_id]
+            for product_id in self.category_products.get(category_id, ())
+        ]
+
+    # Move products of one status to the live indexes, or to the inactive ones
+    # The prices are moved as one batch, so a large category costs one copy of
+    # the price arrays instead of one shift per product
+    def _move_products(self, products: list, active: bool):
+        if active:
+            source = (self.inactive_price_index, self.inactive_name_index)
+            target = (self.price_index, self.product_name_index)
+        else:
+            source = (self.price_index, self.product_name_index)
+            target = (self.inactive_price_index, self.inactive_name_index)
+        pairs = [(product.price, product.product_id) for product in products]
+        source[0].remove_many(pairs)
+        target[0].add_many(pairs)
+        for product in products:
+            source[1].remove(product.product_id)
+            target[1].add(product.product_id, product.search_name)
+
+    # Delete the products of one category as a batch
+    def _delete_products(self, products: list):
+        if not products:
+            return
+        # Views of a product store are read before their products are deleted
+        category = products[0].category
+        price_index, name_index = self._indexes(category)
+        price_index.remove_many(
+            [(product.price, product.product_id) for product in products]
+        )
+        for product_id in [product.product_id for product in products]:
+            del self.products[product_id]
+            self.stock_heap.remove(product_id)
+            name_index.remove(product_id)
+        self.category_products.pop(category.category_id, None)
+
+    # Increase product quantity by quantity
+    def increase_product_quantity(self, product_id: int, quantity: int):
+        if product_id not in self.products:
+            raise ValueError("Unable to find the product using passed in id")
+
+        # Cached results hold product references, so nothing is invalidated
+        product = self.products[product_id]
+        old_quantity = product.quantity
+        self._preserve((product_id,))
+        product.increaseQuantity(quantity)
+        self._stock_changed(product, old_quantity)
+        with self.version_lock:
+            self.version += 1
+        self._log("increase_product_quantity", product_id, quantity)
+        if self.change_feed is not None:
+            self._publish(
+                "increase_product_quantity",
+                "product",
+                product_id,
+                "update",
+                {"quantity": (old_quantity, product.quantity)},
+            )
+
+    # Decrease product quantity by quantity
+    def decrease_product_quantity(self, product_id: int, quantity: int):
+        if product_id not in self.products:
+            raise ValueError("Unable to find the product using passed in id")
+
+        # Cached results hold product references, so nothing is invalidated
+        product = self.products[product_id]
+        old_quantity = product.quantity
+        self._preserve((product_id,))
+        product.decreaseQuantity(quantity)
+        self._stock_changed(product, old_quantity)
+        with self.version_lock:
+            self.version += 1
+        self._log("decrease_product_quantity", product_id, quantity)
+        if self.change_feed is not None:
+            self._publish(
+                "decrease_product_quantity",
+                "product",
+                product_id,
+                "update",
+                {"quantity": (old_quantity, product.quantity)},
+            )
+
+    # Apply the quantity changes of many (product_id, delta) pairs at once
+    # Lines for the same product are summed, then every product is checked before
+    # any quantity changes, so the batch is applied as a whole or not at all
+    # A batch that would take a quantity below zero is rejected, restocking a
+    # product which is already below zero is not
+    # Returns the new quantity of every product in the batch
+    def apply_stock_batch(self, lines) -> dict:
+        deltas = {}
+        for product_id, delta in lines:
+            deltas[product_id] = deltas.get(product_id, 0) + delta
+
+        products = {}
+        for product_id, delta in deltas.items():
+            if product_id not in self.products:
+                raise ValueError("Unable to find the product using passed in id")
+            product = self.products[product_id]
+            if delta < 0 and product.quantity + delta < 0:
+                raise ValueError(
+                    f"Insufficient quantity for product {product_id}, "
+                    f"{product.quantity} available"
+                )
+            products[product_id] = product
+
+        # Cached results hold product references, so nothing is invalidated
+        self._preserve(deltas)
+        old_quantities = {}
+        for product_id, delta in deltas.items():
+            product = products[product_id]
+            old_quantity = old_quantities[product_id] = product.quantity
+            product.increaseQuantity(delta)
+            self._stock_changed(product, old_quantity)
+        with self.version_lock:
+            self.version += 1
+        self._log("apply_stock_batch", list(deltas.items()))
+        if self.change_feed is not None:
+            for product_id, product in products.items():
+                self._publish(
+                    "apply_stock_batch",
+                    "product",
+                    product_id,
+                    "update",
+                    {"quantity": (old_quantities[product_id], product.quantity)},
+                )
+        return {
+            product_id: product.quantity for product_id, product in products.items()
+        }
+
+    ## ******************************************** ##
+    # Low stock monitoring
+    ## ******************************************** ##
+
+    # The product with the lowest quantity, None if there are no products
+    def peek_low_stock(self):
+        entry = self.stock_heap.peek()
+        return None if entry is None else self.products[entry[1]]
+
+    # Products with a quantity at or below the threshold, lowest quantity first
+    # Only the matching part of the stock heap is visited
+    def low_stock_products(self, threshold: int) -> list:
+        products = self.products
+        return [
+            products[product_id]
+            for _, product_id in self.stock_heap.at_most(threshold)
+        ]
+
+    # Call back with the product whenever a quantity falls to or below the threshold
+    # Callbacks run on the thread changing the quantity and must not change the
+    # inventory. Returns the subscription to pass to unsubscribe_low_stock
+    def subscribe_low_stock(self, threshold: int, callback):
+        subscription = (threshold, callback)
+        self.low_stock_subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe_low_stock(self, subscription):
+        if subscription in self.low_stock_subscriptions:
+            self.low_stock_subscriptions.remove(subscription)
+
+    # Move the product in the stock heap and notify the low stock subscribers
+    def _stock_changed(self, product: Product, old_quantity: int):
+        self.stock_heap.push(product.product_id, product.quantity)
+        if self.low_stock_subscriptions:
+            self._notify_low_stock(product, old_quantity)
+
+    # Notify the subscribers whose threshold the quantity crossed
+    # A new product, with no old quantity, notifies when it starts at a threshold
+    def _notify_low_stock(self, product: Product, old_quantity: int):
+        quantity = product.quantity
+        for threshold, callback in self.low_stock_subscriptions:
+            if quantity <= threshold and (
+                old_quantity is None or old_quantity > threshold
+            ):
+                callback(product)
+
+    # View product price history
+    # A copy of the history, so later price changes never show up in it
+    def get_product_price_history(self, product_id: int) -> PriceHistory:
+        if product_id not in self.products:
+            raise ValueError("Unable to find the product using passed in id")
+
+        return self.products[product_id].price_history.copy()
+
+    # The price of the product at the passed in time, None before it was added
+    def get_product_price_at(self, product_id: int, when: datetime):
+        if product_id not in self.products:
+            raise ValueError("Unable to find the product using passed in id")
+
+        return self.products[product_id].price_history.price_at(when)
+
+    # The price changes of the product between start and end (inclusive)
+    # With an interval, only the last change of every interval of seconds is kept
+    def get_product_price_history_between(
+        self,
+        product_id: int,
+        start: datetime = None,
+        end: datetime = None,
+        interval: float = None,
+    ) -> PriceHistory:
+        if product_id not in self.products:
+            raise ValueError("Unable to find the product using passed in id")
+
+        history = self.products[product_id].price_history.between(start, end)
+        return history if interval is None else history.downsample(interval)
+
+    # Apply the retention limits after a price change
+    # Ages are measured from the change, so a replayed log trims the same entries
+    def _retain_price_history(self, product: Product, changed_at: datetime):
+        if self.price_history_limit is None and self.price_history_retention is None:
+            return
+        before = None
+        if self.price_history_retention is not None:
+            before = datetime.fromtimestamp(
+                changed_at.timestamp() - self.price_history_retention
+            )
+        product.price_history.trim(before, self.price_history_limit)
+
+    # Search product by name
+    # Uses the trigram index so only the candidate products are compared
+    def search_product_by_name_no_cache(self, name: str):
+        products = self.products
+        return [products[product_id] for product_id in self._search_names(name)]
+
+    # Adding the cache
+    def search_product_by_name(self, name: str):
+        return self._cached_search(
+            "product_name", name.casefold(), self.search_product_by_name_no_cache, name
+        )
+
+    # Manual cache memory search
+    def search_product_by_name_memo(self, name: str):
+        # If this name is present in the memory, return with the value
+        key = name.casefold()
+        result = self.memoized_search.get("product_name", key)
+        if result is not None:
+            return result
+        result = self.search_product_by_name_no_cache(name)
+        # Store this value to cache
+        self.memoized_search.put("product_name", key, result)
+        return result
+
+    # Search product by price range
+    # All variants use the sorted price index instead of scanning every product
+    def search_product_by_price_range_no_cache(
+        self, min_price: float, max_price: float
+    ):
+        return self._search_price_index(min_price, max_price)
+
+    # Adding the cache
+    def search_product_by_price_range(self, min_price: float, max_price: float):
+        return self._cached_search(
+            "price_range",
+            (min_price, max_price),
+            self._search_price_index,
+            min_price,
+            max_price,
+        )
+
+    # Manual cache memory search
+    def search_product_by_price_range_memo(self, min_price: float, max_price: float):
+        # Setup a unique key with min and max price
+        key = (min_price, max_price)
+        # If this key is present, return value from memory
+        result = self.memoized_search.get("price_range", key)
+        if result is not None:
+            return result
+        # Add this result to cache
+        result = self._search_price_index(min_price, max_price)
+        self.memoized_search.put("price_range", key, result)
+        return result
+
+    # Look up the products in the price range using the price index
+    def _search_price_index(self, min_price: float, max_price: float):
+        products = self.products
+        if len(self.inactive_price_index):
+            product_ids = self._price_range(min_price, max_price)
+        else:
+            product_ids = self.price_index.find_range(min_price, max_price)
+        return [products[product_id] for product_id in product_ids]
+
+    # Product ids whose name contains the query, from the live name index and,
+    # unless active_only, the inactive one
+    def _search_names(self, name: str, active_only: bool = False) -> list:
+        product_ids = self.product_name_index.search(name)
+        if not active_only and len(self.inactive_name_index):
+            product_ids += self.inactive_name_index.search(name)
+        return product_ids
+
+    # Product ids in the price range in (price, product_id) order, see iter_range
+    # Unless active_only, the live and inactive price indexes are merged
+    def _price_range(
+        self,
+        min_price: float,
+        max_price: float,
+        active_only: bool = False,
+        after=None,
+        reverse: bool = False,
+    ):
+        if active_only or not len(self.inactive_price_index):
+            return self.price_index.iter_range(min_price, max_price, after, reverse)
+        pairs = heapq.merge(
+            self.price_index.iter_pairs(min_price, max_price, after, reverse),
+            self.inactive_price_index.iter_pairs(min_price, max_price, after, reverse),
+            reverse=reverse,
+        )
+        return (product_id for _, product_id in pairs)
+
+    # Search product by category id
+    # All variants use the category to products index instead of scanning every product
+    def search_product_by_category_id_no_cache(self, category_id: int):
+        return self._search_category_index(category_id)
+
+    # Adding the cache
+    def search_product_by_category_id(self, category_id: int):
+        return self._cached_search(
+            "category_id", category_id, self._search_category_index, category_id
+        )
+
+    # Manual memoization
+    def search_product_by_category_id_memo(self, category_id: int):
+        result = self.memoized_search.get("category_id", category_id)
+        if result is not None:
+            return result
+
+        result = self._search_category_index(category_id)
+        self.memoized_search.put("category_id", category_id, result)
+        return result
+
+    # Look up the products of a category using the category index
+    # The products of a deleted category are only listed by orphaned_products
+    def _search_category_index(self, category_id: int):
+        if category_id not in self.categories:
+            return []
+        products = self.products
+        return [
+            products[product_id]
+            for product_id in self.category_products.get(category_id, ())
+        ]
+
+    # Search product by category name
+    # The matching categories are found with the trigram index and their
+    # products with the category index
+    def search_product_by_category_name_no_cache(self, name: str):
+        products = self.products
+        category_products = self.category_products
+        return [
+            products[product_id]
+            for category_id in self.category_name_index.search(name)
+            for product_id in category_products.get(category_id, ())
+        ]
+
+    # Adding the cache
+    def search_product_by_category_name(self, name: str):
+        return self._cached_search(
+            "product_category_name",
+            name.casefold(),
+            self.search_product_by_category_name_no_cache,
+            name,
+        )
+
+    # Manual
+    def search_product_by_category_name_memo(self, name: str):
+        key = name.casefold()
+        result = self.memoized_search.get("product_category_name", key)
+        if result is not None:
+            return result
+        result = self.search_product_by_category_name_no_cache(name)
+        self.memoized_search.put("product_category_name", key, result)
+        return result
+
+    ## ******************************************** ##
+    # Lazy, top-K and paginated searches
+    ## ******************************************** ##
+
+    # Generator variants yield the products one at a time and are never cached
+    # They read the inventory as they are consumed, so do not change it meanwhile
+    # With active_only the products of inactive categories are skipped, they are
+    # not in the live indexes so they are never visited
+    def iter_products_by_name(self, name: str, active_only: bool = False):
+        products = self.products
+        for product_id in self._search_names(name, active_only):
+            yield products[product_id]
+
+    def iter_products_by_price_range(
+        self, min_price: float, max_price: float, active_only: bool = False
+    ):
+        products = self.products
+        for product_id in self._price_range(min_price, max_price, active_only):
+            yield products[product_id]
+
+    def iter_products_by_category_id(self, category_id: int, active_only: bool = False):
+        if category_id not in self.categories or (
+            active_only and not self._is_active(category_id)
+        ):
+            return
+        products = self.products
+        for product_id in self.category_products.get(category_id, ()):
+            yield products[product_id]
+
+    def iter_products_by_category_name(self, name: str, active_only: bool = False):
+        for category_id in self.category_name_index.search(name):
+            yield from self.iter_products_by_category_id(category_id, active_only)
+
+    # True when the category exists and is active
+    def _is_active(self, category_id: int) -> bool:
+        category = self.categories.get(category_id)
+        return category is not None and bool(category.status)
+
+    # The first k matching products in sort order
+    # A heap keeps only k products while the matches are scanned
+    def top_products(
+        self,
+        k: int,
+        order_by: str = "price",
+        descending: bool = False,
+        name: str = None,
+        category_id: int = None,
+        min_price: float = None,
+        max_price: float = None,
+        active_only: bool = False,
+    ) -> list:
+        return self.page_products(
+            k,
+            None,
+            order_by,
+            descending,
+            name,
+            category_id,
+            min_price,
+            max_price,
+            active_only,
+        )[0]
+
+    # One page of matching products in sort order
+    # Returns the products and the cursor of the next page, None after the last page
+    # The cursor is the sort key of the last product returned
+    # Without a name or category filter, pages in price order are read straight
+    # from the price index, otherwise a heap selects the page from the matches
+    def page_products(
+        self,
+        limit: int = 50,
+        cursor=None,
+        order_by: str = "price",
+        descending: bool = False,
+        name: str = None,
+        category_id: int = None,
+        min_price: float = None,
+        max_price: float = None,
+        active_only: bool = False,
+    ) -> tuple:
+        if order_by not in self.SORT_KEYS:
+            raise ValueError(f"Unable to sort products by {order_by}")
+        sort_key = self.SORT_KEYS[order_by]
+        if order_by == "price" and name is None and category_id is None:
+            products = self.products
+            product_ids = self._price_range(
+                -inf if min_price is None else min_price,
+                inf if max_price is None else max_price,
+                active_only,
+                cursor,
+                descending,
+            )
+            page = [
+                products[product_id] for product_id in islice(product_ids, limit + 1)
+            ]
+            self.rows_read += len(page)
+        else:
+            matches = self.plan_query(
+                category_id, (min_price, max_price), name, active_only=active_only
+            ).rows()
+            if cursor is not None:
+                cursor = tuple(cursor)
+                if descending:
+                    matches = (
+                        product for product in matches if sort_key(product) < cursor
+                    )
+                else:
+                    matches = (
+                        product for product in matches if sort_key(product) > cursor
+                    )
+            select = heapq.nlargest if descending else heapq.nsmallest
+            page = select(limit + 1, matches, key=sort_key)
+        if len(page) <= limit:
+            return page, None
+        del page[limit:]
+        return page, sort_key(page[-1])
+
+    ## ******************************************** ##
+    # Multi-predicate queries
+    ## ******************************************** ##
+
+    # Products matching every passed in predicate, read from the most selective
+    # index. price is a (min, max) pair and in_stock keeps the products with a
+    # positive quantity, or without one when False. active_only skips the
+    # products of inactive categories. Not cached
+    def query(
+        self,
+        category_id: int = None,
+        price: tuple = None,
+        name_contains: str = None,
+        in_stock: bool = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        active_only: bool = False,
+    ) -> list:
+        return self.plan_query(
+            category_id,
+            price,
+            name_contains,
+            in_stock,
+            order_by,
+            descending,
+            limit,
+            active_only,
+        ).execute()
+
+    # The plan query would run, as text
+    def explain(
+        self,
+        category_id: int = None,
+        price: tuple = None,
+        name_contains: str = None,
+        in_stock: bool = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        active_only: bool = False,
+    ) -> str:
+        return self.plan_query(
+            category_id,
+            price,
+            name_contains,
+            in_stock,
+            order_by,
+            descending,
+            limit,
+            active_only,
+        ).explain()
+
+    def plan_query(
+        self,
+        category_id: int = None,
+        price: tuple = None,
+        name_contains: str = None,
+        in_stock: bool = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        active_only: bool = False,
+    ) -> QueryPlan:
+        return QueryPlan(
+            self,
+            category_id,
+            price,
+            name_contains,
+            in_stock,
+            order_by,
+            descending,
+            limit,
+            active_only,
+        )
+
+    # Invalidate the cached product searches which could match a product
+    # with the passed in search name, price or category
+    # Name searches are cached under the casefolded query, so they compare
+    # directly with the search names, and only the price ranges holding the
+    # price are visited
+    def _invalidate_product_searches(
+        self, search_name: str = None, price: float = None, category: Category = None
+    ):
+        for cache in self._caches():
+            if search_name is not None:
+                cache.invalidate_substrings("product_name", search_name)
+            if price is not None:
+                cache.invalidate_containing("price_range", price)
+            if category is not None:
+                cache.discard("category_id", category.category_id)
+                cache.invalidate_substrings(
+                    "product_category_name", category.search_name
+                )
+
+    # Invalidate the cached searches which could match the category search name
+    def _invalidate_category_searches(self, search_name: str):
+        for cache in self._caches():
+            for kind in ("category_name", "product_category_name"):
+                cache.invalidate_substrings(kind, search_name)
+
+    # Save the inventory into a binary snapshot file
+    # The file is written next to the target and renamed, so a crash never
+    # leaves a partial snapshot behind
+    def save_snapshot(self, path: str):
+        os.replace(self._write_snapshot(path), path)
+
+    # Write the snapshot next to the target and return the path of the new file
+    def _write_snapshot(self, path: str) -> str:
+        strings = {}
+        # Deleted categories still referenced by a product are saved as detached
+        detached = {}
+        for product in self.products.values():
+            category_id = product.category.category_id
+            if category_id not in self.categories:
+                detached[category_id] = product.category
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as snapshot:
+            snapshot.write(bytes(SNAPSHOT_HEADER.size))
+            categories_offset = snapshot.tell()
+            for flags, categories in (
+                (0, self.categories.values()),
+                (CATEGORY_DETACHED, detached.values()),
+            ):
+                for category in categories:
+                    snapshot.write(
+                        SNAPSHOT_CATEGORY.pack(
+                            category.category_id,
+                            strings.setdefault(category.name, len(strings)),
+                            flags | (CATEGORY_ACTIVE if category.status else 0),
+                        )
+                    )
+
+            products_offset = snapshot.tell()
+            product_ids = sorted(self.products)
+            history_count = 0
+            # (quantity, product id) pairs and the product ids of every category
+            stock = []
+            category_products = {}
+            for product_id in product_ids:
+                product = self.products[product_id]
+                stock.append((product.quantity, product_id))
+                category_products.setdefault(product.category.category_id, []).append(
+                    product_id
+                )
+                history_length = len(product.price_history)
+                snapshot.write(
+                    SNAPSHOT_PRODUCT.pack(
+                        product_id,
+                        product.price,
+                        product.quantity,
+                        product.category.category_id,
+                        strings.setdefault(product.name, len(strings)),
+                        strings.setdefault(product.description, len(strings)),
+                        history_count,
+                        history_length,
+                    )
+                )
+                history_count += history_length
+
+            history_offset = snapshot.tell()
+            for product_id in product_ids:
+                history = self.products[product_id].price_history
+                if not isinstance(history, PriceHistory):
+                    history = PriceHistory(history)
+                history.values.tofile(snapshot)
+
+            # The snapshot keeps one price index of every product
+            prices_offset = snapshot.tell()
+            price_index = self.price_index
+            if len(self.inactive_price_index):
+                price_index = PriceIndex()
+                price_index.prices = array("d", self.price_index.prices)
+                price_index.product_ids = array("q", self.price_index.product_ids)
+                price_index.add_many(
+                    zip(
+                        self.inactive_price_index.prices,
+                        self.inactive_price_index.product_ids,
+                    )
+                )
+            price_index.prices.tofile(snapshot)
+            price_index.product_ids.tofile(snapshot)
+
+            # String table, the offset of every string followed by the utf-8 data
+            strings_offset = snapshot.tell()
+            encoded = [text.encode("utf-8") for text in strings]
+            offsets = array("Q", [0])
+            for data in encoded:
+                offsets.append(offsets[-1] + len(data))
+            offsets.tofile(snapshot)
+            string_data_offset = snapshot.tell()
+            for data in encoded:
+                snapshot.write(data)
+
+            # Stock index, the product ids sorted by quantity then the quantities
+            stock_offset = snapshot.tell()
+            stock.sort()
+            array("q", [product_id for _, product_id in stock]).tofile(snapshot)
+            array("q", [quantity for quantity, _ in stock]).tofile(snapshot)
+            # Category index, (category id, count) pairs then the product ids
+            groups_offset = snapshot.tell()
+            counts = array("q")
+            for category_id, category_ids in category_products.items():
+                counts.append(category_id)
+                counts.append(len(category_ids))
+            counts.tofile(snapshot)
+            for category_ids in category_products.values():
+                array("q", category_ids).tofile(snapshot)
+
+            snapshot.seek(0)
+            snapshot.write(
+                SNAPSHOT_HEADER.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    len(self.categories) + len(detached),
+                    len(product_ids),
+                    history_count,
+                    len(strings),
+                    categories_offset,
+                    products_offset,
+                    history_offset,
+                    prices_offset,
+                    strings_offset,
+                    string_data_offset,
+                    self.lsn,
+                    stock_offset,
+                    groups_offset,
+                    len(category_products),
+                )
+            )
+        return temp_path
+
+    # Create an inventory from a binary snapshot file
+    # The file is memory-mapped, products are materialized on first access and
+    # the product name index is built on the first name search
+    @classmethod
+    def load_snapshot(cls, path: str, **options):
+        cls._reject_product_store(options)
+        snapshot = SnapshotFile(path)
+        inventory = cls(**options)
+        inventory.lsn = snapshot.lsn
+        all_categories = {}
+        for category_id, name, flags in snapshot.category_records():
+            category = Category(
+                category_id, snapshot.string(name), bool(flags & CATEGORY_ACTIVE)
+            )
+            all_categories[category_id] = category
+            if not flags & CATEGORY_DETACHED:
+                inventory.categories[category_id] = category
+                inventory.category_name_index.add(category_id, category.search_name)
+
+        # The indexes read the records of the file the products are served from,
+        # which a checkpoint replaces
+        products = inventory.products = SnapshotProducts(snapshot, all_categories)
+        inventory.price_index = snapshot.price_index()
+        category_products = inventory.category_products
+        if snapshot.stock_offset is None:
+            for record in snapshot.product_records():
+                category_products.setdefault(record[3], set()).add(record[0])
+            inventory.stock_heap.push_many(
+                (record[0], record[2]) for record in snapshot.product_records()
+            )
+        else:
+            for category_id, product_ids in snapshot.category_index():
+                category_products[category_id] = set(product_ids)
+            inventory.stock_heap.loader = lambda: products.snapshot.stock_index()
+        # The products of inactive categories are moved to the inactive indexes,
+        # the live name index only loads the others
+        inactive = {
+            category_id
+            for category_id, category in all_categories.items()
+            if not category.status
+        }
+        inactive_records = [
+            snapshot.find_product(product_id)
+            for category_id in inactive
+            for product_id in sorted(category_products.get(category_id, ()))
+        ]
+        inventory.inactive_name_index = NgramIndex(compact=True)
+        if inactive_records:
+            pairs = [(record[1], record[0]) for record in inactive_records]
+            inventory.price_index.remove_many(pairs)
+            inventory.inactive_price_index.add_many(pairs)
+            for record in inactive_records:
+                inventory.inactive_name_index.add(
+                    record[0], snapshot.string(record[4]).casefold()
+                )
+        inventory.product_name_index = NgramIndex(
+            compact=True,
+            loader=lambda: (
+                (record[0], products.snapshot.string(record[4]).casefold())
+                for record in products.snapshot.product_records()
+                if record[3] not in inactive
+            ),
+        )
+        return inventory
+
+    # A loaded snapshot always serves its products from the mapped file, so a
+    # product store passed in would be silently replaced
+    @staticmethod
+    def _reject_product_store(options: dict):
+        if options.get("product_store") is not None:
+            raise ValueError(
+                "A snapshot serves its products from the file, product_store "
+                "cannot be passed"
+            )
+
+    ## ******************************************** ##
+    # Durability using the write-ahead log
+    ## ******************************************** ##
+
+    # Record every following mutation in the write-ahead log
+    def attach_wal(self, wal: WriteAheadLog):
+        self.wal = wal
+        # Continue numbering after the records already applied to this inventory
+        wal.lsn = max(wal.lsn, self.lsn)
+
+    # Rebuild an inventory after a crash from the latest snapshot, if there is
+    # one, and the log records written after it. The log is attached again
+    @classmethod
+    def recover(
+        cls,
+        snapshot_path: str,
+        wal_path: str,
+        group_size: int = 1000,
+        group_interval: float = 0.01,
+        **options,
+    ):
+        # Rejected even without a snapshot, a later recovery would load one
+        cls._reject_product_store(options)
+        if os.path.exists(snapshot_path):
+            inventory = cls.load_snapshot(snapshot_path, **options)
+        else:
+            inventory = cls(**options)
+        for lsn, timestamp, op, args in WriteAheadLog.read(wal_path):
+            if lsn <= inventory.lsn:
+                continue
+            inventory.replay_time = timestamp
+            try:
+                getattr(inventory, op)(*args)
+            finally:
+                inventory.replay_time = None
+            inventory.lsn = lsn
+        inventory.attach_wal(WriteAheadLog(wal_path, group_size, group_interval))
+        return inventory
+
+    # Compact the log by folding it into a new snapshot and truncating it
+    # An inventory loaded from the snapshot being replaced unmaps it first, as
+    # Windows cannot replace a mapped file, and then serves the new file
+    def checkpoint(self, snapshot_path: str):
+        if self.wal is not None:
+            self.wal.flush()
+        temp_path = self._write_snapshot(snapshot_path)
+        products = self.products
+        remap = isinstance(products, SnapshotProducts) and os.path.abspath(
+            products.snapshot.path
+        ) == os.path.abspath(snapshot_path)
+        if remap:
+            products.snapshot.close()
+        os.replace(temp_path, snapshot_path)
+        if remap:
+            products.remap(SnapshotFile(snapshot_path))
+        if self.wal is not None:
+            self.wal.truncate()
+
+    # Append a mutation to the write-ahead log, if one is attached
+    # Quantity changes log concurrently, so a later record may return first and
+    # the sequence number only ever moves forward
+    def _log(self, op: str, *args, timestamp: datetime = None):
+        if self.wal is not None:
+            lsn = self.wal.append(
+                op, args, timestamp.timestamp() if timestamp else None
+            )
+            with self.wal.lock:
+                self.lsn = max(self.lsn, lsn)
+
+    # Time of a price change, the logged time while a record is replayed
+    def _timestamp(self) -> datetime:
+        if self.replay_time is not None:
+            return datetime.fromtimestamp(self.replay_time)
+        return datetime.now()
+
+    ## ******************************************** ##
+    # Concurrency
+    ## ******************************************** ##
+
+    # Wrap the public methods of this inventory with the locks they need
+    # Only this instance is wrapped, a single threaded inventory pays nothing
+    def _enable_locking(self, lock_stripes: int):
+        self.lock = ReadWriteLock()
+        self.stripes = [threading.Lock() for _ in range(lock_stripes)]
+        self.version_lock = threading.Lock()
+        for cache in self._caches():
+            cache.lock = threading.Lock()
+        self.stock_heap.lock = threading.Lock()
+        for name in self.READ_METHODS:
+            setattr(self, name, self._locked(getattr(self, name), False))
+        for name in self.WRITE_METHODS:
+            setattr(self, name, self._locked(getattr(self, name), True))
+        for name in self.STOCK_METHODS:
+            setattr(self, name, self._stock_locked(getattr(self, name)))
+        for name in self.STOCK_BATCH_METHODS:
+            setattr(self, name, self._stock_batch_locked(getattr(self, name)))
+
+    # Run the method holding the read or the write side of the lock
+    def _locked(self, method, write: bool):
+        lock = self.lock
+        acquire = lock.acquire_write if write else lock.acquire_read
+
+        @wraps(method)
+        def locked(*args, **kwargs):
+            acquire()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                lock.release()
+
+        return locked
+
+    # Run a quantity change holding the read side of the lock and the stripe
+    # of the product, so changes to the same product are applied one at a time
+    def _stock_locked(self, method):
+        lock = self.lock
+        stripes = self.stripes
+
+        @wraps(method)
+        def locked(product_id, *args, **kwargs):
+            lock.acquire_read()
+            try:
+                with stripes[hash(product_id) % len(stripes)]:
+                    return method(product_id, *args, **kwargs)
+            finally:
+                lock.release()
+
+        return locked
+
+    # Run a batch of quantity changes holding the read side of the lock and the
+    # stripes of every product in the batch
+    # Stripes are always taken in index order, so two batches cannot deadlock
+    def _stock_batch_locked(self, method):
+        lock = self.lock
+        stripes = self.stripes
+
+        @wraps(method)
+        def locked(lines, *args, **kwargs):
+            lines = list(lines)
+            held = sorted({hash(line[0]) % len(stripes) for line in lines})
+            lock.acquire_read()
+            try:
+                for index in held:
+                    stripes[index].acquire()
+                try:
+                    return method(lines, *args, **kwargs)
+                finally:
+                    for index in reversed(held):
+                        stripes[index].release()
+            finally:
+                lock.release()
+
+        return locked
+
+    ## ******************************************** ##
+    # Instrumentation
+    ## ******************************************** ##
+
+    # Record latencies, rows and invalidations of every public method
+    # Only this instance is wrapped, an inventory without metrics pays nothing
+    # Counters are read before and after each call, so with many threads the rows
+    # and invalidations of overlapping calls may be attributed to either of them
+    def enable_metrics(self):
+        if self.metrics is not None:
+            return
+        self.metrics = InventoryMetrics()
+        for name in self.READ_METHODS:
+            setattr(self, name, self._measured(getattr(self, name), False))
+        for name in self.MUTATING_METHODS:
+            setattr(self, name, self._measured(getattr(self, name), True))
+
+    # The recorded metrics and the cache statistics as a dictionary
+    def metrics_snapshot(self) -> dict:
+        if self.metrics is None:
+            raise ValueError("Metrics are not enabled for this inventory")
+        return self.metrics.snapshot(Inventory.cache_stats(self))
+
+    # The recorded metrics and the cache statistics in the Prometheus text format
+    def metrics_prometheus(self) -> str:
+        if self.metrics is None:
+            raise ValueError("Metrics are not enabled for this inventory")
+        return self.metrics.prometheus(Inventory.cache_stats(self))
+
+    # Run the method recording its latency, and the rows of a search or the
+    # invalidations of a mutation
+    def _measured(self, method, mutation: bool):
+        metrics = self.metrics
+        name = method.__name__
+        memoized_search, search_cache = self._caches()
+        perf_counter = time.perf_counter
+        search = name.startswith("search_") or name in (
+            "query",
+            "page_products",
+            "top_products",
+        )
+        # Products of these searches are read straight from the price or category
+        # index, every product read is returned
+        reads_index = search and "product_by_" in name and "_by_name" not in name
+
+        @wraps(method)
+        def measured(*args, **kwargs):
+            active = metrics.active
+            if getattr(active, "method", None) is not None:
+                return method(*args, **kwargs)
+            active.method = name
+            if mutation:
+                invalidations = (
+                    memoized_search.invalidations + search_cache.invalidations
+                )
+            elif search:
+                scanned = (
+                    self.product_name_index.scanned
+                    + self.inactive_name_index.scanned
+                    + self.category_name_index.scanned
+                    + self.rows_read
+                )
+                hits = memoized_search.hits + search_cache.hits
+            start = perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException:
+                metrics.observe(name, perf_counter() - start)
+                raise
+            finally:
+                active.method = None
+                if mutation:
+                    metrics.invalidated(
+                        name,
+                        memoized_search.invalidations
+                        + search_cache.invalidations
+                        - invalidations,
+                    )
+            seconds = perf_counter() - start
+            if not search:
+                metrics.observe(name, seconds)
+                return result
+            # A page is returned with the cursor of the next one
+            returned = len(result[0] if name == "page_products" else result)
+            scanned = (
+                self.product_name_index.scanned
+                + self.inactive_name_index.scanned
+                + self.category_name_index.scanned
+                + self.rows_read
+                - scanned
+            )
+            if reads_index and memoized_search.hits + search_cache.hits == hits:
+                scanned += returned
+            metrics.observe(name, seconds, scanned, returned)
+            return result
+
+        return measured
+
+    ## ******************************************** ##
+    # Change data capture
+    ## ******************************************** ##
+
+    # Publish every following change of a product or category to a ChangeFeed
+    # keeping the latest retention events. Returns the feed to subscribe to
+    def enable_change_feed(self, retention: int = 100000) -> ChangeFeed:
+        if self.change_feed is None:
+            self.change_feed = ChangeFeed(retention)
+        return self.change_feed
+
+    # Publish a change, at the logged time while a record is replayed
+    def _publish(
+        self,
+        op: str,
+        entity: str,
+        key,
+        action: str,
+        changes: dict,
+        timestamp: datetime = None,
+    ):
+        self.change_feed.publish(
+            op,
+            entity,
+            key,
+            action,
+            changes,
+            timestamp.timestamp() if timestamp else self.replay_time,
+        )
+
+    # The fields of a product published when it is added
+    @staticmethod
+    def _product_fields(product: Product) -> dict:
+        return {
+            "name": product.name,
+            "price": product.price,
+            "description": product.description,
+            "category_id": product.category.category_id,
+            "quantity": product.quantity,
+        }
+
+    ## ******************************************** ##
+    # Point-in-time snapshots
+    ## ******************************************** ##
+
+    # A consistent read only view of the inventory as it is now, see
+    # InventorySnapshot. Taking it is O(1), nothing is copied
+    def snapshot(self) -> "InventorySnapshot":
+        snapshot = InventorySnapshot(self)
+        self.snapshots.add(snapshot)
+        return snapshot
+
+    # Stop saving the changed products into the snapshot
+    def release_snapshot(self, snapshot: "InventorySnapshot"):
+        self.snapshots.discard(snapshot)
+
+    # Save the current state of the products into the open snapshots which have
+    # not saved it yet, before a write changes them
+    # Products which do not exist yet are saved as None. One copy is shared by
+    # every snapshot, and nothing is done while no snapshot is open
+    def _preserve(self, product_ids):
+        if not self.snapshots:
+            return
+        snapshots = list(self.snapshots)
+        products = self.products
+        for product_id in product_ids:
+            waiting = [
+                snapshot
+                for snapshot in snapshots
+                if product_id not in snapshot.products_before
+            ]
+            if not waiting:
+                continue
+            product = products.get(product_id)
+            before = None if product is None else product.copy()
+            for snapshot in waiting:
+                snapshot.products_before[product_id] = before
+
+    # Same as _preserve, for the categories
+    def _preserve_categories(self, category_ids):
+        if not self.snapshots:
+            return
+        snapshots = list(self.snapshots)
+        categories = self.categories
+        for category_id in category_ids:
+            waiting = [
+                snapshot
+                for snapshot in snapshots
+                if category_id not in snapshot.categories_before
+            ]
+            if not waiting:
+                continue
+            category = categories.get(category_id)
+            before = None if category is None else category.copy()
+            for snapshot in waiting:
+                snapshot.categories_before[category_id] = before
+
+    # Vectorized query engine over the product columns, requires NumPy
+    def vector_query(self) -> VectorQueryEngine:
+        if self.vector_engine is None:
+            self.vector_engine = VectorQueryEngine(self)
+        return self.vector_engine
+
+    # Report the hit and miss rates of the caches
+    def cache_stats(self) -> dict:
+        return {
+            "memoized_search": self.memoized_search.stats(),
+            "search_cache": self.search_cache.stats(),
+        }
+
+    # The caches kept by this inventory
+    def _caches(self):
+        return (self.memoized_search, self.search_cache)
+
+    # Return the cached result of a search, computing and caching it on a miss
+    def _cached_search(self, kind: str, key, search, *args):
+        result = self.search_cache.get(kind, key)
+        if result is None:
+            result = search(*args)
+            self.search_cache.put(kind, key, result)
+        return result
+
+    # A method to clear all cache
+    def clear_cache(self):
+        # Clearing all the manual cache
+        self.memoized_search.clear()
+        # Clearing all the automatic cache
+        self.search_cache.clear()
+
+    # Finally a product to print the inventory class
+    def __repr__(self):
+        return f"Inventory Details \nCategories:{list(self.categories.values())}, \n\nProducts:{list(self.products.values())})"
+
+
+## ****************************** ##
+## Point-in-time snapshots
+## ****************************** ##
+# A snapshot is a consistent, read only view of an inventory at one moment, for
+# long running reads such as reports while writers keep changing the inventory
+# Nothing is copied when it is taken. Until it is closed, every write first
+# saves the state of the products and categories it is about to change into the
+# snapshot, so its memory only grows with the writes made while it is open
+# A read copies the live product and then looks for a saved state, which the
+# writer stored before changing anything, so a racing write is never seen half
+# applied. Products and categories read from a snapshot are copies
+class InventorySnapshot:
+    # Constructor to open a snapshot of the inventory, use Inventory.snapshot
+    def __init__(self, inventory: Inventory):
+        self.inventory = inventory
+        self.version = inventory.version
+        self.lsn = inventory.lsn
+        # State of the products and categories changed since the snapshot was
+        # taken, None for the ones which did not exist yet
+        self.products_before = {}
+        self.categories_before = {}
+        self.closed = False
+        self.products = SnapshotMapping(self.product, self.product_ids)
+        self.categories = SnapshotMapping(self.category, self.category_ids)
+
+    # The product as it was when the snapshot was taken, raises KeyError when it
+    # did not exist. The category of the copy is the snapshot's category too
+    def product(self, product_id: int) -> Product:
+        self._check_open()
+        product = self._read_live(self._copy_live, product_id)
+        before = self.products_before.get(product_id, product)
+        if before is None:
+            raise KeyError(product_id)
+        if before is not product:
+            product = before.copy()
+        try:
+            product.category = self.category(product.category.category_id)
+        except KeyError:
+            # Deleted before the snapshot was taken, so it no longer changes
+            product.category = product.category.copy()
+        return product
+
+    # The category as it was when the snapshot was taken
+    def category(self, category_id: int) -> Category:
+        self._check_open()
+        category = self.inventory.categories.get(category_id)
+        if category is not None:
+            category = category.copy()
+        before = self.categories_before.get(category_id, category)
+        if before is None:
+            raise KeyError(category_id)
+        return before if before is category else before.copy()
+
+    # Ids of the products when the snapshot was taken
+    def product_ids(self) -> list:
+        return self._ids(self.inventory.products, self.products_before)
+
+    # Ids of the categories when the snapshot was taken
+    def category_ids(self) -> list:
+        return self._ids(self.inventory.categories, self.categories_before)
+
+    # Stop tracking the inventory and drop the saved states
+    def close(self):
+        if self.closed:
+            return
+        self.inventory.release_snapshot(self)
+        self.closed = True
+        self.products_before = {}
+        self.categories_before = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (
+            f"InventorySnapshot(version={self.version}, "
+            f"changed products={len(self.products_before)})"
+        )
+
+    # The live ids without the ones added since, plus the deleted ones
+    # The live ids are listed before the saved states are read, so an id
+    # deleted in between is found in one of them
+    def _ids(self, live, before: dict) -> list:
+        self._check_open()
+        live_ids = self._read_live(list, live)
+        ids = [key for key in live_ids if key not in before or before[key] is not None]
+        live_ids = set(live_ids)
+        ids.extend(
+            key
+            for key, value in list(before.items())
+            if value is not None and key not in live_ids
+        )
+        return ids
+
+    # A copy of the live product, None if there is none
+    def _copy_live(self, product_id: int):
+        try:
+            return self.inventory.products[product_id].copy()
+        except KeyError:
+            return None
+
+    # Run the read on the live inventory, holding off the structural writers
+    # when the inventory is shared between threads
+    def _read_live(self, read, *args):
+        lock = self.inventory.lock
+        if lock is None:
+            return read(*args)
+        lock.acquire_read()
+        try:
+            return read(*args)
+        finally:
+            lock.release()
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("The snapshot is closed")
+
+
+# Read only mapping of a snapshot's products or categories
+class SnapshotMapping(Mapping):
+    def __init__(self, read, ids):
+        self.read = read
+        self.ids = ids
+
+    def __getitem__(self, key):
+        return self.read(key)
+
+    def __iter__(self):
+        return iter(self.ids())
+
+    def __len__(self):
+        return len(self.ids())
+
+
+## ****************************** ##
+## Catalog import and export
+## ****************************** ##
+# Catalog files are CSV with a header row or JSON lines, optionally gzip compressed
+# Files are read and written one row at a time, so memory use does not grow with
+# the file size. Imported rows are handed to the inventory in bulk batches
+CATEGORY_FIELDS = ("category_id", "name", "status")
+PRODUCT_FIELDS = ("product_id", "name", "price", "description", "category_id", "quantity")
+PRICE_HISTORY_FIELDS = ("product_id", "timestamp", "price")
+
+
+# Import categories from a catalog file, returns the number of categories added
+def import_categories(
+    inventory: Inventory, path: str, batch_size: int = 10000, file_format: str = None
+) -> int:
+    rows = (
+        (int(row["category_id"]), row["name"], _parse_status(row.get("status", True)))
+        for row in _read_catalog(path, file_format)
+    )
+    return sum(
+        inventory.add_categories_bulk(batch) for batch in _batches(rows, batch_size)
+    )
+
+
+# Import products from a catalog file, returns the number of products added
+def import_products(
+    inventory: Inventory, path: str, batch_size: int = 10000, file_format: str = None
+) -> int:
+    rows = (
+        (
+            int(row["product_id"]),
+            row["name"],
+            float(row["price"]),
+            row.get("description") or "",
+            int(row["category_id"]),
+            int(row["quantity"]),
+        )
+        for row in _read_catalog(path, file_format)
+    )
+    return sum(
+        inventory.add_products_bulk(batch) for batch in _batches(rows, batch_size)
+    )
+
+
+# Export the inventory into category, product and price history catalog files
+# Returns the number of rows written to each file
+def export_catalog(
+    inventory: Inventory,
+    categories_path: str,
+    products_path: str,
+    price_history_path: str = None,
+    file_format: str = None,
+) -> dict:
+    # Deleted categories of orphaned products are written as inactive categories,
+    # so every exported product row references a category of the export
+    detached = {
+        product.category.category_id: product.category
+        for product in inventory.orphaned_products()
+    }
+    counts = {
+        "categories": _write_catalog(
+            categories_path,
+            CATEGORY_FIELDS,
+            chain(
+                (
+                    (category.category_id, category.name, category.status)
+                    for category in inventory.categories.values()
+                ),
+                (
+                    (category.category_id, category.name, False)
+                    for category in detached.values()
+                ),
+            ),
+            file_format,
+        ),
+        "products": _write_catalog(
+            products_path,
+            PRODUCT_FIELDS,
+            (
+                (
+                    product.product_id,
+                    product.name,
+                    product.price,
+                    product.description,
+                    product.category.category_id,
+                    product.quantity,
+                )
+                for product in inventory.products.values()
+            ),
+            file_format,
+        ),
+    }
+    if price_history_path is not None:
+        counts["price_history"] = _write_catalog(
+            price_history_path,
+            PRICE_HISTORY_FIELDS,
+            (
+                (product.product_id, changed_at.isoformat(), price)
+                for product in inventory.products.values()
+                for changed_at, price in product.price_history
+            ),
+            file_format,
+        )
+    return counts
+
+
+# Catalog format from the passed in format or from the file extension
+def _catalog_format(path: str, file_format: str = None) -> str:
+    if file_format is None:
+        name = path[:-3] if path.endswith(".gz") else path
+        file_format = "csv" if name.endswith(".csv") else "jsonl"
+    if file_format not in ("csv", "jsonl"):
+        raise ValueError("Catalog format must be csv or jsonl")
+    return file_format
+
+
+# Open a catalog file as text, gzip files are decompressed while streaming
+def _open_catalog(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+# Yield every row of a catalog file as a dictionary
+def _read_catalog(path: str, file_format: str = None):
+    file_format = _catalog_format(path, file_format)
+    with _open_catalog(path, "r") as catalog:
+        if file_format == "csv":
+            yield from csv.DictReader(catalog)
+        else:
+            for line in catalog:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Write rows of values to a catalog file, returns the number of rows written
+def _write_catalog(path: str, fields, rows, file_format: str = None) -> int:
+    file_format = _catalog_format(path, file_format)
+    count = 0
+    with _open_catalog(path, "w") as catalog:
+        if file_format == "csv":
+            writer = csv.writer(catalog)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                catalog.write(json.dumps(dict(zip(fields, row))) + "\n")
+                count += 1
+    return count
+
+
+# Group rows into lists of at most batch size rows
+def _batches(rows, batch_size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Category status from a catalog value such as true, false, 1, 0, active or inactive
+def _parse_status(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("false", "0", "inactive", "no", "")
+
+
+## ****************************** ##
+## Sharded inventory
+## ****************************** ##
+# Products are partitioned by product id across worker processes, each owning an
+# Inventory of its own. Categories are small and copied to every shard, so each
+# shard can validate its products on its own
+# Mutations are sent to the owning shard. Product searches are sent to every shard
+# at once, answered in parallel and merged
+# Shards answer with copies, changing a returned product does not change the shard
+# A sharded inventory is driven by one thread at a time
+class ShardedInventory:
+    # Constructor to start one process per shard, one per core by default
+    # Options are passed to the Inventory of every shard
+    def __init__(self, shards: int = None, **options):
+        context = multiprocessing.get_context()
+        self.processes = []
+        self.connections = []
+        for _ in range(shards or os.cpu_count() or 1):
+            connection, shard_connection = context.Pipe()
+            process = context.Process(
+                target=_serve_shard, args=(shard_connection, options), daemon=True
+            )
+            process.start()
+            shard_connection.close()
+            self.processes.append(process)
+            self.connections.append(connection)
+        self.products = ShardedMapping(self, "products", True)
+        self.categories = ShardedMapping(self, "categories", False)
+
+    # Index of the shard owning the product
+    def _shard(self, product_id: int) -> int:
+        return hash(product_id) % len(self.connections)
+
+    # Send requests to shards, then collect the answers
+    # Every request is sent before any answer is read, so the shards work in
+    # parallel. Returns the results by shard and the first error raised
+    def _scatter(self, requests: dict):
+        for index, request in requests.items():
+            self.connections[index].send(request)
+        results = {}
+        error = None
+        for index in requests:
+            succeeded, result = self.connections[index].recv()
+            if succeeded:
+                results[index] = _attach(result)
+            elif error is None:
+                error = result
+        return results, error
+
+    # Call an inventory method of one shard
+    def _call(self, index: int, method: str, *args):
+        results, error = self._scatter({index: (method, args)})
+        if error is not None:
+            raise error
+        return results[index]
+
+    # Call an inventory method of every shard, returns the results in shard order
+    def _broadcast(self, method: str, *args) -> list:
+        results, error = self._scatter(
+            {index: (method, args) for index in range(len(self.connections))}
+        )
+        if error is not None:
+            raise error
+        return [results[index] for index in range(len(self.connections))]
 
-    # *******************************
-    # Searching prodcut by category name
-    # *******************************
-    start = time.time()
-    inventory.search_product_by_category_name_no_cache(search_category_name)
-    end = time.time()
-    searchTimes["productByCategegoryName"].append(end - start)
-    # Automatic cache
+    # Call a product search of every shard and concatenate the results
+    def _gather(self, method: str, *args) -> list:
+        return list(chain.from_iterable(self._broadcast(method, *args)))
+
+    # Each shard answers in (price, product id) order, so the results are merged
+    def _gather_by_price(self, method: str, *args) -> list:
+        return list(
+            heapq.merge(
+                *self._broadcast(method, *args),
+                key=lambda product: (product.price, product.product_id),
+            )
+        )
+
+    ## ******************************************** ##
+    # Categories, copied to every shard
+    ## ******************************************** ##
+
+    # A deleted category id stays taken while any shard has orphaned products
+    def is_category_id_unique(self, category_id: int) -> bool:
+        return all(self._broadcast("is_category_id_unique", category_id))
+
+    def add_new_category(self, category_id: int, name: str, status: bool = True):
+        self._broadcast("add_new_category", category_id, name, status)
+
+    def add_categories_bulk(self, rows) -> int:
+        return self._broadcast("add_categories_bulk", list(rows))[0]
+
+    def update_category(self, cagetory_id: int, name: str = None, status: bool = None):
+        self._broadcast("update_category", cagetory_id, name, status)
+
+    def delete_category(
+        self, cagetory_id: int, cascade: str = "orphan", reassign_to: int = None
+    ):
+        self._broadcast("delete_category", cagetory_id, cascade, reassign_to)
+
+    def orphaned_products(self, category_id: int = None) -> list:
+        return self._gather("orphaned_products", category_id)
+
+    def search_category_by_name(self, name: str):
+        return self._call(0, "search_category_by_name", name)
+
+    def search_category_by_name_no_cache(self, name: str):
+        return self._call(0, "search_category_by_name_no_cache", name)
+
+    def search_category_by_name_memo(self, name: str):
+        return self._call(0, "search_category_by_name_memo", name)
+
+    ## ******************************************** ##
+    # Products, sent to the owning shard
+    ## ******************************************** ##
+
+    def is_product_id_unique(self, product_id: int) -> bool:
+        return self._call(self._shard(product_id), "is_product_id_unique", product_id)
+
+    def add_product(
+        self,
+        product_id: int,
+        name: str,
+        price: float,
+        description: str,
+        category_id: int,
+        quantity: int,
+    ):
+        self._call(
+            self._shard(product_id),
+            "add_product",
+            product_id,
+            name,
+            price,
+            description,
+            category_id,
+            quantity,
+        )
+
+    # Each shard adds its rows as a whole or not at all
+    # If any shard rejects its rows, the rows added by the others are deleted
+    def add_products_bulk(self, rows) -> int:
+        batches = {}
+        for row in rows:
+            batches.setdefault(self._shard(row[0]), []).append(row)
+        results, error = self._scatter(
+            {index: ("add_products_bulk", (batch,)) for index, batch in batches.items()}
+        )
+        if error is not None:
+            self._scatter(
+                {
+                    index: ("delete_products", ([row[0] for row in batches[index]],))
+                    for index in results
+                }
+            )
+            raise error
+        return sum(results.values())
+
+    def update_product(
+        self,
+        product_id: int,
+        name: str = None,
+        price: float = None,
+        description: str = None,
+        category_id: int = None,
+        quantity: int = None,
+    ):
+        self._call(
+            self._shard(product_id),
+            "update_product",
+            product_id,
+            name,
+            price,
+            description,
+            category_id,
+            quantity,
+        )
+
+    def delete_product(self, product_id: int):
+        self._call(self._shard(product_id), "delete_product", product_id)
+
+    def increase_product_quantity(self, product_id: int, quantity: int):
+        self._call(
+            self._shard(product_id), "increase_product_quantity", product_id, quantity
+        )
+
+    def decrease_product_quantity(self, product_id: int, quantity: int):
+        self._call(
+            self._shard(product_id), "decrease_product_quantity", product_id, quantity
+        )
+
+    # Each shard applies its lines as a whole or not at all
+    # If any shard rejects its lines, the lines applied by the others are reversed
+    def apply_stock_batch(self, lines) -> dict:
+        batches = {}
+        for product_id, delta in lines:
+            batches.setdefault(self._shard(product_id), []).append((product_id, delta))
+        results, error = self._scatter(
+            {index: ("apply_stock_batch", (batch,)) for index, batch in batches.items()}
+        )
+        if error is not None:
+            self._scatter(
+                {index: ("undo_stock_batch", (batches[index],)) for index in results}
+            )
+            raise error
+        quantities = {}
+        for result in results.values():
+            quantities.update(result)
+        return quantities
+
+    def get_product_price_history(self, product_id: int) -> PriceHistory:
+        return self._call(
+            self._shard(product_id), "get_product_price_history", product_id
+        )
+
+    def get_product_price_at(self, product_id: int, when: datetime):
+        return self._call(
+            self._shard(product_id), "get_product_price_at", product_id, when
+        )
+
+    def get_product_price_history_between(
+        self,
+        product_id: int,
+        start: datetime = None,
+        end: datetime = None,
+        interval: float = None,
+    ) -> PriceHistory:
+        return self._call(
+            self._shard(product_id),
+            "get_product_price_history_between",
+            product_id,
+            start,
+            end,
+            interval,
+        )
+
+    ## ******************************************** ##
+    # Product searches, answered by every shard
+    ## ******************************************** ##
+
+    def search_product_by_name_no_cache(self, name: str):
+        return self._gather("search_product_by_name_no_cache", name)
+
+    def search_product_by_name(self, name: str):
+        return self._gather("search_product_by_name", name)
+
+    def search_product_by_name_memo(self, name: str):
+        return self._gather("search_product_by_name_memo", name)
+
+    def search_product_by_price_range_no_cache(
+        self, min_price: float, max_price: float
+    ):
+        return self._gather_by_price(
+            "search_product_by_price_range_no_cache", min_price, max_price
+        )
+
+    def search_product_by_price_range(self, min_price: float, max_price: float):
+        return self._gather_by_price(
+            "search_product_by_price_range", min_price, max_price
+        )
+
+    def search_product_by_price_range_memo(self, min_price: float, max_price: float):
+        return self._gather_by_price(
+            "search_product_by_price_range_memo", min_price, max_price
+        )
+
+    def search_product_by_category_id_no_cache(self, category_id: int):
+        return self._gather("search_product_by_category_id_no_cache", category_id)
+
+    def search_product_by_category_id(self, category_id: int):
+        return self._gather("search_product_by_category_id", category_id)
+
+    def search_product_by_category_id_memo(self, category_id: int):
+        return self._gather("search_product_by_category_id_memo", category_id)
+
+    def search_product_by_category_name_no_cache(self, name: str):
+        return self._gather("search_product_by_category_name_no_cache", name)
+
+    def search_product_by_category_name(self, name: str):
+        return self._gather("search_product_by_category_name", name)
+
+    def search_product_by_category_name_memo(self, name: str):
+        return self._gather("search_product_by_category_name_memo", name)
+
+    # Every shard selects its own page, the pages are merged and cut to the limit
+    def top_products(
+        self,
+        k: int,
+        order_by: str = "price",
+        descending: bool = False,
+        name: str = None,
+        category_id: int = None,
+        min_price: float = None,
+        max_price: float = None,
+        active_only: bool = False,
+    ) -> list:
+        return self.page_products(
+            k,
+            None,
+            order_by,
+            descending,
+            name,
+            category_id,
+            min_price,
+            max_price,
+            active_only,
+        )[0]
+
+    def page_products(
+        self,
+        limit: int = 50,
+        cursor=None,
+        order_by: str = "price",
+        descending: bool = False,
+        name: str = None,
+        category_id: int = None,
+        min_price: float = None,
+        max_price: float = None,
+        active_only: bool = False,
+    ) -> tuple:
+        pages = self._broadcast(
+            "page_products",
+            limit,
+            cursor,
+            order_by,
+            descending,
+            name,
+            category_id,
+            min_price,
+            max_price,
+            active_only,
+        )
+        sort_key = Inventory.SORT_KEYS[order_by]
+        page = list(
+            heapq.merge(
+                *(products for products, _ in pages), key=sort_key, reverse=descending
+            )
+        )
+        # A shard which filled the page alone still has more products
+        if len(page) <= limit and all(next_cursor is None for _, next_cursor in pages):
+            return page, None
+        del page[limit:]
+        return page, sort_key(page[-1])
+
+    # Every shard plans and runs the query on its own products
+    # Ordered results are merged, the limit is applied again to the merged list
+    def query(
+        self,
+        category_id: int = None,
+        price: tuple = None,
+        name_contains: str = None,
+        in_stock: bool = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        active_only: bool = False,
+    ) -> list:
+        results = self._broadcast(
+            "query",
+            category_id,
+            price,
+            name_contains,
+            in_stock,
+            order_by,
+            descending,
+            limit,
+            active_only,
+        )
+        if order_by is None:
+            products = chain.from_iterable(results)
+        else:
+            products = heapq.merge(
+                *results, key=Inventory.SORT_KEYS[order_by], reverse=descending
+            )
+        return list(islice(products, limit))
+
+    # Every shard reports its own low stock, the results are merged by quantity
+    def peek_low_stock(self):
+        products = [
+            product
+            for product in self._broadcast("peek_low_stock")
+            if product is not None
+        ]
+        return min(products, key=Inventory.SORT_KEYS["quantity"], default=None)
+
+    def low_stock_products(self, threshold: int) -> list:
+        return list(
+            heapq.merge(
+                *self._broadcast("low_stock_products", threshold),
+                key=Inventory.SORT_KEYS["quantity"],
+            )
+        )
+
+    # Cache statistics of every shard
+    def cache_stats(self) -> list:
+        return self._broadcast("cache_stats")
+
+    def clear_cache(self):
+        self._broadcast("clear_cache")
+
+    # Metrics of every shard, shards are created with metrics=True
+    def metrics_snapshot(self) -> list:
+        return self._broadcast("metrics_snapshot")
+
+    # Stop the shard processes
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Read-only view of the products or categories of a sharded inventory
+# Products are looked up in their owning shard, categories in the first shard
+class ShardedMapping(Mapping):
+    def __init__(self, inventory: ShardedInventory, name: str, partitioned: bool):
+        self.inventory = inventory
+        self.name = name
+        self.partitioned = partitioned
+
+    def _shards(self) -> dict:
+        count = len(self.inventory.connections) if self.partitioned else 1
+        return {index: ("mapping", (self.name, None)) for index in range(count)}
+
+    def __getitem__(self, key):
+        index = self.inventory._shard(key) if self.partitioned else 0
+        found, value = self.inventory._call(index, "mapping", self.name, key)
+        if not found:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        results, error = self.inventory._scatter(self._shards())
+        if error is not None:
+            raise error
+        return chain.from_iterable(results.values())
+
+    def __len__(self):
+        results, error = self.inventory._scatter(self._shards())
+        if error is not None:
+            raise error
+        return sum(len(keys) for keys in results.values())
+
+
+# Serve the requests of a sharded inventory until it is closed
+# A request is the name of an inventory method or shard command and its arguments
+def _serve_shard(connection, options: dict):
+    inventory = Inventory(**options)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        name, args = request
+        try:
+            if name in SHARD_COMMANDS:
+                result = SHARD_COMMANDS[name](inventory, *args)
+            else:
+                result = _detach(getattr(inventory, name)(*args))
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+    connection.close()
+
+
+# Products of a product store are views, so they are sent back as Product copies
+# Lists of products are sent packed into columns
+def _detach(result):
+    if isinstance(result, ProductView):
+        return result.detach()
+    if isinstance(result, list) and result:
+        if isinstance(result[0], (Product, ProductView)):
+            return PackedProducts(result)
+    if isinstance(result, tuple):
+        return tuple(_detach(item) for item in result)
+    return result
+
+
+# Rebuild the products packed by a shard
+def _attach(result):
+    if isinstance(result, PackedProducts):
+        return result.unpack()
+    if isinstance(result, tuple):
+        return tuple(_attach(item) for item in result)
+    return result
+
+
+# Defining a list of products packed into columns
+# Pickling one object per product dominates the cost of a large search result,
+# packed columns are pickled as a few arrays and rebuilt on the other side
+class PackedProducts:
+    __slots__ = (
+        "product_ids",
+        "names",
+        "prices",
+        "descriptions",
+        "category_ids",
+        "quantities",
+        "history_sizes",
+        "history_values",
+        "categories",
+    )
+
+    # Constructor to pack the passed in products
+    def __init__(self, products: list):
+        self.product_ids = array("q")
+        self.names = []
+        self.prices = array("d")
+        self.descriptions = []
+        self.category_ids = array("q")
+        self.quantities = array("q")
+        self.history_sizes = array("q")
+        self.history_values = array("d")
+        self.categories = {}
+        for product in products:
+            category = product.category
+            history = product.price_history
+            self.product_ids.append(product.product_id)
+            self.names.append(product.name)
+            self.prices.append(product.price)
+            self.descriptions.append(product.description)
+            self.category_ids.append(category.category_id)
+            self.quantities.append(product.quantity)
+            self.categories[category.category_id] = category
+            if not isinstance(history, PriceHistory):
+                history = PriceHistory(history)
+            self.history_sizes.append(len(history))
+            self.history_values.extend(history.values)
+
+    # Rebuild the packed products
+    def unpack(self) -> list:
+        products = []
+        categories = self.categories
+        values = self.history_values
+        start = 0
+        for index, size in enumerate(self.history_sizes):
+            history = PriceHistory()
+            history.values = values[2 * start : 2 * (start + size)]
+            start += size
+            product = Product(
+                self.product_ids[index],
+                self.names[index],
+                self.prices[index],
+                self.descriptions[index],
+                categories[self.category_ids[index]],
+                self.quantities[index],
+            )
+            product.price_history = history
+            products.append(product)
+        return products
+
+
+# Look up a product or category, or list every id when no key is passed in
+def _shard_mapping(inventory: Inventory, name: str, key):
+    mapping = getattr(inventory, name)
+    if key is None:
+        return list(mapping)
+    if key not in mapping:
+        return False, None
+    return True, _detach(mapping[key])
+
+
+# Delete the products added by a rejected bulk load
+def _shard_delete_products(inventory: Inventory, product_ids):
+    for product_id in product_ids:
+        if product_id in inventory.products:
+            inventory.delete_product(product_id)
+
+
+# Reverse the lines applied by a shard when another shard rejected its lines
+# Reversing a restock may take a quantity back below zero, so it is never checked
+def _shard_undo_stock_batch(inventory: Inventory, lines):
+    for product_id, delta in lines:
+        inventory.decrease_product_quantity(product_id, delta)
+
+
+SHARD_COMMANDS = {
+    "mapping": _shard_mapping,
+    "delete_products": _shard_delete_products,
+    "undo_stock_batch": _shard_undo_stock_batch,
+}
+
+
+## ****************************** ##
+## Asyncio front-end
+## ****************************** ##
+# Every inventory method is available as a coroutine, run off the event loop
+# Searches run on a pool of reader threads, and identical searches in flight at
+# the same time share one computation. Mutations run one at a time on a single
+# writer thread, so waiting writers never occupy the reader threads
+class AsyncInventory:
+    # Constructor to wrap an inventory, which is made thread safe if it is not
+    def __init__(self, inventory: Inventory = None, max_workers: int = None):
+        if inventory is None:
+            inventory = Inventory(thread_safe=True)
+        elif inventory.lock is None:
+            inventory._enable_locking(64)
+        self.inventory = inventory
+        self.readers = ThreadPoolExecutor(max_workers, "inventory-reader")
+        self.writer = ThreadPoolExecutor(1, "inventory-writer")
+        # Searches in flight by method name and arguments
+        self.pending = {}
+
+    # Inventory methods become coroutines
+    def __getattr__(self, name: str):
+        if name in Inventory.READ_METHODS:
+            return partial(self._read, name)
+        if name in Inventory.MUTATING_METHODS:
+            return partial(self._write, name)
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
+
+    # Run a search on a reader thread, or join the identical search in flight
+    # The method name is positional only, a name keyword goes to the method
+    async def _read(self, name: str, /, *args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            future = self.pending.get(key)
+        except TypeError:
+            # Unhashable arguments cannot be shared
+            key = None
+            future = None
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.readers, partial(getattr(self.inventory, name), *args, **kwargs)
+            )
+            if key is not None:
+                self.pending[key] = future
+                future.add_done_callback(partial(self._finish, key))
+        # A cancelled caller must not cancel the search shared with the others
+        return await asyncio.shield(future)
+
+    # Forget a finished search, unless a mutation already replaced it
+    def _finish(self, key, future):
+        if self.pending.get(key) is future:
+            del self.pending[key]
+
+    # Run a mutation on the writer thread
+    # Searches started before the mutation may miss it, so later identical
+    # searches do not join them
+    async def _write(self, name: str, /, *args, **kwargs):
+        self.pending.clear()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.writer, partial(getattr(self.inventory, name), *args, **kwargs)
+            )
+        finally:
+            self.pending.clear()
+
+    # Wait for the running work and stop the threads
+    def close(self):
+        self.writer.shutdown()
+        self.readers.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+## ****************************** ##
+## Comprehensive Test Case
+## ****************************** ##
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    ## Initializing the inventory
+    inventory = Inventory()
+    print("******************************")
+    print("*** Initializing Inventory ***")
+    print("******************************")
+
+    ## Add in the product categories
     start = time.time()
-    inventory.search_product_by_category_name(search_category_name)
+    for i in range(0, 20000):
+        inventory.add_new_category(i, f"Category-{i}")
     end = time.time()
-    automaticCacheSearchTimes["productByCategegoryName"].append(end - start)
-    # Manual Cache
+    print("\n******************************")
+    print("Adding new category")
+    print("******************************")
+    print("20000 new categories are added")
+    print(f"Execution time - {end-start} seconds")
+    print("Current inventory category size", len(inventory.categories))
+    print("******************************")
+
+
+    # Adding in products
     start = time.time()
-    inventory.search_product_by_category_name_memo(search_category_name)
+    for i in range(0, 100000):
+        inventory.add_product(
+            i,
+            f"Product-{i}",
+            random.uniform(1, 200),
+            "Simple Description",
+            random.randint(1, 10000),
+            random.randint(1, 1000),
+        )
     end = time.time()
-    manualCacheSearchTimes["productByCategegoryName"].append(end - start)
-
-# Now plotting the graph to view the change
-# **************************************
-# Plotting search for category name
-# **************************************
-plt.figure(figsize=(12, 6))
-plt.plot(
-    searchTimes["categoryName"],
-    label="Regular Search by Category Name",
-    linestyle="--",
-    marker="o",
-)
-plt.plot(
-    automaticCacheSearchTimes["categoryName"],
-    label="LRU Search by Category Name",
-    linestyle="--",
-    marker="*",
-)
-plt.plot(
-    manualCacheSearchTimes["categoryName"],
-    label="Memoized Search by Category Name",
-    linestyle="-",
-    marker=".",
-)
-
-
-plt.xlabel("Test Number")
-plt.ylabel("Time (seconds)")
-plt.title("Category Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-
-# **************************************
-# Plotting search for product name
-# **************************************
-plt.figure(figsize=(12, 6))
-plt.plot(
-    searchTimes["productName"],
-    label="Regular Search by Product Name",
-    linestyle="--",
-    marker="o",
-)
-plt.plot(
-    automaticCacheSearchTimes["productName"],
-    label="LRU Search by Product Name",
-    linestyle="--",
-    marker="*",
-)
-plt.plot(
-    manualCacheSearchTimes["productName"],
-    label="Memoized Search by Product Name",
-    linestyle="-",
-    marker=".",
-)
-
-
-plt.xlabel("Test Number")
-plt.ylabel("Time (seconds)")
-plt.title("Product Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# **************************************
-# Plotting search for price range
-# **************************************
-plt.figure(figsize=(12, 6))
-plt.plot(
-    searchTimes["priceRange"],
-    label="Regular Search by price range",
-    linestyle="--",
-    marker="o",
-)
-plt.plot(
-    automaticCacheSearchTimes["priceRange"],
-    label="LRU Search by price range",
-    linestyle="--",
-    marker="*",
-)
-plt.plot(
-    manualCacheSearchTimes["priceRange"],
-    label="Memoized Search by price range",
-    linestyle="-",
-    marker=".",
-)
-
-
-plt.xlabel("Test Number")
-plt.ylabel("Time (seconds)")
-plt.title("Price Range Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# **************************************
-# Plotting search for product using category name
-# **************************************
-plt.figure(figsize=(12, 6))
-plt.plot(
-    searchTimes["productByCategegoryName"],
-    label="Product Search by category name",
-    linestyle="--",
-    marker="o",
-)
-plt.plot(
-    automaticCacheSearchTimes["productByCategegoryName"],
-    label="Product LRU Search by category name",
-    linestyle="--",
-    marker="*",
-)
-plt.plot(
-    manualCacheSearchTimes["productByCategegoryName"],
-    label="Product Memoized Search by category name",
-    linestyle="-",
-    marker=".",
-)
-
-
-plt.xlabel("Test Number")
-plt.ylabel("Time (seconds)")
-plt.title(
-    "Product Search by category name - Reguar vs LRU Cache vs. Manual Memoization Performance"
-)
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# **************************************
-# Plotting search for product using category Id
-# **************************************
-plt.figure(figsize=(12, 6))
-plt.plot(
-    searchTimes["productByCategegoryId"],
-    label="Product Search by category Id",
-    linestyle="--",
-    marker="o",
-)
-plt.plot(
-    automaticCacheSearchTimes["productByCategegoryId"],
-    label="Product LRU Search by category Id",
-    linestyle="--",
-    marker="*",
-)
-plt.plot(
-    manualCacheSearchTimes["productByCategegoryId"],
-    label="Product Memoized Search by category Id",
-    linestyle="-",
-    marker=".",
-)
-
-
-plt.xlabel("Test Number")
-plt.ylabel("Time (seconds)")
-plt.title(
-    "Product Search by category Id - Reguar vs LRU Cache vs. Manual Memoization Performance"
-)
-plt.legend()
-plt.grid(True)
-plt.show()
+    print("\n******************************")
+    print("Adding new products")
+    print("******************************")
+    print("100000 new products are added")
+    print(f"Execution time - {end-start} seconds")
+    print("Current inventory products size", len(inventory.products))
+    print("******************************")
+
+    # Testing to check basic functionalities such as add, update, search
+    print("\n******************************")
+    print("Basic functionality testing")
+    print("******************************")
+
+    # Beginning category class functionality testing
+    print("\nCategory class functionality testing")
+    print("Find Category by name functionality testing")
+    print("Find Category by name - Category-10000")
+    print(
+        f"Regular Search No Cache - {inventory.search_category_by_name_no_cache('Category-10000')}"
+    )
+    print(
+        f"Regular Search LRU Cache - {inventory.search_category_by_name('Category-10000')}"
+    )
+    print(
+        f"Regular Search Custom Memoized Cache - {inventory.search_category_by_name_memo('Category-10000')}"
+    )
+
+    print("\nUpdate category - Category-10000 to False status")
+    inventory.update_category(10000, None, False)
+    print(
+        f"Regular Search No Cache after update - {inventory.search_category_by_name_no_cache('Category-10000')}"
+    )
+
+    print("\nAdding new category - New Category")
+    inventory.add_new_category(50000, "New Category", True)
+    print(
+        f"Regular Search New Category No Cache Before Deletion - {inventory.search_category_by_name_no_cache('New Category')}"
+    )
+    print("Deleting new category - New Category")
+    inventory.delete_category(50000)
+    print(
+        f"Regular Search New Category No Cache After Deletion - {inventory.search_category_by_name_no_cache('New Category')}"
+    )
+
+    print("\n******************************")
+    print("Product Class functionality testing")
+    print("******************************")
+    print("\nFind Products by name functionality testing")
+    print("Find Products by name - Product-10000")
+    print(
+        f"Regular Search No Cache - {inventory.search_product_by_name_no_cache('Product-10000')}"
+    )
+    print(f"Regular Search LRU Cache - {inventory.search_product_by_name('Product-10000')}")
+    print(
+        f"Regular Search Custom Memoized Cache - {inventory.search_product_by_name_memo('Product-10000')}"
+    )
+
+    print("\nFind Products by price range functionality testing")
+    print("Find Products by price range - 5 - 5.1")
+    print(
+        f"Regular Search No Cache - {inventory.search_product_by_price_range_no_cache(5,5.1)}"
+    )
+    print(f"\nRegular Search LRU Cache - {inventory.search_product_by_price_range(5,5.1)}")
+    print(
+        f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_price_range_memo(5,5.1)}"
+    )
+
+    print("\nFind Products by category id")
+    print(
+        f"Regular Search No Cache - {inventory.search_product_by_category_id_no_cache(10000)}"
+    )
+    print(f"\nRegular Search LRU Cache - {inventory.search_product_by_category_id(10000)}")
+    print(
+        f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_category_id_memo(10000)}"
+    )
+
+    print("\nFind Products by category name")
+    print(
+        f"Regular Search No Cache - {inventory.search_product_by_category_name_no_cache('Category-10000')}"
+    )
+    print(
+        f"\nRegular Search LRU Cache - {inventory.search_product_by_category_name('Category-10000')}"
+    )
+    print(
+        f"\nRegular Search Custom Memoized Cache - {inventory.search_product_by_category_name_memo('Category-10000')}"
+    )
+
+    print(
+        "\nTest case to add a new product, update it, get its price history, and delete it"
+    )
+    inventory.add_product(9999999, "New Product", 500, "", 1000, 50)
+    print(
+        "After adding new product - New Product -",
+        inventory.search_product_by_name("New Product"),
+    )
+    inventory.update_product(9999999, None, 450, "Description")
+    print(
+        "After updating new product information - New Product -",
+        inventory.search_product_by_name("New Product"),
+    )
+    print("Price history of new product", inventory.get_product_price_history(9999999))
+    inventory.increase_product_quantity(9999999, 50)
+    print(
+        "After increasing product quantity by 50 - New Product quantity must be 100 -",
+        inventory.search_product_by_name("New Product"),
+    )
+    inventory.decrease_product_quantity(9999999, 40)
+    print(
+        "After decreasing product quantity by 40 - New Product quantity must be 60 -",
+        inventory.search_product_by_name("New Product"),
+    )
+
+
+    # Beginning stress testing
+    # Storing the execution time for each search
+    # Creating a test case method to conduct the test
+    searchTimes = {
+        "categoryName": [],
+        "productName": [],
+        "priceRange": [],
+        "productByCategegoryName": [],
+        "productByCategegoryId": [],
+    }
+    automaticCacheSearchTimes = {
+        "categoryName": [],
+        "productName": [],
+        "priceRange": [],
+        "productByCategegoryName": [],
+        "productByCategegoryId": [],
+    }
+    manualCacheSearchTimes = {
+        "categoryName": [],
+        "productName": [],
+        "priceRange": [],
+        "productByCategegoryName": [],
+        "productByCategegoryId": [],
+    }
+
+    # For general conduct 100 tests
+    for _ in range(100):
+        # First search criterias
+        search_category_name = f"Category-{random.randint(1,10000)}"
+        search_product_name = f"Product-{random.randint(1,10000)}"
+        search_min_price = random.uniform(1, 200)
+        search_max_price = random.uniform(1, 200)
+        search_category_id = random.randint(1, 10000)
+
+        # Measuring the time for each search functionality
+        # *******************************
+        # Searching category by name
+        # *******************************
+        start = time.time()
+        inventory.search_category_by_name_no_cache(search_category_name)
+        end = time.time()
+        searchTimes["categoryName"].append(end - start)
+        # print(search_category_name)
+        # print(inventory.search_category_by_name_no_cache(search_category_name))
+        # Automatic cache
+        start = time.time()
+        inventory.search_category_by_name(search_category_name)
+        end = time.time()
+        automaticCacheSearchTimes["categoryName"].append(end - start)
+        # print(search_category_name)
+        # print(inventory.search_category_by_name(search_category_name))
+        # Manual Cache
+        start = time.time()
+        inventory.search_category_by_name_memo(search_category_name)
+        end = time.time()
+        manualCacheSearchTimes["categoryName"].append(end - start)
+        # print(search_category_name)
+        # print(inventory.search_category_by_name_memo(search_category_name))
+
+        # *******************************
+        # Searching product by name
+        # *******************************
+        start = time.time()
+        inventory.search_product_by_name_no_cache(search_product_name)
+        end = time.time()
+        searchTimes["productName"].append(end - start)
+        # Automatic cache
+        start = time.time()
+        inventory.search_product_by_name(search_product_name)
+        end = time.time()
+        automaticCacheSearchTimes["productName"].append(end - start)
+        # Manual Cache
+        start = time.time()
+        inventory.search_product_by_name_memo(search_product_name)
+        end = time.time()
+        manualCacheSearchTimes["productName"].append(end - start)
+
+        # *******************************
+        # Searching product by price range
+        # *******************************
+        start = time.time()
+        inventory.search_product_by_price_range_no_cache(search_min_price, search_max_price)
+        end = time.time()
+        searchTimes["priceRange"].append(end - start)
+        # Automatic cache
+        start = time.time()
+        inventory.search_product_by_price_range(search_min_price, search_max_price)
+        end = time.time()
+        automaticCacheSearchTimes["priceRange"].append(end - start)
+        # Manual Cache
+        start = time.time()
+        inventory.search_product_by_price_range_memo(search_min_price, search_max_price)
+        end = time.time()
+        manualCacheSearchTimes["priceRange"].append(end - start)
+
+        # *******************************
+        # Searching prodcut by category id
+        # *******************************
+        start = time.time()
+        inventory.search_product_by_category_id_no_cache(search_category_id)
+        end = time.time()
+        searchTimes["productByCategegoryId"].append(end - start)
+        # Automatic cache
+        start = time.time()
+        inventory.search_product_by_category_id(search_category_id)
+        end = time.time()
+        automaticCacheSearchTimes["productByCategegoryId"].append(end - start)
+        # Manual Cache
+        start = time.time()
+        inventory.search_product_by_category_id_memo(search_category_id)
+        end = time.time()
+        manualCacheSearchTimes["productByCategegoryId"].append(end - start)
+
+        # *******************************
+        # Searching prodcut by category name
+        # *******************************
+        start = time.time()
+        inventory.search_product_by_category_name_no_cache(search_category_name)
+        end = time.time()
+        searchTimes["productByCategegoryName"].append(end - start)
+        # Automatic cache
+        start = time.time()
+        inventory.search_product_by_category_name(search_category_name)
+        end = time.time()
+        automaticCacheSearchTimes["productByCategegoryName"].append(end - start)
+        # Manual Cache
+        start = time.time()
+        inventory.search_product_by_category_name_memo(search_category_name)
+        end = time.time()
+        manualCacheSearchTimes["productByCategegoryName"].append(end - start)
+
+    # Now plotting the graph to view the change
+    # **************************************
+    # Plotting search for category name
+    # **************************************
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        searchTimes["categoryName"],
+        label="Regular Search by Category Name",
+        linestyle="--",
+        marker="o",
+    )
+    plt.plot(
+        automaticCacheSearchTimes["categoryName"],
+        label="LRU Search by Category Name",
+        linestyle="--",
+        marker="*",
+    )
+    plt.plot(
+        manualCacheSearchTimes["categoryName"],
+        label="Memoized Search by Category Name",
+        linestyle="-",
+        marker=".",
+    )
+
+
+    plt.xlabel("Test Number")
+    plt.ylabel("Time (seconds)")
+    plt.title("Category Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+    # **************************************
+    # Plotting search for product name
+    # **************************************
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        searchTimes["productName"],
+        label="Regular Search by Product Name",
+        linestyle="--",
+        marker="o",
+    )
+    plt.plot(
+        automaticCacheSearchTimes["productName"],
+        label="LRU Search by Product Name",
+        linestyle="--",
+        marker="*",
+    )
+    plt.plot(
+        manualCacheSearchTimes["productName"],
+        label="Memoized Search by Product Name",
+        linestyle="-",
+        marker=".",
+    )
+
+
+    plt.xlabel("Test Number")
+    plt.ylabel("Time (seconds)")
+    plt.title("Product Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+    # **************************************
+    # Plotting search for price range
+    # **************************************
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        searchTimes["priceRange"],
+        label="Regular Search by price range",
+        linestyle="--",
+        marker="o",
+    )
+    plt.plot(
+        automaticCacheSearchTimes["priceRange"],
+        label="LRU Search by price range",
+        linestyle="--",
+        marker="*",
+    )
+    plt.plot(
+        manualCacheSearchTimes["priceRange"],
+        label="Memoized Search by price range",
+        linestyle="-",
+        marker=".",
+    )
+
+
+    plt.xlabel("Test Number")
+    plt.ylabel("Time (seconds)")
+    plt.title("Price Range Search - Reguar vs LRU Cache vs. Manual Memoization Performance")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+    # **************************************
+    # Plotting search for product using category name
+    # **************************************
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        searchTimes["productByCategegoryName"],
+        label="Product Search by category name",
+        linestyle="--",
+        marker="o",
+    )
+    plt.plot(
+        automaticCacheSearchTimes["productByCategegoryName"],
+        label="Product LRU Search by category name",
+        linestyle="--",
+        marker="*",
+    )
+    plt.plot(
+        manualCacheSearchTimes["productByCategegoryName"],
+        label="Product Memoized Search by category name",
+        linestyle="-",
+        marker=".",
+    )
+
+
+    plt.xlabel("Test Number")
+    plt.ylabel("Time (seconds)")
+    plt.title(
+        "Product Search by category name - Reguar vs LRU Cache vs. Manual Memoization Performance"
+    )
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+    # **************************************
+    # Plotting search for product using category Id
+    # **************************************
+    plt.figure(figsize=(12, 6))
+    plt.plot(
+        searchTimes["productByCategegoryId"],
+        label="Product Search by category Id",
+        linestyle="--",
+        marker="o",
+    )
+    plt.plot(
+        automaticCacheSearchTimes["productByCategegoryId"],
+        label="Product LRU Search by category Id",
+        linestyle="--",
+        marker="*",
+    )
+    plt.plot(
+        manualCacheSearchTimes["productByCategegoryId"],
+        label="Product Memoized Search by category Id",
+        linestyle="-",
+        marker=".",
+    )
+
+
+    plt.xlabel("Test Number")
+    plt.ylabel("Time (seconds)")
+    plt.title(
+        "Product Search by category Id - Reguar vs LRU Cache vs. Manual Memoization Performance"
+    )
+    plt.legend()
+    plt.grid(True)
+    plt.show()
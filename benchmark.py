@@ -0,0 +1,332 @@
+## Reproducible benchmark suite for the inventory
+## Every run builds seeded catalogs of increasing size, times each search variant
+## and mutation path with perf_counter_ns after a warmup, and reports percentiles
+## and operations per second. Results are written as JSON so two runs can be
+## compared, a regression beyond the threshold exits with status 1
+##
+## python benchmark.py --sizes 10000 100000 --output results.json
+## python benchmark.py --sizes 10000 100000 --compare baseline.json
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from functools import partial
+
+from Project_Phase_4 import Inventory, ProductStore
+
+# Catalog sizes, one per decade
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+# Every category holds this many products on average
+PRODUCTS_PER_CATEGORY = 10
+# Products added per bulk load call while building a catalog
+BUILD_BATCH_SIZE = 100_000
+PERCENTILES = (50, 90, 99)
+# Searches cycle through this many distinct queries, so the cached variants are
+# measured mostly on hits once every query has been seen
+QUERY_POOL_SIZE = 50
+# Categories added per add_categories_bulk call
+CATEGORY_BATCH_SIZE = 100
+
+
+# Build an inventory with a seeded catalog of the passed in number of products
+def build_inventory(size: int, seed: int, product_store: bool = False) -> Inventory:
+    rng = random.Random(seed)
+    inventory = Inventory(product_store=ProductStore() if product_store else None)
+    category_count = max(size // PRODUCTS_PER_CATEGORY, 1)
+    inventory.add_categories_bulk(
+        (category_id, f"Category-{category_id}")
+        for category_id in range(category_count)
+    )
+    for start in range(0, size, BUILD_BATCH_SIZE):
+        inventory.add_products_bulk(
+            (
+                product_id,
+                f"Product-{product_id}",
+                round(rng.uniform(1, 200), 2),
+                "Simple Description",
+                rng.randrange(category_count),
+                rng.randint(1, 1000),
+            )
+            for product_id in range(start, min(start + BUILD_BATCH_SIZE, size))
+        )
+    return inventory
+
+
+# Time every call of the operation, the warmup calls are not recorded
+# The operation receives the call number, so each call can use its own arguments
+# A setup, when passed, runs before every call and is not timed
+def measure(operation, repeats: int, warmup: int, setup=None) -> dict:
+    for call in range(warmup):
+        if setup is not None:
+            setup(call)
+        operation(call)
+    timings = []
+    perf_counter_ns = time.perf_counter_ns
+    for call in range(warmup, warmup + repeats):
+        if setup is not None:
+            setup(call)
+        start = perf_counter_ns()
+        operation(call)
+        timings.append(perf_counter_ns() - start)
+    return summarize(timings)
+
+
+# Percentiles, mean and operations per second of the timings in nanoseconds
+def summarize(timings: list) -> dict:
+    timings = sorted(timings)
+    total = sum(timings)
+    summary = {
+        "repeats": len(timings),
+        "min_ns": timings[0],
+        "max_ns": timings[-1],
+        "mean_ns": total / len(timings),
+        "ops_per_sec": len(timings) * 1e9 / total if total else None,
+    }
+    for percentile in PERCENTILES:
+        # Nearest rank percentile
+        rank = max(-(-percentile * len(timings) // 100) - 1, 0)
+        summary[f"p{percentile}_ns"] = timings[rank]
+    return summary
+
+
+# The timed operations for an inventory of the passed in size
+# Arguments are drawn from a seeded generator before any timing starts
+# Searches come first, mutations last, and the mutations only touch products
+# and categories added by the benchmark itself or change fields the searches do
+# not depend on. An operation is a callable, or a (setup, operation) pair whose
+# setup prepares every call without being timed
+def operations(inventory: Inventory, size: int, seed: int, calls: int) -> dict:
+    rng = random.Random(seed + 1)
+    category_count = max(size // PRODUCTS_PER_CATEGORY, 1)
+    queries = range(QUERY_POOL_SIZE)
+    category_names = [f"Category-{rng.randrange(category_count)}" for _ in queries]
+    product_names = [f"Product-{rng.randrange(size)}" for _ in queries]
+    category_ids = [rng.randrange(category_count) for _ in queries]
+    price_ranges = []
+    for _ in queries:
+        low = rng.uniform(1, 200)
+        price_ranges.append((low, low + 0.1))
+    product_ids = [rng.randrange(size) for _ in range(calls)]
+    prices = [round(rng.uniform(1, 200), 2) for _ in range(calls)]
+    new_category_ids = [rng.randrange(category_count) for _ in range(calls)]
+    new_ids = range(size, size + calls)
+    batch_size = 1000
+    bulk_start = size + calls
+    # Categories added by the benchmark follow the catalog categories, the
+    # products of the categories deleted with each cascade follow the bulk loads
+    added_category_ids = range(category_count, category_count + calls)
+    bulk_category_start = category_count + calls
+    cascade_category_start = bulk_category_start + calls * CATEGORY_BATCH_SIZE
+    cascade_product_start = bulk_start + calls * batch_size
+    reassign_target = cascade_category_start + len(Inventory.CASCADE_MODES) * calls
+
+    def add_bulk(call: int):
+        start = bulk_start + call * batch_size
+        inventory.add_products_bulk(
+            (product_id, f"Bulk-{product_id}", 10.0, "Bulk", 0, 1)
+            for product_id in range(start, start + batch_size)
+        )
+
+    def add_categories_bulk(call: int):
+        start = bulk_category_start + call * CATEGORY_BATCH_SIZE
+        inventory.add_categories_bulk(
+            (category_id, f"Bulk-Category-{category_id}")
+            for category_id in range(start, start + CATEGORY_BATCH_SIZE)
+        )
+
+    # Position of the category deleted by a call of the cascade among the
+    # cascade categories
+    def cascade_index(cascade: str, call: int) -> int:
+        return Inventory.CASCADE_MODES.index(cascade) * calls + call
+
+    # Setup of a delete, the category is created with its products untimed
+    def fill_category(cascade: str, call: int):
+        index = cascade_index(cascade, call)
+        category_id = cascade_category_start + index
+        if reassign_target not in inventory.categories:
+            inventory.add_new_category(reassign_target, "Reassigned")
+        inventory.add_new_category(category_id, f"Cascade-{category_id}")
+        start = cascade_product_start + index * PRODUCTS_PER_CATEGORY
+        inventory.add_products_bulk(
+            (product_id, f"Cascade-{product_id}", 10.0, "Cascade", category_id, 1)
+            for product_id in range(start, start + PRODUCTS_PER_CATEGORY)
+        )
+
+    def delete_category(cascade: str, call: int):
+        inventory.delete_category(
+            cascade_category_start + cascade_index(cascade, call),
+            cascade,
+            reassign_target if cascade == "reassign" else None,
+        )
+
+    suite = {}
+    for variant in ("_no_cache", "", "_memo"):
+        suite[f"search_category_by_name{variant}"] = partial_call(
+            getattr(inventory, f"search_category_by_name{variant}"), category_names
+        )
+        suite[f"search_product_by_name{variant}"] = partial_call(
+            getattr(inventory, f"search_product_by_name{variant}"), product_names
+        )
+        suite[f"search_product_by_price_range{variant}"] = partial_call(
+            getattr(inventory, f"search_product_by_price_range{variant}"),
+            price_ranges,
+            True,
+        )
+        suite[f"search_product_by_category_id{variant}"] = partial_call(
+            getattr(inventory, f"search_product_by_category_id{variant}"),
+            category_ids,
+        )
+        suite[f"search_product_by_category_name{variant}"] = partial_call(
+            getattr(inventory, f"search_product_by_category_name{variant}"),
+            category_names,
+        )
+    suite["get_product_price_history"] = partial_call(
+        inventory.get_product_price_history, product_ids
+    )
+    suite["add_product"] = lambda call: inventory.add_product(
+        new_ids[call], f"New-{call}", prices[call], "New", new_category_ids[call], 10
+    )
+    suite["update_product"] = lambda call: inventory.update_product(
+        new_ids[call], price=prices[-call - 1]
+    )
+    suite["increase_product_quantity"] = lambda call: (
+        inventory.increase_product_quantity(product_ids[call], 1)
+    )
+    suite["decrease_product_quantity"] = lambda call: (
+        inventory.decrease_product_quantity(product_ids[call], 1)
+    )
+    suite["apply_stock_batch"] = lambda call: inventory.apply_stock_batch(
+        [(product_ids[call], 1), (product_ids[-call - 1], 1)]
+    )
+    suite["delete_product"] = lambda call: inventory.delete_product(new_ids[call])
+    suite["add_products_bulk"] = add_bulk
+    suite["add_new_category"] = lambda call: inventory.add_new_category(
+        added_category_ids[call], f"Added-{call}"
+    )
+    suite["add_categories_bulk"] = add_categories_bulk
+    suite["update_category"] = lambda call: inventory.update_category(
+        added_category_ids[call], name=f"Renamed-{call}"
+    )
+    for cascade in Inventory.CASCADE_MODES:
+        suite[f"delete_category_{cascade}"] = (
+            partial(fill_category, cascade),
+            partial(delete_category, cascade),
+        )
+    return suite
+
+
+# Call the method with the arguments of the call number, cycling through them
+def partial_call(method, arguments: list, unpack: bool = False):
+    count = len(arguments)
+    if unpack:
+        return lambda call: method(*arguments[call % count])
+    return lambda call: method(arguments[call % count])
+
+
+# Run the suite for every size and return the results with the run details
+def run(
+    sizes,
+    seed: int = 42,
+    repeats: int = 200,
+    warmup: int = 20,
+    product_store: bool = False,
+    log=print,
+) -> dict:
+    results = {}
+    for size in sizes:
+        start = time.perf_counter_ns()
+        inventory = build_inventory(size, seed, product_store)
+        build_seconds = (time.perf_counter_ns() - start) / 1e9
+        log(f"Built {size} products in {build_seconds:.2f} seconds")
+        results[str(size)] = {"build_seconds": build_seconds, "operations": {}}
+        suite = operations(inventory, size, seed, repeats + warmup)
+        for name, operation in suite.items():
+            setup = None
+            if isinstance(operation, tuple):
+                setup, operation = operation
+            summary = measure(operation, repeats, warmup, setup)
+            results[str(size)]["operations"][name] = summary
+            log(
+                f"  {name:<45} p50 {summary['p50_ns'] / 1000:>10.1f}us"
+                f"  p99 {summary['p99_ns'] / 1000:>10.1f}us"
+                f"  {summary['ops_per_sec']:>12.0f} ops/s"
+            )
+    return {
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeats": repeats,
+        "warmup": warmup,
+        "product_store": product_store,
+        "results": results,
+    }
+
+
+# Compare the median of every operation with a baseline run
+# Returns (size, operation, baseline ns, current ns, ratio) for the operations
+# slower than the baseline by more than the threshold
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    regressions = []
+    for size, result in current["results"].items():
+        baseline_result = baseline["results"].get(size)
+        if baseline_result is None:
+            continue
+        for name, summary in result["operations"].items():
+            baseline_summary = baseline_result["operations"].get(name)
+            if baseline_summary is None or not baseline_summary["p50_ns"]:
+                continue
+            ratio = summary["p50_ns"] / baseline_summary["p50_ns"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    (size, name, baseline_summary["p50_ns"], summary["p50_ns"], ratio)
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the inventory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--product-store",
+        action="store_true",
+        help="keep the products in a columnar ProductStore",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed median slowdown against the baseline, 0.1 is 10%%",
+    )
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.seed, args.repeats, args.warmup, args.product_store)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, current, args.threshold)
+        for size, name, baseline_ns, current_ns, ratio in regressions:
+            print(
+                f"Regression at {size} products: {name} p50 "
+                f"{baseline_ns / 1000:.1f}us -> {current_ns / 1000:.1f}us "
+                f"({ratio:.2f}x)"
+            )
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
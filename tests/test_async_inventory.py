@@ -0,0 +1,25 @@
+import asyncio
+
+from Project_Phase_4 import AsyncInventory
+
+
+def test_methods_accept_keyword_arguments():
+    async def run():
+        async with AsyncInventory() as inventory:
+            await inventory.add_new_category(category_id=1, name="Grocery")
+            await inventory.add_product(
+                1, "Pear", 2.0, "Fruit", category_id=1, quantity=5
+            )
+            await inventory.update_product(1, price=3.0)
+            first, second, third = await asyncio.gather(
+                inventory.top_products(5, order_by="price", descending=True),
+                inventory.top_products(5, order_by="price", descending=True),
+                inventory.top_products(5, order_by="quantity"),
+            )
+            return first, second, third, inventory.pending
+
+    first, second, third, pending = asyncio.run(run())
+    assert [product.price for product in first] == [3.0]
+    assert first is second
+    assert third == first and third is not first
+    assert pending == {}
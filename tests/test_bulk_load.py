@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, ProductStore
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+def make_inventory(store: bool) -> Inventory:
+    inventory = Inventory(product_store=ProductStore() if store else None)
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, "Garden")
+    inventory.add_new_category(3, "Archive", status=False)
+    return inventory
+
+
+def make_rows(seed: int, count: int) -> list:
+    generator = random.Random(seed)
+    return [
+        (
+            product_id,
+            f"{generator.choice(['Red', 'Blue', 'Green'])} item {product_id}",
+            float(generator.randint(1, 50)),
+            "d",
+            generator.choice((1, 2, 3)),
+            generator.randint(0, 20),
+        )
+        for product_id in generator.sample(range(10000), count)
+    ]
+
+
+# Everything a search can read, used to compare two inventories
+def state(inventory: Inventory) -> dict:
+    return {
+        "products": sorted(inventory.products.keys()),
+        "category_products": {
+            category_id: sorted(product_ids)
+            for category_id, product_ids in inventory.category_products.items()
+            if product_ids
+        },
+        "price_index": list(
+            zip(inventory.price_index.prices, inventory.price_index.product_ids)
+        ),
+        "inactive_price_index": list(
+            zip(
+                inventory.inactive_price_index.prices,
+                inventory.inactive_price_index.product_ids,
+            )
+        ),
+        "names": [
+            ids(inventory.search_product_by_name_no_cache(name))
+            for name in ("red", "BLUE ITEM", "item 1", "green item 99", "xyz")
+        ],
+        "active_names": [
+            ids(inventory.iter_products_by_name(name, active_only=True))
+            for name in ("red", "item 2")
+        ],
+        "categories": [
+            ids(inventory.search_product_by_category_id_no_cache(category_id))
+            for category_id in (1, 2, 3)
+        ],
+        "prices": [
+            ids(inventory.search_product_by_price_range_no_cache(low, high))
+            for low, high in ((1, 10), (20, 35), (50, 50))
+        ],
+        "stock": [
+            (product.product_id, product.quantity)
+            for product in inventory.low_stock_products(5)
+        ],
+        "lowest": inventory.peek_low_stock().quantity,
+    }
+
+
+# A bulk load builds the same indexes as adding the products one at a time
+@pytest.mark.parametrize("store", [False, True])
+def test_bulk_load_matches_single_adds(store):
+    rows = make_rows(1, 500)
+    single, bulk = make_inventory(store), make_inventory(store)
+    for row in rows:
+        single.add_product(*row)
+
+    assert bulk.add_products_bulk(rows[:200]) == 200
+    assert bulk.add_products_bulk(rows[200:]) == 300
+
+    assert state(bulk) == state(single)
+
+
+# Rejected batches raise and leave the inventory as it was
+@pytest.mark.parametrize("store", [False, True])
+@pytest.mark.parametrize(
+    "bad_row, message",
+    [
+        ((20001, "Duplicate", 1.0, "d", 1, 1), "same id"),
+        ((None, "Existing", 1.0, "d", 1, 1), "same id"),
+        ((20002, "Unknown", 1.0, "d", 99, 1), "category id is invalid"),
+    ],
+)
+def test_rejected_bulk_load_leaves_inventory_unchanged(store, bad_row, message):
+    inventory = make_inventory(store)
+    inventory.add_products_bulk(make_rows(2, 100))
+    existing = next(iter(inventory.products.keys()))
+    if bad_row[0] is None:
+        bad_row = (existing,) + bad_row[1:]
+    batch = [(20001, "Fresh item", 3.0, "d", 2, 4)] + make_rows(3, 20)
+    batch = [row for row in batch if row[0] not in inventory.products]
+    batch.insert(len(batch) // 2, bad_row)
+    before = state(inventory)
+    version = inventory.version
+
+    with pytest.raises(ValueError, match=message):
+        inventory.add_products_bulk(batch)
+
+    assert state(inventory) == before
+    assert inventory.version == version
+    assert 20001 not in inventory.products
+    # The valid rows of the rejected batch can still be loaded
+    valid = [row for row in batch if row is not bad_row]
+    assert inventory.add_products_bulk(valid) == len(valid)
@@ -0,0 +1,61 @@
+import pytest
+
+from Project_Phase_4 import Category, Inventory, ProductStore
+
+NAMES = ["Straße Lamp", "ÉCLAIR box", "Red APPLE", "ﬁne Tea", "Σίσυφος mug", "plain"]
+QUERIES = ["STRASSE", "strasse lamp", "éclair", "apple", "FINE", "ΣΊΣΥΦΟΣ", "a", "x"]
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+# The stored search names are the casefolded names, kept in step with renames
+def test_search_names_follow_the_names():
+    category = Category(1, "Straße")
+    assert category.search_name == "strasse"
+    category.update(name="ÉCLAIR")
+    assert category.search_name == "éclair"
+
+    inventory = Inventory(product_store=ProductStore())
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_product(1, "Red APPLE", 1.0, "d", 1, 5)
+    assert inventory.products[1].search_name == "red apple"
+    inventory.update_product(1, name="Straße")
+    assert inventory.products[1].search_name == "strasse"
+    assert inventory.products[1].name == "Straße"
+
+
+# Searches ignore case like comparing casefolded names one by one
+@pytest.mark.parametrize("store", [False, True])
+def test_searches_ignore_case_like_a_casefolded_scan(store):
+    inventory = Inventory(product_store=ProductStore() if store else None)
+    for category_id, name in enumerate(NAMES):
+        inventory.add_new_category(category_id, name)
+        inventory.add_product(category_id, name, 1.0, "d", category_id, 5)
+    inventory.update_product(5, name="Plain STRASSE")
+
+    for query in QUERIES:
+        folded = query.casefold()
+        expected = [
+            product
+            for product in inventory.products.values()
+            if folded in product.name.casefold()
+        ]
+        assert ids(inventory.search_product_by_name_no_cache(query)) == ids(expected)
+        assert ids(inventory.search_product_by_name(query)) == ids(expected)
+        assert ids(inventory.query(name_contains=query)) == ids(expected)
+        expected = [
+            category.category_id
+            for category in inventory.categories.values()
+            if folded in category.name.casefold()
+        ]
+        assert sorted(
+            category.category_id
+            for category in inventory.search_category_by_name_no_cache(query)
+        ) == sorted(expected)
+    # Queries differing only in case share one cached result
+    inventory.search_product_by_name("Red Apple")
+    hits = inventory.search_cache.stats()["hits"]
+    inventory.search_product_by_name("RED APPLE")
+    assert inventory.search_cache.stats()["hits"] == hits + 1
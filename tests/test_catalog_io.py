@@ -0,0 +1,112 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from Project_Phase_4 import (
+    Inventory,
+    export_catalog,
+    import_categories,
+    import_products,
+)
+
+
+def ids(products) -> list:
+    return [product.product_id for product in products]
+
+
+def make_inventory() -> Inventory:
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, 'Garden, "outdoor"')
+    inventory.add_new_category(3, "Archive", status=False)
+    for product_id in range(50):
+        inventory.add_product(
+            product_id,
+            f"Straße item {product_id}",
+            1.5 + product_id,
+            'Line one\nline two, with "quotes"' if product_id % 5 == 0 else "",
+            product_id % 3 + 1,
+            product_id % 4,
+        )
+    for product_id in range(0, 50, 10):
+        inventory.update_product(product_id, price=99.25)
+    return inventory
+
+
+def fields(inventory: Inventory) -> tuple:
+    categories = sorted(
+        (category.category_id, category.name, bool(category.status))
+        for category in inventory.categories.values()
+    )
+    products = sorted(
+        (
+            product.product_id,
+            product.name,
+            product.price,
+            product.description,
+            product.category.category_id,
+            product.quantity,
+        )
+        for product in inventory.products.values()
+    )
+    return categories, products
+
+
+# An exported catalog imports into an inventory with the same categories, products
+# and search results, in every format and with small batches
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".csv.gz", ".jsonl.gz"])
+def test_catalog_round_trips(tmp_path, extension):
+    inventory = make_inventory()
+    categories_path = str(tmp_path / f"categories{extension}")
+    products_path = str(tmp_path / f"products{extension}")
+    history_path = str(tmp_path / f"history{extension}")
+
+    counts = export_catalog(inventory, categories_path, products_path, history_path)
+
+    history = sum(
+        len(product.price_history) for product in inventory.products.values()
+    )
+    assert counts == {"categories": 3, "products": 50, "price_history": history}
+    imported = Inventory()
+    assert import_categories(imported, categories_path, batch_size=2) == 3
+    assert import_products(imported, products_path, batch_size=7) == 50
+    assert fields(imported) == fields(inventory)
+    for query in ("strasse", "item 4", "9"):
+        assert sorted(ids(imported.search_product_by_name_no_cache(query))) == (
+            sorted(ids(inventory.search_product_by_name_no_cache(query)))
+        )
+    assert ids(imported.search_product_by_price_range(2, 20)) == ids(
+        inventory.search_product_by_price_range(2, 20)
+    )
+
+
+# Files written by other tools are read by their extension or the passed in format
+def test_import_reads_handwritten_files(tmp_path):
+    categories_path = tmp_path / "categories.txt"
+    with open(categories_path, "w", newline="") as categories:
+        writer = csv.writer(categories)
+        writer.writerow(["category_id", "name", "status"])
+        writer.writerow([1, "Grocery", "active"])
+        writer.writerow([2, "Old", "inactive"])
+    products_path = tmp_path / "products.jsonl.gz"
+    with gzip.open(products_path, "wt", encoding="utf-8") as products:
+        for product_id in (5, 6):
+            row = {
+                "product_id": str(product_id),
+                "name": f"Item {product_id}",
+                "price": "2.5",
+                "category_id": product_id - 4,
+                "quantity": 3,
+            }
+            products.write(json.dumps(row) + "\n\n")
+
+    inventory = Inventory()
+    assert import_categories(inventory, str(categories_path), file_format="csv") == 2
+    assert import_products(inventory, str(products_path)) == 2
+    assert inventory.categories[1].status and not inventory.categories[2].status
+    assert inventory.products[6].price == 2.5
+    assert inventory.products[6].description == ""
+    with pytest.raises(ValueError, match="csv or jsonl"):
+        import_categories(Inventory(), str(categories_path), file_format="xml")
@@ -0,0 +1,66 @@
+import random
+
+from Project_Phase_4 import Inventory
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+# Category searches return what a scan of every product returns, while products
+# are added, moved and deleted and categories are deleted
+def test_category_searches_match_a_scan():
+    generator = random.Random(21)
+    inventory = Inventory()
+    names = {1: "Grocery", 2: "Garden", 3: "Garden tools", 4: "Toys"}
+    for category_id, name in names.items():
+        inventory.add_new_category(category_id, name)
+    for product_id in range(400):
+        inventory.add_product(
+            product_id, f"Item {product_id}", 1.0, "d", generator.randint(1, 4), 5
+        )
+
+    def check():
+        for category_id in (1, 2, 3, 4, 99):
+            expected = [
+                product
+                for product in inventory.products.values()
+                if product.category.category_id == category_id
+                and category_id in inventory.categories
+            ]
+            for search in (
+                inventory.search_product_by_category_id,
+                inventory.search_product_by_category_id_no_cache,
+                inventory.search_product_by_category_id_memo,
+            ):
+                assert ids(search(category_id)) == ids(expected)
+        for name in ("garden", "GROCERY", "tools", "o", "xyz"):
+            expected = [
+                product
+                for product in inventory.products.values()
+                if product.category.category_id in inventory.categories
+                and name.casefold() in product.category.name.casefold()
+            ]
+            for search in (
+                inventory.search_product_by_category_name,
+                inventory.search_product_by_category_name_no_cache,
+                inventory.search_product_by_category_name_memo,
+            ):
+                assert ids(search(name)) == ids(expected)
+
+    check()
+    for product_id in generator.sample(range(400), 80):
+        inventory.update_product(product_id, category_id=generator.randint(1, 4))
+    for product_id in range(0, 400, 9):
+        inventory.delete_product(product_id)
+    check()
+    inventory.delete_category(4, cascade="reassign", reassign_to=1)
+    check()
+    inventory.delete_category(3, cascade="delete")
+    check()
+    inventory.update_category(2, name="Yard")
+    check()
+    # Each product is in the set of its own category only
+    assert sum(map(len, inventory.category_products.values())) == len(
+        inventory.products
+    )
@@ -0,0 +1,81 @@
+import pytest
+
+from Project_Phase_4 import ChangeFeed, Inventory
+
+
+def make_inventory(**options) -> Inventory:
+    inventory = Inventory(change_feed=True, **options)
+    inventory.add_new_category(1, "Grocery")
+    return inventory
+
+
+def test_batch_size_larger_than_retention_is_rejected():
+    feed = ChangeFeed(retention=5)
+    with pytest.raises(ValueError):
+        feed.subscribe(batch_size=10, callback=print)
+    with pytest.raises(ValueError):
+        feed.subscribe(batch_size=0)
+
+
+# A consumer which fell behind the retained events never fails the writer
+def test_lagging_consumer_does_not_fail_writes():
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    feed = inventory.enable_change_feed(retention=5)
+    received = []
+    subscription = feed.subscribe(batch_size=5, callback=received.extend)
+    subscription.delivering.acquire()
+    for product_id in range(20):
+        inventory.add_product(product_id, f"Apple {product_id}", 1.0, "Fruit", 1, 5)
+    subscription.delivering.release()
+    inventory.add_product(100, "Apple 100", 1.0, "Fruit", 1, 5)
+
+    assert subscription.lagging
+    assert isinstance(subscription.error, ValueError)
+    assert len(inventory.search_product_by_name("apple")) == 21
+    with pytest.raises(ValueError):
+        subscription.resume()
+
+
+# A callback which raises is marked as lagging and keeps its offset
+def test_failing_consumer_does_not_fail_writes():
+    inventory = make_inventory()
+    feed = inventory.change_feed
+    received = []
+
+    def callback(events):
+        if not received:
+            received.append(None)
+            raise RuntimeError("consumer is down")
+        received.extend(events)
+
+    subscription = feed.subscribe(batch_size=2, callback=callback)
+    start = subscription.offset
+    assert inventory.search_product_by_name("pear") == []
+    inventory.add_product(1, "Pear", 2.0, "Fruit", 1, 5)
+    inventory.add_product(2, "Pear 2", 2.0, "Fruit", 1, 5)
+
+    assert subscription.lagging
+    assert isinstance(subscription.error, RuntimeError)
+    assert subscription.offset == start
+    # The cache was invalidated before the consumer ran
+    assert len(inventory.search_product_by_name("pear")) == 2
+
+    inventory.add_product(3, "Pear 3", 2.0, "Fruit", 1, 5)
+    subscription.resume()
+    subscription.flush()
+    assert not subscription.lagging
+    assert [event.key for event in received[1:]] == [1, 2, 3]
+
+
+def test_update_product_publishes_a_field_diff():
+    inventory = make_inventory()
+    inventory.add_product(1, "Pear", 2.0, "Fruit", 1, 5)
+    subscription = inventory.change_feed.subscribe()
+    inventory.update_product(1, price=3.0, quantity=7)
+
+    (event,) = subscription.poll()
+    assert event.action == "update"
+    assert event.changes["price"] == (2.0, 3.0)
+    assert event.changes["quantity"] == (5, 7)
+    assert event.changes["price_history"][0][1] == 3.0
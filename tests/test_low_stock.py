@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import IndexedMinHeap, Inventory, ProductStore
+
+
+def by_quantity(products) -> list:
+    return [
+        product.product_id
+        for product in sorted(products, key=lambda p: (p.quantity, p.product_id))
+    ]
+
+
+# The heap pops like sorting the items by priority and id
+def test_heap_matches_a_sorted_list():
+    generator = random.Random(41)
+    heap = IndexedMinHeap()
+    priorities = {}
+    for _ in range(1500):
+        item_id = generator.randint(0, 200)
+        if generator.random() < 0.7:
+            priorities[item_id] = generator.randint(-5, 50)
+            heap.push(item_id, priorities[item_id])
+        else:
+            heap.remove(item_id)
+            priorities.pop(item_id, None)
+        expected = sorted(
+            (priority, item_id) for item_id, priority in priorities.items()
+        )
+        assert len(heap) == len(expected)
+        assert heap.peek() == (expected[0] if expected else None)
+        threshold = generator.randint(-5, 50)
+        assert list(heap.at_most(threshold)) == [
+            entry for entry in expected if entry[0] <= threshold
+        ]
+
+
+# Low stock reads match sorting the products by quantity, and subscribers are
+# called once each time a quantity crosses their threshold
+@pytest.mark.parametrize("store", [False, True])
+def test_low_stock_matches_sorted_quantities(store):
+    generator = random.Random(42)
+    inventory = Inventory(product_store=ProductStore() if store else None)
+    inventory.add_new_category(1, "Grocery")
+    alerts = []
+    inventory.subscribe_low_stock(3, lambda product: alerts.append(product.product_id))
+    for product_id in range(200):
+        inventory.add_product(
+            product_id, f"Item {product_id}", 1.0, "d", 1, generator.randint(0, 30)
+        )
+    assert sorted(alerts) == sorted(
+        product.product_id
+        for product in inventory.products.values()
+        if product.quantity <= 3
+    )
+
+    for _ in range(500):
+        product_id = generator.choice(sorted(inventory.products))
+        before = inventory.products[product_id].quantity
+        del alerts[:]
+        if generator.random() < 0.5:
+            inventory.decrease_product_quantity(product_id, generator.randint(1, 10))
+        else:
+            inventory.increase_product_quantity(product_id, generator.randint(1, 10))
+        after = inventory.products[product_id].quantity
+        assert alerts == ([product_id] if after <= 3 < before else [])
+    for product_id in range(0, 200, 13):
+        inventory.delete_product(product_id)
+
+    products = list(inventory.products.values())
+    assert inventory.peek_low_stock().product_id == by_quantity(products)[0]
+    for threshold in (-10, 0, 3, 15, 100):
+        expected = [product for product in products if product.quantity <= threshold]
+        assert [
+            product.product_id for product in inventory.low_stock_products(threshold)
+        ] == by_quantity(expected)
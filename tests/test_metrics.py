@@ -0,0 +1,53 @@
+from Project_Phase_4 import Inventory
+
+
+def make_inventory() -> Inventory:
+    inventory = Inventory(metrics=True)
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, "Garden")
+    for product_id in range(100):
+        inventory.add_product(
+            product_id,
+            f"Item {product_id}",
+            float(product_id),
+            "d",
+            product_id % 2 + 1,
+            product_id % 3,
+        )
+    return inventory
+
+
+def rows(inventory: Inventory, method: str) -> tuple:
+    recorded = inventory.metrics_snapshot()["methods"][method]
+    return recorded["rows_scanned"], recorded["rows_returned"]
+
+
+# Queries record the products read from the chosen index and the products returned
+def test_query_records_rows():
+    inventory = make_inventory()
+
+    result = inventory.query(category_id=1, in_stock=True)
+    assert len(result) == 33
+    # The category set of 50 products is read, the stock filter keeps 33
+    assert rows(inventory, "query") == (50, 33)
+
+    result = inventory.query(price=(10, 19), order_by="price", limit=4)
+    assert [product.product_id for product in result] == [10, 11, 12, 13]
+    # The price index is read in order and stops after the limit
+    assert rows(inventory, "query") == (54, 37)
+
+
+# Pages and top products record their rows, from the price index or a plan
+def test_pages_and_top_products_record_rows():
+    inventory = make_inventory()
+
+    page, cursor = inventory.page_products(10)
+    assert len(page) == 10 and cursor is not None
+    # One more product is read to know whether there is a next page
+    assert rows(inventory, "page_products") == (11, 10)
+
+    top = inventory.top_products(5, order_by="quantity", category_id=2)
+    assert len(top) == 5
+    assert rows(inventory, "top_products") == (50, 5)
+    # The page read by top_products is counted as part of it
+    assert rows(inventory, "page_products") == (11, 10)
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, NgramIndex
+
+WORDS = ["red", "apple", "pear", "green", "tea", "teapot", "pot", "reed", "ea"]
+
+
+def random_name(generator: random.Random) -> str:
+    return " ".join(generator.choice(WORDS) for _ in range(generator.randint(1, 3)))
+
+
+# The index returns the ids a substring scan of the names returns
+@pytest.mark.parametrize("compact", [False, True])
+def test_ngram_index_matches_a_substring_scan(compact):
+    generator = random.Random(31)
+    index = NgramIndex(compact=compact)
+    names = {}
+    for _ in range(600):
+        action = generator.random()
+        if action < 0.5:
+            item_id = generator.randint(0, 300)
+            if item_id not in names:
+                names[item_id] = random_name(generator)
+                index.add(item_id, names[item_id])
+        elif action < 0.6:
+            added = {
+                item_id: random_name(generator)
+                for item_id in generator.sample(range(301, 2000), 20)
+                if item_id not in names
+            }
+            index.add_many(added.items())
+            names.update(added)
+        elif names:
+            item_id = generator.choice(sorted(names))
+            index.remove(item_id)
+            del names[item_id]
+
+    for query in WORDS + ["e", "re", "d re", "apple pear", "ot t", "xyz", ""]:
+        expected = sorted(item_id for item_id, name in names.items() if query in name)
+        assert sorted(index.search(query)) == expected
+        assert index.estimate(query) >= len(expected)
+
+
+# Product and category name searches match a scan, after renames and deletes
+def test_name_searches_match_a_scan():
+    generator = random.Random(32)
+    inventory = Inventory()
+    for category_id in range(20):
+        inventory.add_new_category(category_id, random_name(generator))
+    for product_id in range(300):
+        inventory.add_product(
+            product_id, random_name(generator), 1.0, "d", product_id % 20, 5
+        )
+    for product_id in generator.sample(range(300), 50):
+        inventory.update_product(product_id, name=random_name(generator))
+    for product_id in range(0, 300, 11):
+        inventory.delete_product(product_id)
+    inventory.update_category(3, name="Teapot shelf")
+    inventory.delete_category(4, cascade="delete")
+
+    for query in ("tea", "pot", "apple", "red re", "e", "shelf", "xyz"):
+        expected = [
+            product.product_id
+            for product in inventory.products.values()
+            if query in product.name.casefold()
+        ]
+        for search in (
+            inventory.search_product_by_name,
+            inventory.search_product_by_name_no_cache,
+            inventory.search_product_by_name_memo,
+        ):
+            assert sorted(product.product_id for product in search(query)) == sorted(
+                expected
+            )
+        expected = [
+            category.category_id
+            for category in inventory.categories.values()
+            if query in category.name.casefold()
+        ]
+        for search in (
+            inventory.search_category_by_name,
+            inventory.search_category_by_name_no_cache,
+            inventory.search_category_by_name_memo,
+        ):
+            assert sorted(category.category_id for category in search(query)) == (
+                sorted(expected)
+            )
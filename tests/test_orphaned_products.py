@@ -0,0 +1,80 @@
+from Project_Phase_4 import (
+    Inventory,
+    export_catalog,
+    import_categories,
+    import_products,
+)
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+def orphaned_inventory() -> Inventory:
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, "Garden")
+    for product_id in range(10):
+        category_id = product_id % 2 + 1
+        inventory.add_product(
+            product_id, f"Item {product_id}", 1.0 + product_id, "d", category_id, 5
+        )
+    return inventory
+
+
+# Every category search hides orphans, including results cached before the delete
+def test_category_searches_never_return_orphans():
+    inventory = orphaned_inventory()
+    searches = (
+        lambda: inventory.search_product_by_category_id(2),
+        lambda: inventory.search_product_by_category_id_no_cache(2),
+        lambda: inventory.search_product_by_category_id_memo(2),
+        lambda: inventory.search_product_by_category_name("Garden"),
+        lambda: inventory.search_product_by_category_name_no_cache("Garden"),
+        lambda: inventory.search_product_by_category_name_memo("Garden"),
+        lambda: inventory.iter_products_by_category_id(2),
+        lambda: inventory.iter_products_by_category_name("Garden"),
+        lambda: inventory.query(category_id=2),
+        lambda: inventory.page_products(10, category_id=2)[0],
+    )
+    for search in searches:
+        assert ids(search()) == [1, 3, 5, 7, 9]
+
+    inventory.delete_category(2)
+
+    assert ids(inventory.orphaned_products()) == [1, 3, 5, 7, 9]
+    assert ids(inventory.orphaned_products(2)) == [1, 3, 5, 7, 9]
+    for search in searches:
+        assert ids(search()) == []
+    assert ids(inventory.query(category_id=2, active_only=False)) == []
+    # Searches that do not filter by category still find the orphans
+    assert ids(inventory.search_product_by_name_no_cache("Item 3")) == [3]
+    assert ids(inventory.search_product_by_price_range(4.0, 4.0)) == [3]
+
+
+# An export with orphans imports again, the orphans keep an inactive category
+def test_export_with_orphans_round_trips(tmp_path):
+    inventory = orphaned_inventory()
+    inventory.delete_category(2)
+    categories_path = str(tmp_path / "categories.csv")
+    products_path = str(tmp_path / "products.jsonl")
+
+    counts = export_catalog(inventory, categories_path, products_path)
+
+    assert counts == {"categories": 2, "products": 10}
+    imported = Inventory()
+    assert import_categories(imported, categories_path) == 2
+    assert import_products(imported, products_path) == 10
+    assert imported.categories[1].status
+    assert not imported.categories[2].status
+    assert imported.categories[2].name == "Garden"
+    for product_id, product in inventory.products.items():
+        copy = imported.products[product_id]
+        assert (copy.name, copy.price, copy.quantity) == (
+            product.name,
+            product.price,
+            product.quantity,
+        )
+        assert copy.category.category_id == product.category.category_id
+    assert ids(imported.search_product_by_category_id(2)) == [1, 3, 5, 7, 9]
+    assert ids(imported.query(category_id=2, active_only=True)) == []
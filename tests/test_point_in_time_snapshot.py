@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, ProductStore
+
+
+# Everything a report reads, from an inventory or a snapshot
+def state(source) -> tuple:
+    products = {
+        product_id: (
+            product.name,
+            product.price,
+            product.quantity,
+            product.category.category_id,
+            product.category.name,
+            bool(product.category.status),
+            len(product.price_history),
+        )
+        for product_id, product in source.products.items()
+    }
+    categories = {
+        category_id: (category.name, bool(category.status))
+        for category_id, category in source.categories.items()
+    }
+    return products, categories
+
+
+def mutate(inventory: Inventory, generator: random.Random, next_id: list):
+    action = generator.randrange(9)
+    product_ids = sorted(inventory.products)
+    category_ids = sorted(inventory.categories)
+    product_id = generator.choice(product_ids)
+    if action == 0:
+        inventory.add_product(
+            next_id[0], f"New {next_id[0]}", 3.0, "d", category_ids[0], 2
+        )
+        next_id[0] += 1
+    elif action == 1:
+        inventory.delete_product(product_id)
+    elif action == 2:
+        inventory.update_product(product_id, price=float(generator.randint(1, 90)))
+    elif action == 3:
+        inventory.update_product(product_id, name=f"Renamed {product_id}")
+    elif action == 4:
+        inventory.update_product(product_id, category_id=generator.choice(category_ids))
+    elif action == 5:
+        inventory.decrease_product_quantity(product_id, 1)
+    elif action == 6:
+        inventory.apply_stock_batch([(product_id, 4), (product_ids[0], 1)])
+    elif action == 7:
+        category_id = generator.choice(category_ids)
+        inventory.update_category(category_id, status=generator.random() < 0.5)
+    else:
+        rows = [
+            (next_id[0] + offset, "Bulk", 1.0, "d", category_ids[-1], 1)
+            for offset in (0, 1)
+        ]
+        inventory.add_products_bulk(rows)
+        next_id[0] += 2
+
+
+# A snapshot keeps answering with the state it was taken at while the inventory
+# changes, and closing it stops tracking the writes
+@pytest.mark.parametrize("store", [False, True])
+def test_snapshots_see_the_state_they_were_taken_at(store):
+    generator = random.Random(71)
+    inventory = Inventory(product_store=ProductStore() if store else None)
+    for category_id in range(1, 5):
+        inventory.add_new_category(category_id, f"Category {category_id}")
+    for product_id in range(100):
+        inventory.add_product(
+            product_id, f"Item {product_id}", 5.0, "d", product_id % 4 + 1, 10
+        )
+    next_id = [1000]
+
+    first_state = state(inventory)
+    first = inventory.snapshot()
+    for _ in range(150):
+        mutate(inventory, generator, next_id)
+    second_state = state(inventory)
+    with inventory.snapshot() as second:
+        for _ in range(150):
+            mutate(inventory, generator, next_id)
+        inventory.delete_category(2, cascade="delete")
+        inventory.delete_category(3, cascade="reassign", reassign_to=4)
+        assert state(first) == first_state
+        assert state(second) == second_state
+    assert state(first) == first_state
+    assert second.closed
+    with pytest.raises(ValueError, match="closed"):
+        second.product(1)
+
+    # Snapshot reads are copies, changing them never reaches the inventory
+    copy = first.products[5]
+    copy.price = 1234.0
+    assert first.products[5].price == first_state[0][5][1]
+    assert all(product.price != 1234.0 for product in inventory.products.values())
+    with pytest.raises(KeyError):
+        first.product(next_id[0] - 1)
+    first.close()
+    assert len(inventory.snapshots) == 0
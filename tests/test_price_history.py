@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+
+from Project_Phase_4 import Inventory, PriceHistory
+
+START = datetime(2024, 1, 1)
+
+
+def random_entries(generator: random.Random, count: int) -> list:
+    seconds = sorted(generator.randint(0, 1000) for _ in range(count))
+    return [
+        (START + timedelta(seconds=second), float(generator.randint(1, 100)))
+        for second in seconds
+    ]
+
+
+# Time lookups answer like scanning the list of (datetime, price) changes
+def test_price_history_matches_a_linear_scan():
+    generator = random.Random(51)
+    for _ in range(50):
+        entries = random_entries(generator, generator.randint(0, 40))
+        history = PriceHistory(entries)
+        assert list(history) == entries and len(history) == len(entries)
+        assert history[-1:] == entries[-1:]
+        for _ in range(20):
+            when = START + timedelta(seconds=generator.randint(-10, 1010))
+            before = [price for changed_at, price in entries if changed_at <= when]
+            assert history.price_at(when) == (before[-1] if before else None)
+            start, end = sorted(
+                START + timedelta(seconds=generator.randint(-10, 1010)) for _ in "se"
+            )
+            assert list(history.between(start, end)) == [
+                entry for entry in entries if start <= entry[0] <= end
+            ]
+            assert list(history.between(None, end)) == [
+                entry for entry in entries if entry[0] <= end
+            ]
+        # Downsampling keeps the last change of every 100 second interval
+        last = {}
+        for changed_at, price in entries:
+            last[changed_at.timestamp() // 100] = (changed_at, price)
+        assert list(history.downsample(100)) == list(last.values())
+
+
+# Trimming keeps the price in effect at the cutoff, so later lookups still answer
+def test_trimmed_history_keeps_later_answers():
+    generator = random.Random(52)
+    entries = random_entries(generator, 30)
+    cutoff = entries[10][0] + timedelta(seconds=0.5)
+    history = PriceHistory(entries)
+    history.trim(before=cutoff)
+    full = PriceHistory(entries)
+    for second in range(0, 1001, 7):
+        when = START + timedelta(seconds=second)
+        if when >= cutoff:
+            assert history.price_at(when) == full.price_at(when)
+    history.trim(max_entries=5)
+    assert list(history) == entries[-5:]
+
+
+# The inventory records every price change and answers lookups from the history
+def test_inventory_price_lookups_follow_the_changes():
+    inventory = Inventory(price_history_limit=4)
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_product(1, "Tea", 1.0, "d", 1, 5)
+    for price in (2.0, 3.0, 3.0, 4.0, 5.0):
+        inventory.update_product(1, price=price)
+
+    history = inventory.get_product_price_history(1)
+    assert [price for _, price in history] == [2.0, 3.0, 4.0, 5.0]
+    assert inventory.get_product_price_at(1, datetime.now()) == 5.0
+    when = history[1][0]
+    assert inventory.get_product_price_at(1, when) == [
+        price for changed_at, price in history if changed_at <= when
+    ][-1]
+    between = inventory.get_product_price_history_between(1, when)
+    assert list(between) == [entry for entry in history if entry[0] >= when]
+    # The copy is not changed by later price changes
+    inventory.update_product(1, price=6.0)
+    assert len(history) == 4
@@ -0,0 +1,95 @@
+import random
+
+from Project_Phase_4 import Inventory, PriceIndex
+
+
+def ids(products) -> list:
+    return [product.product_id for product in products]
+
+
+# The index answers like a sorted list of (price, product_id) pairs
+def test_price_index_matches_a_sorted_list():
+    generator = random.Random(11)
+    index = PriceIndex()
+    pairs = set()
+    for _ in range(800):
+        price = float(generator.randint(0, 100))
+        product_id = generator.randint(0, 500)
+        action = generator.random()
+        if action < 0.5:
+            if (price, product_id) not in pairs:
+                index.add(price, product_id)
+                pairs.add((price, product_id))
+        elif action < 0.7 and pairs:
+            removed = generator.sample(sorted(pairs), min(len(pairs), 5))
+            index.remove_many(removed + [(101.0, 1)])
+            pairs.difference_update(removed)
+        elif action < 0.8:
+            added = {
+                (float(generator.randint(0, 100)), generator.randint(501, 900))
+                for _ in range(generator.randint(1, 40))
+            } - pairs
+            index.add_many(added)
+            pairs.update(added)
+        elif pairs:
+            price, product_id = generator.choice(sorted(pairs))
+            index.remove(price, product_id)
+            index.remove(price, product_id)
+            pairs.discard((price, product_id))
+
+        expected = sorted(pairs)
+        assert list(zip(index.prices, index.product_ids)) == expected
+        low, high = sorted(generator.uniform(-5, 105) for _ in range(2))
+        in_range = [pair for pair in expected if low <= pair[0] <= high]
+        assert list(index.find_range(low, high)) == [pair[1] for pair in in_range]
+        assert index.count(low, high) == len(in_range)
+        if in_range:
+            after = generator.choice(in_range)
+            assert list(index.iter_pairs(low, high, after)) == [
+                pair for pair in in_range if pair > after
+            ]
+            assert list(index.iter_pairs(low, high, after, reverse=True)) == [
+                pair for pair in reversed(in_range) if pair < after
+            ]
+
+
+# Price range searches return what a scan of every product returns, in price order
+def test_price_range_searches_match_a_scan():
+    generator = random.Random(12)
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, "Archive")
+    for product_id in range(300):
+        price = float(generator.randint(1, 60))
+        inventory.add_product(
+            product_id, f"Item {product_id}", price, "d", product_id % 2 + 1, 5
+        )
+    searches = (
+        inventory.search_product_by_price_range,
+        inventory.search_product_by_price_range_no_cache,
+        inventory.search_product_by_price_range_memo,
+    )
+    ranges = [(10, 20), (0, 100), (15.5, 15.5), (30, 30), (61, 70), (20, 10)]
+
+    def check():
+        for low, high in ranges:
+            expected = sorted(
+                (
+                    product
+                    for product in inventory.products.values()
+                    if low <= product.price <= high
+                ),
+                key=lambda product: (product.price, product.product_id),
+            )
+            for search in searches:
+                assert ids(search(low, high)) == ids(expected)
+
+    check()
+    for product_id in generator.sample(range(300), 60):
+        inventory.update_product(product_id, price=float(generator.randint(1, 60)))
+    for product_id in range(0, 300, 7):
+        inventory.delete_product(product_id)
+    inventory.update_category(2, status=False)
+    check()
+    inventory.update_category(2, status=True)
+    check()
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, ProductStore
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+# The compact name index of a product store finds the same products as the sets
+def test_store_name_searches_match_the_dictionary():
+    generator = random.Random(3)
+    inventories = [Inventory(), Inventory(product_store=ProductStore())]
+    for inventory in inventories:
+        inventory.add_new_category(1, "Grocery")
+        inventory.add_new_category(2, "Garden")
+    product_ids = generator.sample(range(1000), 300)
+    for product_id in product_ids:
+        name = f"Item {generator.choice(['Apple', 'Pear', 'Plum'])} {product_id}"
+        for inventory in inventories:
+            inventory.add_product(product_id, name, 1.0, "d", 1, 5)
+    for product_id in product_ids[:50]:
+        for inventory in inventories:
+            inventory.delete_product(product_id)
+    for product_id in product_ids[50:100]:
+        for inventory in inventories:
+            inventory.update_product(product_id, name=f"Renamed {product_id}")
+    for inventory in inventories:
+        inventory.update_category(2, status=False)
+        inventory.update_product(product_ids[100], category_id=2)
+
+    for query in ("apple", "PEAR 1", "renamed", "item", "m 2", "xyz", "12"):
+        dictionary, store = (
+            ids(inventory.search_product_by_name_no_cache(query))
+            for inventory in inventories
+        )
+        assert dictionary == store
+    assert inventories[1].product_name_index.compact
+
+
+def test_loaded_snapshot_searches_match(tmp_path):
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    for product_id in range(200, 0, -1):
+        inventory.add_product(product_id, f"Item {product_id}", 1.0, "d", 1, 5)
+    path = str(tmp_path / "inventory.snap")
+    inventory.save_snapshot(path)
+
+    loaded = Inventory.load_snapshot(path)
+    for query in ("item 1", "tem", "20"):
+        assert ids(loaded.search_product_by_name_no_cache(query)) == ids(
+            inventory.search_product_by_name_no_cache(query)
+        )
+    loaded.delete_product(150)
+    loaded.add_product(150, "Item 150", 1.0, "d", 1, 5)
+    expected = [15] + list(range(150, 160))
+    assert ids(loaded.search_product_by_name_no_cache("item 15")) == expected
+
+
+# A bulk load of unsorted ids merges every posting once and finds the same names
+def test_bulk_load_of_unsorted_ids_matches_single_adds():
+    generator = random.Random(5)
+    product_ids = list(range(2000))
+    generator.shuffle(product_ids)
+    rows = [
+        (product_id, f"Item {product_id}", 1.0, "d", 1, 5) for product_id in product_ids
+    ]
+    bulk, single = Inventory(product_store=ProductStore()), Inventory()
+    for inventory in (bulk, single):
+        inventory.add_new_category(1, "Grocery")
+    bulk.add_products_bulk(rows[:1000])
+    bulk.add_products_bulk(rows[1000:])
+    for row in rows:
+        single.add_product(*row)
+
+    for posting in bulk.product_name_index.postings.values():
+        assert list(posting) == sorted(set(posting))
+    for query in ("item 1", "12", "tem 19", "item"):
+        assert ids(bulk.search_product_by_name_no_cache(query)) == ids(
+            single.search_product_by_name_no_cache(query)
+        )
+
+
+# A snapshot serves its products from the file, a product store is rejected
+def test_snapshot_loads_reject_a_product_store(tmp_path):
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    path = str(tmp_path / "inventory.snap")
+    inventory.save_snapshot(path)
+
+    with pytest.raises(ValueError, match="product_store"):
+        Inventory.load_snapshot(path, product_store=ProductStore())
+    with pytest.raises(ValueError, match="product_store"):
+        Inventory.recover(path, str(tmp_path / "wal.log"), product_store=ProductStore())
+    with pytest.raises(ValueError, match="product_store"):
+        Inventory.recover(
+            str(tmp_path / "missing.snap"),
+            str(tmp_path / "wal.log"),
+            product_store=ProductStore(),
+        )
+    loaded = Inventory.load_snapshot(path, thread_safe=True)
+    assert loaded.categories[1].name == "Grocery"
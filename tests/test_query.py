@@ -0,0 +1,121 @@
+import itertools
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, ProductStore
+
+SORT_KEYS = Inventory.SORT_KEYS
+
+
+def ids(products) -> list:
+    return [product.product_id for product in products]
+
+
+def make_inventory(store: bool) -> Inventory:
+    generator = random.Random(61)
+    inventory = Inventory(product_store=ProductStore() if store else None)
+    for category_id, name in ((1, "Grocery"), (2, "Garden"), (3, "Toys")):
+        inventory.add_new_category(category_id, name)
+    for product_id in range(400):
+        inventory.add_product(
+            product_id,
+            f"{generator.choice(['Red', 'Blue', 'Green'])} item {product_id}",
+            float(generator.randint(1, 50)),
+            "d",
+            generator.randint(1, 3),
+            generator.randint(0, 4),
+        )
+    for product_id in range(0, 400, 9):
+        inventory.delete_product(product_id)
+    for product_id in generator.sample(range(1, 400, 9), 20):
+        inventory.update_product(product_id, price=float(generator.randint(1, 50)))
+    inventory.update_category(3, status=False)
+    return inventory
+
+
+# The products a scan of every product keeps, sorted like query
+def scan(inventory, category_id, price, name, in_stock, order_by, descending):
+    products = [
+        product
+        for product in inventory.products.values()
+        if (category_id is None or product.category.category_id == category_id)
+        and (price is None or price[0] <= product.price <= price[1])
+        and (name is None or name.casefold() in product.name.casefold())
+        and (in_stock is None or (product.quantity > 0) == in_stock)
+    ]
+    if order_by is not None:
+        products.sort(key=SORT_KEYS[order_by], reverse=descending)
+    return products
+
+
+# Every combination of filters returns what a scan returns, whichever index the
+# planner reads, and active_only leaves out the inactive category
+@pytest.mark.parametrize("store", [False, True])
+def test_query_matches_a_scan(store):
+    inventory = make_inventory(store)
+    for category_id, price, name, in_stock, order_by, limit in itertools.product(
+        (None, 1, 3),
+        (None, (10, 20), (49, 49)),
+        (None, "red", "item 1"),
+        (None, True, False),
+        (None, "price", "name", "quantity"),
+        (None, 5),
+    ):
+        for descending in (False, True) if order_by else (False,):
+            filters = (category_id, price, name, in_stock, order_by, descending)
+            got = inventory.query(*filters, limit)
+            expected = scan(inventory, *filters)
+            if order_by is None:
+                assert len(got) == min(len(expected), limit or len(expected))
+                assert set(ids(got)) <= set(ids(expected))
+            else:
+                assert ids(got) == ids(expected[:limit])
+            active = inventory.query(*filters, limit, True)
+            expected = [product for product in expected if product.category.status]
+            if order_by is None:
+                assert len(active) == min(len(expected), limit or len(expected))
+                assert set(ids(active)) <= set(ids(expected))
+            else:
+                assert ids(active) == ids(expected[:limit])
+
+
+# The explanation names the index the planner reads
+def test_explain_names_the_most_selective_index():
+    inventory = make_inventory(False)
+    assert inventory.explain(category_id=1).startswith("Access: category set")
+    assert inventory.explain(price=(49, 49), category_id=1).startswith(
+        "Access: price index"
+    )
+    assert "Filter: category_id = 1" in inventory.explain(price=(49, 49), category_id=1)
+    assert inventory.explain(in_stock=True).startswith("Access: full scan")
+    with pytest.raises(ValueError):
+        inventory.query(order_by="colour")
+
+
+# Walking every page, or asking for the top products, returns the sorted scan
+@pytest.mark.parametrize("store", [False, True])
+def test_pages_and_top_products_match_a_sorted_scan(store):
+    inventory = make_inventory(store)
+    for order_by, descending, name, category_id, price in itertools.product(
+        ("price", "name", "quantity"),
+        (False, True),
+        (None, "blue"),
+        (None, 2),
+        ((None, None), (5, 30)),
+    ):
+        bounds = None if price == (None, None) else price
+        expected = scan(
+            inventory, category_id, bounds, name, None, order_by, descending
+        )
+        seen, cursor = [], None
+        while True:
+            page, cursor = inventory.page_products(
+                23, cursor, order_by, descending, name, category_id, *price
+            )
+            seen += page
+            if cursor is None:
+                break
+        assert ids(seen) == ids(expected)
+        top = inventory.top_products(7, order_by, descending, name, category_id, *price)
+        assert ids(top) == ids(expected[:7])
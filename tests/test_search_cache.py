@@ -0,0 +1,114 @@
+import random
+import time
+from math import inf, nan
+
+from Project_Phase_4 import Inventory, RangeKeys, SearchCache
+
+
+def test_range_keys_match_every_holding_range():
+    generator = random.Random(7)
+    ranges = RangeKeys()
+    keys = set()
+    for _ in range(2000):
+        low = round(generator.uniform(0, 1000), 2)
+        key = (low, low + generator.choice([0, 0.01, 1, 37.5, 400, 5000]))
+        ranges.add(key)
+        keys.add(key)
+    for key in [(-inf, 10.0), (5.0, inf), (nan, 3.0), (9.0, 2.0)]:
+        ranges.add(key)
+        keys.add(key)
+    for key in generator.sample(sorted(keys, key=str), 500):
+        ranges.discard(key)
+        keys.discard(key)
+
+    for value in [generator.uniform(-10, 7000) for _ in range(300)] + [0, 500.0]:
+        expected = {key for key in keys if key[0] <= value <= key[1]}
+        assert sorted(ranges.containing(value)) == sorted(expected)
+
+
+def test_name_searches_are_cached_casefolded():
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_product(1, "Green Apple", 1.0, "Fruit", 1, 5)
+    assert len(inventory.search_product_by_name("APPLE")) == 1
+    assert len(inventory.search_product_by_name("apple")) == 1
+    assert inventory.search_cache.stats()["hits"] == 1
+
+    inventory.add_product(2, "Red Apple", 2.0, "Fruit", 1, 5)
+    assert len(inventory.search_product_by_name("Apple")) == 2
+
+
+def test_zero_width_and_open_price_ranges_are_invalidated():
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    assert inventory.search_product_by_price_range(2.5, 2.5) == []
+    assert inventory.search_product_by_price_range(-inf, 3) == []
+    inventory.add_product(1, "Pear", 2.5, "Fruit", 1, 5)
+    assert len(inventory.search_product_by_price_range(2.5, 2.5)) == 1
+    assert len(inventory.search_product_by_price_range(-inf, 3)) == 1
+
+
+def test_invalidation_visits_only_the_matching_keys():
+    cache = SearchCache()
+    for low in range(20000):
+        cache.put("price_range", (low, low + 5), [])
+        cache.put("product_name", f"name {low}", [])
+    cache.invalidate_containing("price_range", 100)
+    cache.invalidate_substrings("product_name", "name 12345")
+    # 95 to 100 hold the price, "name 1" to "name 12345" are parts of the name
+    assert cache.invalidations == 6 + 5
+    assert len(cache) == 40000 - 11
+
+
+def _median_write(inventory: Inventory, first_id: int) -> float:
+    timings = []
+    for product_id in range(first_id, first_id + 200):
+        start = time.perf_counter()
+        inventory.add_product(product_id, f"Item {product_id}", 500.0, "d", 1, 5)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+# Writes visit only the cached searches they change, so their latency stays flat
+# as the cache fills up
+def test_write_latency_stays_flat_with_a_warm_cache():
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    cold = _median_write(inventory, 0)
+    for index in range(10000):
+        inventory.search_product_by_price_range(index * 10.0, index * 10.0 + 5)
+        inventory.search_product_by_name(f"query {index}")
+    assert len(inventory.search_cache) >= 20000
+    warm = _median_write(inventory, 1000)
+    assert warm < cold * 4 + 0.0002
+
+
+def test_a_cache_without_entries_stores_nothing():
+    cache = SearchCache(max_entries=0)
+    cache.put("product_name", "apple", [1])
+    assert len(cache) == 0
+    assert cache.get("product_name", "apple") is None
+
+    inventory = Inventory(cache_size=0)
+    inventory.add_new_category(1, "Grocery")
+    inventory.search_product_by_name("pear")
+    assert inventory.cache_stats()["search_cache"]["entries"] == 0
+
+
+# The memoized searches are bounded like the automatic cache and still match the
+# uncached searches after their results are evicted
+def test_memoized_searches_are_bounded():
+    inventory = Inventory(cache_size=50)
+    inventory.add_new_category(1, "Grocery")
+    for product_id in range(100):
+        price = float(product_id)
+        inventory.add_product(product_id, f"Item {product_id}", price, "d", 1, 5)
+    for product_id in range(100):
+        inventory.search_product_by_name_memo(f"item {product_id}")
+        inventory.search_product_by_price_range_memo(product_id, product_id + 5.0)
+    assert len(inventory.memoized_search) == 50
+    assert inventory.cache_stats()["memoized_search"]["evictions"] == 150
+    for product_id in (0, 99):
+        assert inventory.search_product_by_name_memo(
+            f"item {product_id}"
+        ) == inventory.search_product_by_name_no_cache(f"item {product_id}")
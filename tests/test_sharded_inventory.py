@@ -0,0 +1,48 @@
+from Project_Phase_4 import Inventory, ShardedInventory
+
+
+# Every product lives on the first shard, which fills each page on its own
+def test_pages_continue_when_one_shard_fills_the_page():
+    with ShardedInventory(2) as inventory:
+        inventory.add_new_category(1, "Grocery")
+        inventory.add_products_bulk(
+            [
+                (product_id, f"Item {product_id}", product_id, "d", 1, 5)
+                for product_id in range(0, 40, 2)
+            ]
+        )
+        shards = {inventory._shard(product_id) for product_id in inventory.products}
+        assert shards == {0}
+
+        prices = []
+        page, cursor = inventory.page_products(5)
+        prices += [product.price for product in page]
+        while cursor is not None:
+            page, cursor = inventory.page_products(5, cursor)
+            prices += [product.price for product in page]
+
+    assert prices == list(range(0, 40, 2))
+
+
+def test_sharded_pages_match_a_single_inventory():
+    single = Inventory()
+    rows = [
+        (product_id, f"Item {product_id}", product_id % 7, "d", 1, product_id % 3)
+        for product_id in range(50)
+    ]
+    single.add_new_category(1, "Grocery")
+    single.add_products_bulk(rows)
+    with ShardedInventory(3) as sharded:
+        sharded.add_new_category(1, "Grocery")
+        sharded.add_products_bulk(rows)
+        for order_by in ("price", "quantity", "name"):
+            pages = []
+            for inventory in (single, sharded):
+                ids, cursor = [], None
+                while True:
+                    page, cursor = inventory.page_products(4, cursor, order_by, True)
+                    ids += [product.product_id for product in page]
+                    if cursor is None:
+                        break
+                pages.append(ids)
+            assert pages[0] == pages[1]
@@ -0,0 +1,90 @@
+from Project_Phase_4 import Inventory, SnapshotFile
+
+
+def make_inventory() -> Inventory:
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    inventory.add_new_category(2, "Garden")
+    inventory.add_new_category(3, "Archive")
+    for product_id in range(60):
+        inventory.add_product(
+            product_id,
+            f"Item {product_id}",
+            float(product_id % 13),
+            "d",
+            product_id % 3 + 1,
+            (product_id * 7) % 11,
+        )
+    inventory.update_category(3, status=False)
+    return inventory
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+def assert_same(loaded: Inventory, inventory: Inventory):
+    assert ids(loaded.products.values()) == ids(inventory.products.values())
+    for category_id in (1, 2, 3):
+        assert ids(loaded.search_product_by_category_id_no_cache(category_id)) == ids(
+            inventory.search_product_by_category_id_no_cache(category_id)
+        )
+    assert ids(loaded.search_product_by_name_no_cache("item 1")) == ids(
+        inventory.search_product_by_name_no_cache("item 1")
+    )
+    assert ids(loaded.query(price=(2, 5), active_only=True)) == ids(
+        inventory.query(price=(2, 5), active_only=True)
+    )
+    assert [product.product_id for product in loaded.low_stock_products(3)] == [
+        product.product_id for product in inventory.low_stock_products(3)
+    ]
+    assert loaded.peek_low_stock().product_id == inventory.peek_low_stock().product_id
+
+
+# The stock and category indexes are read from the file instead of the records
+def test_loaded_snapshot_matches_the_inventory(tmp_path):
+    inventory = make_inventory()
+    path = str(tmp_path / "inventory.snap")
+    inventory.save_snapshot(path)
+    snapshot = SnapshotFile(path)
+    assert snapshot.group_count == 3
+    snapshot.close()
+
+    loaded = Inventory.load_snapshot(path)
+    assert loaded.stock_heap.loader is not None
+    assert_same(loaded, inventory)
+    assert loaded.stock_heap.loader is None
+
+    for target in (loaded, inventory):
+        target.decrease_product_quantity(4, 9)
+        target.delete_product(5)
+        target.update_category(3, status=True)
+    assert_same(loaded, inventory)
+
+
+# A checkpoint onto the loaded file unmaps it before replacing it and serves the
+# products from the new file
+def test_checkpoint_replaces_the_mapped_snapshot(tmp_path):
+    inventory = make_inventory()
+    path = str(tmp_path / "inventory.snap")
+    inventory.save_snapshot(path)
+
+    # The name index and stock heap are still to be read from the old file
+    loaded = Inventory.load_snapshot(path)
+    old_snapshot = loaded.products.snapshot
+    loaded.checkpoint(path)
+    assert old_snapshot.mmap.closed
+    assert loaded.product_name_index.loader is not None
+    assert_same(loaded, inventory)
+
+    old_snapshot = loaded.products.snapshot
+    for target in (loaded, inventory):
+        target.add_product(100, "Item 100", 3.0, "d", 1, 1)
+        target.update_product(6, price=9.5)
+        target.delete_product(7)
+    loaded.checkpoint(path)
+    assert old_snapshot.mmap.closed
+    assert loaded.products.new_ids == set()
+    assert loaded.products.deleted == set()
+    assert_same(loaded, inventory)
+    assert_same(Inventory.load_snapshot(path), inventory)
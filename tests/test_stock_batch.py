@@ -0,0 +1,40 @@
+import pytest
+
+from Project_Phase_4 import Inventory, ShardedInventory
+
+
+def make_inventory(inventory):
+    inventory.add_new_category(1, "Grocery")
+    for product_id in range(4):
+        inventory.add_product(product_id, f"Item {product_id}", 2.0, "d", 1, 5)
+    # A backorder took the first product below zero
+    inventory.decrease_product_quantity(0, 8)
+    return inventory
+
+
+def quantities(inventory) -> list:
+    return [inventory.products[product_id].quantity for product_id in range(4)]
+
+
+def test_restocking_a_product_below_zero_is_accepted():
+    inventory = make_inventory(Inventory())
+    assert inventory.apply_stock_batch([(0, 2), (1, -5)]) == {0: -1, 1: 0}
+
+
+def test_a_batch_taking_a_quantity_below_zero_is_rejected_whole():
+    inventory = make_inventory(Inventory())
+    with pytest.raises(ValueError):
+        inventory.apply_stock_batch([(0, 10), (1, -6)])
+    with pytest.raises(ValueError):
+        inventory.apply_stock_batch([(2, 1), (0, -1)])
+    assert quantities(inventory) == [-3, 5, 5, 5]
+
+
+# The shards which applied their lines reverse them exactly, even a restock of a
+# product below zero
+def test_sharded_batches_are_reversed_when_a_shard_rejects():
+    with ShardedInventory(2) as inventory:
+        make_inventory(inventory)
+        with pytest.raises(ValueError):
+            inventory.apply_stock_batch([(0, 2), (2, 1), (1, -6)])
+        assert quantities(inventory) == [-3, 5, 5, 5]
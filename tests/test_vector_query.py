@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from Project_Phase_4 import Inventory, ProductStore
+
+pytest.importorskip("numpy")
+
+
+def make_inventory(product_store: bool) -> Inventory:
+    generator = random.Random(11)
+    inventory = Inventory(product_store=ProductStore() if product_store else None)
+    inventory.add_categories_bulk(
+        (category_id, f"Category {category_id}") for category_id in range(5)
+    )
+    inventory.add_products_bulk(
+        (
+            product_id,
+            f"Item {product_id}",
+            float(generator.randrange(1, 40)),
+            "d",
+            generator.randrange(5),
+            generator.randrange(-2, 6),
+        )
+        for product_id in range(200)
+    )
+    return inventory
+
+
+def ids(products) -> list:
+    return sorted(product.product_id for product in products)
+
+
+# The vectorized results must match the scalar searches
+def assert_matches_scalar(inventory: Inventory):
+    engine = inventory.vector_query()
+    for low, high in [(0, 100), (5, 5), (10, 20.5), (30, 1)]:
+        assert sorted(engine.filter(min_price=low, max_price=high).tolist()) == ids(
+            inventory.search_product_by_price_range_no_cache(low, high)
+        )
+        assert engine.price_range(low, high).tolist() == [
+            product.product_id
+            for product in inventory.search_product_by_price_range_no_cache(low, high)
+        ]
+    for category_id in range(6):
+        expected = ids(inventory.search_product_by_category_id_no_cache(category_id))
+        assert sorted(engine.category_id(category_id).tolist()) == expected
+        assert sorted(engine.filter({category_id}).tolist()) == expected
+    expected = ids(
+        product
+        for product in inventory.search_product_by_price_range_no_cache(10, 30)
+        if product.category.category_id in (1, 2) and product.quantity > 0
+    )
+    assert sorted(engine.filter({1, 2}, 10, 30, in_stock=True).tolist()) == expected
+
+
+@pytest.mark.parametrize("product_store", [False, True])
+def test_vector_queries_match_the_scalar_searches(product_store):
+    inventory = make_inventory(product_store)
+    # A fresh engine builds its columns on the first query
+    assert sorted(inventory.vector_query().filter(min_price=0).tolist()) == list(
+        range(200)
+    )
+    assert_matches_scalar(inventory)
+
+    for product_id in range(0, 200, 7):
+        inventory.delete_product(product_id)
+    for product_id in range(300, 320):
+        inventory.add_product(product_id, f"Item {product_id}", 12.5, "d", 2, 1)
+    for product_id in range(1, 200, 5):
+        if product_id % 7 == 0:
+            continue
+        inventory.update_product(product_id, price=float(product_id % 17))
+    inventory.update_product(3, category_id=4)
+    assert_matches_scalar(inventory)
+
+
+def test_filter_after_a_change_returns_the_current_ids():
+    inventory = Inventory()
+    inventory.add_new_category(1, "Grocery")
+    for product_id in range(3):
+        inventory.add_product(product_id, f"Item {product_id}", 1.0, "d", 1, 1)
+    engine = inventory.vector_query()
+    assert sorted(engine.filter(min_price=0).tolist()) == [0, 1, 2]
+    inventory.delete_product(0)
+    inventory.add_product(99, "Item 99", 1.0, "d", 1, 1)
+    assert sorted(engine.filter(min_price=0).tolist()) == [1, 2, 99]
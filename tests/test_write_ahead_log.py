@@ -0,0 +1,115 @@
+import zlib
+from threading import Thread
+
+from Project_Phase_4 import Inventory, WriteAheadLog
+
+
+def fill(inventory: Inventory, first_id: int, count: int):
+    for product_id in range(first_id, first_id + count):
+        inventory.add_product(product_id, f"Item {product_id}", 2.0, "d", 1, 5)
+
+
+def rows(inventory: Inventory) -> dict:
+    return {
+        product_id: (product.name, product.price, product.quantity)
+        for product_id, product in inventory.products.items()
+    }
+
+
+def test_recover_replays_the_log(tmp_path):
+    snapshot, log = str(tmp_path / "inventory.snap"), str(tmp_path / "inventory.wal")
+    inventory = Inventory.recover(snapshot, log)
+    inventory.add_new_category(1, "Grocery")
+    fill(inventory, 0, 20)
+    inventory.update_product(3, price=4.0)
+    inventory.increase_product_quantity(4, 10)
+    inventory.delete_product(5)
+    inventory.wal.close()
+
+    recovered = Inventory.recover(snapshot, log)
+    assert rows(recovered) == rows(inventory)
+    assert recovered.lsn == inventory.lsn
+    recovered.wal.close()
+
+
+def test_torn_and_corrupted_tails_are_cut_off(tmp_path):
+    snapshot, log = str(tmp_path / "inventory.snap"), str(tmp_path / "inventory.wal")
+    inventory = Inventory.recover(snapshot, log)
+    inventory.add_new_category(1, "Grocery")
+    fill(inventory, 0, 5)
+    inventory.wal.close()
+    expected = rows(inventory)
+
+    payload = b'[99,0,"delete_product",[1]]'
+    for tail in (
+        b"%08x %s" % (zlib.crc32(payload), payload),
+        b"zzzzzzzz " + payload + b"\n",
+        b"%08x %s\n" % (zlib.crc32(payload) ^ 1, payload),
+    ):
+        with open(log, "rb") as file:
+            size = len(file.read())
+        with open(log, "ab") as file:
+            file.write(tail)
+
+        recovered = Inventory.recover(snapshot, log)
+        assert rows(recovered) == expected
+        recovered.wal.close()
+        # The tail is removed when the log is opened again
+        with open(log, "rb") as file:
+            assert len(file.read()) == size
+
+
+def test_checkpoint_folds_the_log_into_the_snapshot(tmp_path):
+    snapshot, log = str(tmp_path / "inventory.snap"), str(tmp_path / "inventory.wal")
+    inventory = Inventory.recover(snapshot, log)
+    inventory.add_new_category(1, "Grocery")
+    fill(inventory, 0, 10)
+    inventory.checkpoint(snapshot)
+    assert list(WriteAheadLog.read(log)) == []
+
+    fill(inventory, 10, 10)
+    inventory.delete_product(0)
+    inventory.wal.close()
+    assert [record[0] for record in WriteAheadLog.read(log)] == list(
+        range(12, inventory.lsn + 1)
+    )
+
+    recovered = Inventory.recover(snapshot, log)
+    assert rows(recovered) == rows(inventory)
+    recovered.wal.close()
+
+
+def test_wait_returns_once_the_record_is_synced(tmp_path):
+    log = WriteAheadLog(str(tmp_path / "inventory.wal"), group_interval=60)
+    lsn = log.append("delete_product", [1])
+    assert not log.wait(lsn, timeout=0.01)
+    log.flush()
+    assert log.wait(lsn, timeout=0)
+    assert [record[0] for record in WriteAheadLog.read(log.path)] == [lsn]
+    log.close()
+
+
+# Concurrent quantity changes never leave an older sequence number behind
+def test_concurrent_quantity_changes_keep_the_latest_lsn(tmp_path):
+    snapshot, log = str(tmp_path / "inventory.snap"), str(tmp_path / "inventory.wal")
+    inventory = Inventory.recover(snapshot, log, thread_safe=True)
+    inventory.add_new_category(1, "Grocery")
+    fill(inventory, 0, 8)
+
+    def change(product_id: int):
+        for _ in range(200):
+            inventory.increase_product_quantity(product_id, 1)
+
+    threads = [Thread(target=change, args=(product_id,)) for product_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert inventory.lsn == inventory.wal.lsn == 9 + 8 * 200
+
+    inventory.checkpoint(snapshot)
+    inventory.wal.close()
+    recovered = Inventory.recover(snapshot, log)
+    assert recovered.lsn == inventory.lsn
+    assert rows(recovered) == rows(inventory)
+    recovered.wal.close()